@@ -0,0 +1,206 @@
+"""
+Admission control: ограничение одновременных запросов к API по группам маршрутов.
+
+Когда PostgreSQL замедляется, запросы копятся в пуле потоков и в очереди за
+соединениями, пока клиенты не отвалятся по таймауту, — и деградирует весь API.
+Middleware пропускает в каждую группу маршрутов не больше max_concurrent запросов,
+еще max_queue ждут не дольше ADMISSION_QUEUE_TIMEOUT_SECONDS, остальные сразу
+получают 503 с Retry-After. Низкоприоритетные группы (свайпы и записи) при
+заполненном пуле соединений отклоняются без ожидания, чтобы дешевые чтения
+(фильмы, матчи, комната) и /health продолжали отвечать.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+from app.config import settings
+from app.logging_config import logger
+from app.metrics import registry
+
+admission_in_flight = registry.gauge(
+    "admission_in_flight_requests", "Запросы, выполняющиеся сейчас", ["group"]
+)
+admission_queued = registry.gauge(
+    "admission_queued_requests", "Запросы, ожидающие допуска", ["group"]
+)
+admission_rejected_total = registry.counter(
+    "admission_rejected_total", "Запросы, отклоненные с 503", ["group", "reason"]
+)
+admission_queue_wait_seconds = registry.histogram(
+    "admission_queue_wait_seconds", "Время ожидания допуска в очереди", ["group"]
+)
+
+
+@dataclass(frozen=True)
+class RouteGroup:
+    """Группа маршрутов с общим лимитом"""
+    name: str
+    prefixes: tuple[str, ...]
+    max_concurrent: int
+    max_queue: int
+    methods: Optional[frozenset[str]] = None  # None — любые методы
+    shed_on_pool_saturation: bool = False  # Отклонять сразу, если пул соединений исчерпан
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        return any(path.startswith(prefix) for prefix in self.prefixes)
+
+
+def default_route_groups() -> list[RouteGroup]:
+    """Группы маршрутов API по умолчанию; порядок важен — берется первая подходящая"""
+    return [
+        RouteGroup(
+            name="swipes",
+            prefixes=("/api/swipes",),
+            max_concurrent=settings.ADMISSION_SWIPES_CONCURRENCY,
+            max_queue=settings.ADMISSION_SWIPES_QUEUE,
+            shed_on_pool_saturation=True,
+        ),
+        RouteGroup(
+            name="reads",
+            prefixes=("/api/movies", "/api/matches", "/api/rooms"),
+            methods=frozenset({"GET", "HEAD"}),
+            max_concurrent=settings.ADMISSION_READS_CONCURRENCY,
+            max_queue=settings.ADMISSION_READS_QUEUE,
+        ),
+        RouteGroup(
+            name="default",
+            prefixes=("/api/",),
+            max_concurrent=settings.ADMISSION_DEFAULT_CONCURRENCY,
+            max_queue=settings.ADMISSION_DEFAULT_QUEUE,
+            shed_on_pool_saturation=True,
+        ),
+    ]
+
+
+class _Limiter:
+    """
+    Счетчик одновременных запросов группы с ограниченной очередью ожидания.
+
+    Ожидающие хранятся явно (FIFO): освободившийся слот передается первому из них
+    без уменьшения active. Если ожидающего отменили (клиент отключился) уже после
+    передачи слота, слот возвращается следующему — счетчик не "утекает".
+    """
+
+    def __init__(self, group: RouteGroup):
+        self.group = group
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        admission_in_flight.set_function(lambda: self.active, group=group.name)
+        admission_queued.set_function(lambda: self.waiting, group=group.name)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float, allow_wait: bool) -> Optional[str]:
+        """Занимает слот; возвращает причину отказа или None, если запрос допущен"""
+        if self.active < self.group.max_concurrent and not self._waiters:
+            self.active += 1
+            return None
+        if not allow_wait:
+            return "pool_saturated"
+        if self.waiting >= self.group.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout):
+                await waiter
+        except TimeoutError:
+            # Слот могли передать одновременно с истечением таймаута — тогда запрос допущен
+            if not self._handed_over(waiter):
+                return "queue_timeout"
+        except asyncio.CancelledError:
+            if self._handed_over(waiter):
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            admission_queue_wait_seconds.observe(time.perf_counter() - started, group=self.group.name)
+        return None
+
+    @staticmethod
+    def _handed_over(waiter: asyncio.Future) -> bool:
+        return waiter.done() and not waiter.cancelled()
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Слот переходит ожидающему запросу, active не меняется
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware: допускает запрос к API, только если у его группы есть свободный
+    слот (или место в очереди). Маршруты вне групп (/health, /docs, webhook бота)
+    проходят без ограничений.
+    """
+
+    def __init__(
+        self,
+        app,
+        groups: Optional[Sequence[RouteGroup]] = None,
+        pool_saturated: Optional[Callable[[], bool]] = None,
+    ):
+        self.app = app
+        self.groups = list(groups) if groups is not None else default_route_groups()
+        self.pool_saturated = pool_saturated or (lambda: False)
+        self._limiters = {group.name: _Limiter(group) for group in self.groups}
+
+    def _group_for(self, scope) -> Optional[RouteGroup]:
+        method = scope.get("method", "GET")
+        path = scope.get("path", "")
+        for group in self.groups:
+            if group.matches(method, path):
+                return group
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        group = self._group_for(scope)
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self._limiters[group.name]
+        allow_wait = not (group.shed_on_pool_saturation and self.pool_saturated())
+        reason = await limiter.acquire(settings.ADMISSION_QUEUE_TIMEOUT_SECONDS, allow_wait)
+        if reason is not None:
+            admission_rejected_total.inc(group=group.name, reason=reason)
+            logger.debug(f"Admission rejected: {scope.get('method')} {scope.get('path')} group={group.name} reason={reason}")
+            await self._reject(send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _reject(send) -> None:
+        body = json.dumps({"detail": "Service overloaded, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
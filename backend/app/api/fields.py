@@ -0,0 +1,43 @@
+"""
+Sparse fieldsets: параметр ?fields=id,title,year выбирает поля ответа.
+
+Клиент, которому не нужно все (например, список карточек или матчей без описания),
+получает меньший ответ, а сервис загружает из БД только нужные колонки.
+"""
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+
+def parse_fields(fields: Optional[str], model: type[BaseModel], always: Sequence[str] = ("id",)) -> Optional[tuple[str, ...]]:
+    """
+    Разбирает ?fields= в кортеж имен полей модели ответа.
+
+    Args:
+        fields: Строка через запятую или None (нужны все поля)
+        model: Модель ответа, поля которой можно запрашивать
+        always: Поля, которые добавляются всегда (идентификатор)
+
+    Returns:
+        Кортеж полей в порядке модели или None, если fields не передан
+
+    Raises:
+        HTTPException: 400, если запрошено неизвестное поле
+    """
+    if fields is None:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(model.model_fields)}",
+        )
+    requested.update(always)
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+def pick(obj: Any, fields: Sequence[str]) -> dict:
+    """Словарь только с запрошенными атрибутами объекта (без сборки полной модели)"""
+    return {field: getattr(obj, field) for field in fields}
@@ -2,35 +2,72 @@
 API-эндпоинты для работы с матчами: получение матчей для группы участников, 
 получение конкретного матча по ID, проверка статуса голосования по фильму и группе участников.
 """
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from uuid import UUID
-from typing import Annotated
-from sqlalchemy.orm import Session
+from typing import Annotated, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from ..services.match_service import match_service
-from .schemas import MatchResponse, ApiResponse, VoteStatusResponse
+from ..database import get_async_read_db
+from ..services.match_service import async_match_service
+from ..services.swipe_service import async_swipe_service, swipe_service
+from .schemas import MatchResponse, MovieResponse, ApiResponse, PageResponse, VoteStatusResponse
+from .responses import api_ok, api_page
+from .fields import parse_fields, pick
 from ..logging_config import logger
 
 router = APIRouter(prefix="/api/matches", tags=["matches"])
 
-@router.get("/group", response_model=ApiResponse[list[MatchResponse]])
-def get_group_matches(
+MOVIE_FIELDS_QUERY = Query(
+    None,
+    description="Поля вложенного фильма через запятую (id добавляется всегда), например id,title,poster_url. "
+                "Без параметра — все поля фильма",
+)
+MATCH_FIELDS = tuple(name for name in MatchResponse.model_fields if name != "movie")
+
+
+def _sparse_match(match, movie_fields: tuple[str, ...]) -> dict:
+    data = pick(match, MATCH_FIELDS)
+    data["movie"] = pick(match.movie, movie_fields) if match.movie is not None else None
+    return data
+
+
+def _match_response(match, movie_fields: Optional[tuple[str, ...]]) -> Response:
+    """Матч с вложенным фильмом: полный MovieResponse или только запрошенные поля фильма"""
+    if movie_fields is None:
+        return api_ok(match, MatchResponse)
+    return api_ok(_sparse_match(match, movie_fields))
+
+
+def _match_page_response(page, movie_fields: Optional[tuple[str, ...]]) -> Response:
+    if movie_fields is None:
+        return api_page(page.items, page.next_cursor, MatchResponse)
+    return api_page([_sparse_match(match, movie_fields) for match in page.items], page.next_cursor)
+
+
+@router.get("/group", response_model=PageResponse[MatchResponse])
+async def get_group_matches(
     participants: Annotated[str, Query(
         description="Список telegram_id через запятую, пример: 123,456,789",
         example="123456789,987654321",
         regex="^[0-9]+(,[0-9]+)*$"
     )], 
-    db: Session = Depends(get_db)
-) -> ApiResponse[list[MatchResponse]]:
+    limit: int = Query(50, ge=1, le=200, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+    movie_fields: Optional[str] = MOVIE_FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_read_db)
+) -> Response:
     """
-    Получение всех матчей для группы участников.
+    Получение матчей группы участников постранично (новые первыми) вместе с фильмами
+    (фильмы страницы загружаются одним дополнительным запросом).
     
     Args:
         participants (str): Строка с telegram_id участников через запятую
+        limit (int): Размер страницы
+        cursor (str, optional): next_cursor предыдущей страницы
+        movie_fields (str, optional): Поля вложенного фильма через запятую
         
     Returns:
-        ApiResponse[list[MatchResponse]]: Список матчей группы
+        PageResponse[MatchResponse]: Страница матчей группы и курсор следующей
         
     Raises:
         HTTPException: Если возникла ошибка при получении матчей или неверный формат данных
@@ -47,8 +84,13 @@ def get_group_matches(
                 detail=f"Invalid participants format: {str(e)}"
             )
 
-        matches = match_service.list_matches_for_group(db=db, group_participants=group_participants)
-        return ApiResponse(success=True, data=matches)
+        selected = parse_fields(movie_fields, MovieResponse)
+        page = await async_match_service.list_matches_for_group(
+            db=db, group_participants=group_participants, limit=limit, cursor=cursor, movie_fields=selected
+        )
+        return _match_page_response(page, selected)
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.warning(f"Invalid group data: {e}")
         raise HTTPException(
@@ -62,89 +104,73 @@ def get_group_matches(
             detail="Internal server error"
         )
 
-@router.get("/{match_id}", response_model=ApiResponse[MatchResponse])
-def get_match(match_id: UUID, db: Session = Depends(get_db)) -> ApiResponse[MatchResponse]:
-    """
-    Получение конкретного матча по ID.
-    
-    Args:
-        match_id (UUID): ID матча
-        
-    Returns:
-        ApiResponse[MatchResponse]: Данные матча
-        
-    Raises:
-        HTTPException: Если матч не найден
-    """
-    try:
-        match = match_service.get_match_by_id(db=db, match_id = match_id)
-        if not match:
-            raise HTTPException(status_code=404, detail="Match not found")
-        return ApiResponse(success=True, data=match)
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Failed to get match: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail="Internal server error"
-        )
-
 @router.get("/vote-status", response_model=ApiResponse[VoteStatusResponse])
-def get_vote_status(
+async def get_vote_status(
     movie_id: UUID,
     participants: Annotated[str, Query(
         description="Список telegram_id через запятую, пример: 123,456,789",
         example="123456789,987654321",
         regex="^[0-9]+(,[0-9]+)*$"
     )],
-    db: Session = Depends(get_db)
-) -> ApiResponse[VoteStatusResponse]:
+    db: AsyncSession = Depends(get_async_read_db)
+) -> Response:
     try:
         # Нормализуем и валидируем участников
         group_participants = [int(p.strip()) for p in participants.split(',') if p.strip()]
-        from app.services.swipe_service import swipe_service
         group_participants = swipe_service.normalize_group_participants(group_participants)
 
-        # Запрашиваем все голоса по фильму и группе
-        from sqlalchemy import and_, select, cast
-        from sqlalchemy.dialects.postgresql import JSONB
-        from app.models.swipe import UserSwipe
-        from app.models.user import User
-
-        stmt = (
-            select(UserSwipe, User.telegram_id)
-            .join(User, UserSwipe.user_id == User.id)
-            .where(
-                and_(
-                    UserSwipe.movie_id == str(movie_id),
-                    # с помощью cast и оператора @> проверяем, что массив участников в базе содержит всех участников из запроса
-                    cast(UserSwipe.group_participants, JSONB).op("@>")(group_participants),
-                )
-            )
-        )
-        rows = db.execute(stmt).all()
-
-        votes: dict[int, str] = {}
-        for row in rows:
-            # row[0] is UserSwipe, row[1] is telegram_id
-            votes[row.telegram_id] = row[0].swipe_type.value if hasattr(row[0].swipe_type, 'value') else str(row[0].swipe_type)
+        # Все голоса по фильму и группе: telegram_id -> 'like' / 'dislike'
+        votes = await async_swipe_service.get_group_votes(db, str(movie_id), group_participants)
 
         likes_count = sum(1 for v in votes.values() if v == 'like')
         dislikes_count = sum(1 for v in votes.values() if v == 'dislike')
         total_participants = len(group_participants)
         match_ready = (len(votes) == total_participants and likes_count == total_participants)
 
-        return ApiResponse(success=True, data=VoteStatusResponse(
-            total_participants=total_participants,
-            likes_count=likes_count,
-            dislikes_count=dislikes_count,
-            votes=votes,
-            match_ready=match_ready
-        ))
+        return api_ok({
+            "total_participants": total_participants,
+            "likes_count": likes_count,
+            "dislikes_count": dislikes_count,
+            "votes": votes,
+            "match_ready": match_ready,
+        })
     except ValueError as e:
         logger.warning(f"Invalid vote-status request: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get vote status: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/{match_id}", response_model=ApiResponse[MatchResponse])
+async def get_match(
+    match_id: UUID,
+    movie_fields: Optional[str] = MOVIE_FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_read_db)
+) -> Response:
+    """
+    Получение конкретного матча по ID вместе с фильмом.
+    
+    Args:
+        match_id (UUID): ID матча
+        movie_fields (str, optional): Поля вложенного фильма через запятую
+        
+    Returns:
+        ApiResponse[MatchResponse]: Данные матча
+        
+    Raises:
+        HTTPException: Если матч не найден
+    """
+    try:
+        selected = parse_fields(movie_fields, MovieResponse)
+        match = await async_match_service.get_match_by_id(db=db, match_id=match_id, movie_fields=selected)
+        if not match:
+            raise HTTPException(status_code=404, detail="Match not found")
+        return _match_response(match, selected)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get match: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
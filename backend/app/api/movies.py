@@ -1,20 +1,41 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Response
 from fastapi import Depends
 from uuid import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..services.movie_service import movie_service
+from ..services.movie_service import async_movie_service
 from .schemas import MovieResponse, ApiResponse
+from .responses import api_ok
+from .fields import parse_fields, pick
 from ..logging_config import logger
-from ..database import get_db
+from ..database import get_async_db, get_async_read_db
 from ..config import settings
 
 router = APIRouter(prefix="/api/movies", tags=["movies"])
 
+FIELDS_QUERY = Query(
+    None,
+    description="Поля ответа через запятую (id добавляется всегда), например id,title,year,poster_url,rating. "
+                "Без параметра — все поля, включая description",
+)
+
+
+def _movie_response(movie, fields: Optional[tuple[str, ...]]) -> Response:
+    """Полный MovieResponse или только запрошенные поля"""
+    if fields is None:
+        return api_ok(movie, MovieResponse)
+    return api_ok(pick(movie, fields))
+
+
 @router.get("/random", response_model=ApiResponse[MovieResponse])
-def get_random_movie(db: Session = Depends(get_db)) -> ApiResponse[MovieResponse]:
+async def get_random_movie(fields: Optional[str] = FIELDS_QUERY, db: AsyncSession = Depends(get_async_db)) -> Response:
     """
     Получение случайного фильма для свайпов.
+
+    Args:
+        fields (str, optional): Поля ответа через запятую (sparse fieldset)
     
     Returns:
         ApiResponse[MovieResponse]: Случайный фильм из базы
@@ -23,13 +44,14 @@ def get_random_movie(db: Session = Depends(get_db)) -> ApiResponse[MovieResponse
         HTTPException: Если нет доступных фильмов или произошла ошибка
     """
     try:
-        movie = movie_service.get_random_movie(db=db)
+        selected = parse_fields(fields, MovieResponse)
+        movie = await async_movie_service.get_random_movie(db=db, fields=selected)
         if not movie:
             raise HTTPException(
                 status_code=404,
                 detail="No movies available"
             )
-        return ApiResponse(success=True, data=movie)
+        return _movie_response(movie, selected)
     except HTTPException:
         raise
     except Exception as e:
@@ -40,12 +62,13 @@ def get_random_movie(db: Session = Depends(get_db)) -> ApiResponse[MovieResponse
         )
 
 @router.get("/{id}", response_model=ApiResponse[MovieResponse])
-def get_movie(id: UUID, db: Session = Depends(get_db)) -> ApiResponse[MovieResponse]:
+async def get_movie(id: UUID, fields: Optional[str] = FIELDS_QUERY, db: AsyncSession = Depends(get_async_read_db)) -> Response:
     """
     Получение фильма по ID.
 
     Args:
         movie_id (UUID): ID фильма
+        fields (str, optional): Поля ответа через запятую (sparse fieldset)
 
     Returns:
         ApiResponse[MovieResponse]: Данные фильма
@@ -54,10 +77,11 @@ def get_movie(id: UUID, db: Session = Depends(get_db)) -> ApiResponse[MovieRespo
         HTTPException: Если фильм не найден
     """
     try:
-        movie = movie_service.get_movie_by_id(db=db, id=str(id))
+        selected = parse_fields(fields, MovieResponse)
+        movie = await async_movie_service.get_movie_by_id(db=db, id=str(id), fields=selected)
         if not movie:
             raise HTTPException(status_code=404, detail="Movie not found")
-        return ApiResponse(success=True, data=movie)
+        return _movie_response(movie, selected)
     except HTTPException:
         raise
     except Exception as e:
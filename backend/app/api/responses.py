@@ -0,0 +1,77 @@
+"""
+Быстрое построение ответов API.
+
+Раньше эндпоинт возвращал ApiResponse(data=<ORM-объект>), а FastAPI затем еще раз
+валидировал его по response_model, прогонял через jsonable_encoder и json.dumps.
+api_ok() строит модель ответа из ORM-объекта один раз (from_attributes), сразу
+сериализует ее в python-типы и отдает ApiJSONResponse (orjson), минуя повторную валидацию
+(если эндпоинт возвращает Response, FastAPI response_model не применяет —
+он остается только для документации OpenAPI).
+"""
+import uuid
+from functools import lru_cache
+from typing import Any, Optional
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+
+def _default(value: Any) -> Any:
+    # asyncpg отдает UUID своим подклассом uuid.UUID, а orjson нативно сериализует только
+    # точный тип; default вызывается лишь для таких значений и не замедляет остальные
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ApiJSONResponse(ORJSONResponse):
+    """ORJSONResponse, который сериализует и UUID из asyncpg (асинхронные эндпоинты)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+@lru_cache(maxsize=None)
+def _adapter(model: type, many: bool) -> TypeAdapter:
+    return TypeAdapter(list[model] if many else model)
+
+
+def build(model: type[BaseModel], obj: Any, many: bool = False) -> Any:
+    """Валидирует ORM-объект (или список) в модель ответа за один проход"""
+    return _adapter(model, many).validate_python(obj, from_attributes=True)
+
+
+def api_ok(data: Any = None, model: Optional[type[BaseModel]] = None, many: bool = False) -> ApiJSONResponse:
+    """
+    Ответ {"success": true, "data": ..., "error": null}.
+
+    Args:
+        data: ORM-объект/список (если передан model), готовая модель ответа или dict
+        model: Модель ответа, в которую нужно преобразовать ORM-объект
+        many: data — список объектов
+    """
+    return ApiJSONResponse({"success": True, "data": _payload(data, model, many), "error": None})
+
+
+def api_page(items: Any, next_cursor: Optional[str], model: Optional[type[BaseModel]] = None) -> ApiJSONResponse:
+    """
+    Страница списка {"success": true, "data": [...], "error": null, "next_cursor": ...}.
+
+    next_cursor передается в ?cursor= за следующей страницей; null — страница последняя.
+    """
+    return ApiJSONResponse({
+        "success": True,
+        "data": _payload(items, model, many=True),
+        "error": None,
+        "next_cursor": next_cursor,
+    })
+
+
+def _payload(data: Any, model: Optional[type[BaseModel]], many: bool) -> Any:
+    if model is not None:
+        adapter = _adapter(model, many)
+        return adapter.dump_python(adapter.validate_python(data, from_attributes=True))
+    if isinstance(data, BaseModel):
+        return data.model_dump()
+    return data
@@ -2,45 +2,45 @@
 API-эндпоинты для работы с комнатами: 
 получение текущей комнаты пользователя, информации о комнате и участниках.
 """
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from typing import Annotated
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from ..services.user_service import user_service
-from ..services.room_service import room_service
+from ..database import get_async_db
+from ..services.user_service import async_user_service
+from ..services.activity_service import activity_tracker
+from ..services.room_service import async_room_service
 from .schemas import ApiResponse
+from .responses import api_ok
 from ..logging_config import logger
 
 router = APIRouter(prefix="/api/rooms", tags=["rooms"])
 
 
 @router.get("/my", response_model=ApiResponse[dict])
-def get_my_room(
+async def get_my_room(
     telegram_id: Annotated[int, Header(description="Telegram ID пользователя")],
-    db: Session = Depends(get_db)
-) -> ApiResponse[dict]:
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
     """
     Получает текущую комнату пользователя с информацией об участниках.
 
     Args:
         telegram_id: Telegram ID пользователя из заголовка
-        db: Сессия БД
+        db: Асинхронная сессия БД
 
     Returns:
         Информация о комнате и участниках, или None если пользователь не в комнате
     """
     try:
-        user = user_service.get_user_by_telegram_id(db, telegram_id)
+        user = await async_user_service.get_identity_by_telegram_id(db, telegram_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
+        activity_tracker.touch(user.id)
 
-        room = room_service.get_user_current_room(db, user)
-        if not room:
-            return ApiResponse(success=True, data=None)
-
-        room_info = room_service.get_room_info(db, room.id)
-        return ApiResponse(success=True, data=room_info)
+        # Снимок комнаты из кэша (или из БД при промахе), None — пользователь не в комнате
+        room_info = await async_room_service.get_user_room_info(db, user.telegram_id)
+        return api_ok(room_info)
 
     except HTTPException:
         raise
@@ -10,6 +10,14 @@ class ApiResponse(BaseModel, Generic[T]):
     data: Optional[T] = None
     error: Optional[str] = None
 
+
+class PageResponse(BaseModel, Generic[T]):
+    """Страница списка: next_cursor передается в ?cursor= за следующей страницей (null — последняя)"""
+    success: bool
+    data: Optional[list[T]] = None
+    error: Optional[str] = None
+    next_cursor: Optional[str] = None
+
 # User schemas
 class UserCreate(BaseModel):
     telegram_id: int
@@ -1,14 +1,19 @@
 """API-эндпоинты для работы со свайпами: создание свайпа, получение свайпов пользователя и т.д."""
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
 from uuid import UUID
-from typing import Annotated
+from typing import Annotated, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from ..services.swipe_service import swipe_service
-from ..services.user_service import user_service
-from ..services.match_service import match_service
-from .schemas import SwipeCreate, SwipeResponse, SwipeResponseWithMatch, ApiResponse
+from ..database import get_async_db, get_read_db, replica_router
+from ..services.swipe_service import async_swipe_service, swipe_service
+from ..services.user_service import async_user_service, user_service
+from ..services.activity_service import activity_tracker
+from ..services.match_service import async_match_service
+from ..services.room_service import async_room_service
+from .schemas import SwipeCreate, SwipeResponse, SwipeResponseWithMatch, ApiResponse, PageResponse
+from .responses import api_ok, api_page, build
 from ..logging_config import logger
 
 router = APIRouter(prefix="/api/swipes", tags=["swipes"])
@@ -18,18 +23,18 @@ router = APIRouter(prefix="/api/swipes", tags=["swipes"])
     400: {"description": "Некорректные данные свайпа"},
     500: {"description": "Внутренняя ошибка сервера"}
 })
-def create_swipe(
+async def create_swipe(
     swipe: SwipeCreate,
     telegram_id: Annotated[int, Header(description="Telegram ID пользователя")],
-    db: Session = Depends(get_db)
-) -> ApiResponse[SwipeResponseWithMatch]:
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
     """
     Создание нового свайпа.
     
     Args:
         swipe (SwipeCreate): Данные свайпа
         telegram_id (int): Telegram ID пользователя из заголовка запроса
-        db (Session): Сессия базы данных
+        db (AsyncSession): Асинхронная сессия базы данных
         
     Returns:
         ApiResponse[SwipeResponse]: Созданный свайп
@@ -40,17 +45,21 @@ def create_swipe(
     try:
         # Получаем пользователя по telegram_id
         logger.info("Swipe request: telegram_id=%s, movie_id=%s, swipe_type=%s", telegram_id, swipe.movie_id, swipe.swipe_type)
-        user = user_service.get_user_by_telegram_id(db, telegram_id)
+        user = await async_user_service.get_identity_by_telegram_id(db, telegram_id)
         if not user:
             logger.warning("User not found: telegram_id=%s", telegram_id)
             raise HTTPException(status_code=404, detail="User not found")
+        activity_tracker.touch(user.id)
 
         # Создаем свайп (идемпотентно, т.е. дубликат не будет создан) с нормализацией внутри сервиса
-        db_swipe = swipe_service.create_swipe(db=db, **swipe.model_dump(), user_id=str(user.id))
+        db_swipe = await async_swipe_service.create_swipe(db=db, **swipe.model_dump(), user_id=str(user.id))
+        # Отмечаем активность комнаты, чтобы она не истекла во время игры
+        await async_room_service.touch_activity(db, telegram_id)
 
-        # Проверяем на матч если это лайк
+        # Проверяем на матч если это лайк (дизлайк не может завершить матч)
+        match_found = False
         if swipe.swipe_type == 'like':
-            match_found = swipe_service.check_match(
+            match_found = await async_swipe_service.check_match(
                 db=db,
                 movie_id=swipe.movie_id,
                 group_participants=swipe.group_participants
@@ -58,25 +67,27 @@ def create_swipe(
             if match_found:
                 logger.info("Match found for movie %s and group %s", swipe.movie_id, swipe.group_participants)
                 # Создаем матч в БД
-                match_service.create_match(db=db, movie_id=swipe.movie_id, group_participants=swipe.group_participants)
+                await async_match_service.create_match(db=db, movie_id=swipe.movie_id, group_participants=swipe.group_participants)
 
-        # Расширяем ответ полем match_found
-        try:
-            match_found = swipe_service.check_match(
-                db=db,
-                movie_id=swipe.movie_id,
-                group_participants=swipe.group_participants
-            )
-        except Exception:
-            match_found = False
-
-        # Приводим ORM-модель к pydantic, затем дополняем
-        response_data = SwipeResponse.model_validate(db_swipe).model_dump()
-        response_data["match_found"] = match_found
-        return ApiResponse(success=True, data=SwipeResponseWithMatch(**response_data))
+        # Модель ответа строится из ORM-объекта один раз, match_found добавляется без повторной валидации
+        response = build(SwipeResponse, db_swipe)
+        result = api_ok(SwipeResponseWithMatch.model_construct(**dict(response), match_found=match_found))
+        # Токен read-your-writes: чтения клиента (vote-status, матчи) пойдут в primary, пока реплика не догонит свайп
+        replica_router.attach_write_token(result, await replica_router.async_write_token(db))
+        return result
 
     except HTTPException:
         raise
+    except IntegrityError as e:
+        # Пользователь из кэша уже удален: свайп нарушил внешний ключ на users
+        if user_service.forget_deleted_user(telegram_id, e):
+            logger.warning("User not found (deleted): telegram_id=%s", telegram_id)
+            raise HTTPException(status_code=404, detail="User not found")
+        logger.error("Failed to create swipe: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
     except ValueError as e:
         logger.warning("Invalid swipe data: %s", e)
         raise HTTPException(
@@ -90,19 +101,26 @@ def create_swipe(
             detail="Internal server error"
         )
 
-@router.get("/user/{user_id}", response_model=ApiResponse[list[SwipeResponse]])
-def get_user_swipes(user_id: UUID, db: Session = Depends(get_db)) -> ApiResponse[list[SwipeResponse]]:
+@router.get("/user/{user_id}", response_model=PageResponse[SwipeResponse])
+def get_user_swipes(
+    user_id: UUID,
+    limit: int = Query(50, ge=1, le=200, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+    db: Session = Depends(get_read_db)
+) -> Response:
     """
-    Получение всех свайпов пользователя.
+    Получение свайпов пользователя постранично (новые первыми).
     
     Args:
         user_id (UUID): ID пользователя
+        limit (int): Размер страницы
+        cursor (str, optional): next_cursor предыдущей страницы
         
     Returns:
-        ApiResponse[list[SwipeResponse]]: Список свайпов пользователя
+        PageResponse[SwipeResponse]: Страница свайпов пользователя и курсор следующей
         
     Raises:
-        HTTPException: Если пользователь не найден
+        HTTPException: Если пользователь не найден или курсор некорректный
     """
     try:
         # Проверяем существование пользователя
@@ -110,11 +128,13 @@ def get_user_swipes(user_id: UUID, db: Session = Depends(get_db)) -> ApiResponse
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
             
-        swipes = swipe_service.list_user_swipes(db=db, user_id=str(user_id))
-        return ApiResponse(success=True, data=swipes)
+        page = swipe_service.list_user_swipes(db=db, user_id=str(user_id), limit=limit, cursor=cursor)
+        return api_page(page.items, page.next_cursor, SwipeResponse)
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get user swipes: {e}", exc_info=True)
         raise HTTPException(
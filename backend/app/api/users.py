@@ -1,32 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from typing import Annotated
 from uuid import UUID
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import SessionLocal, get_db, get_read_db, replica_router
 
 from ..services.user_service import user_service
 from .schemas import UserCreate, UserResponse, ApiResponse
+from .responses import api_ok
 from ..logging_config import logger
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 @router.post("/", response_model=ApiResponse[UserResponse])
-def create_user(user: UserCreate, db: Session = Depends(get_db)) -> ApiResponse[UserResponse]:
+def create_user(user: UserCreate, db: Session = Depends(get_db)) -> Response:
     """
-    Создание нового пользователя.
+    Создание пользователя или обновление имени существующего (upsert по telegram_id).
     
     Args:
         user (UserCreate): Данные пользователя
         
     Returns:
-        ApiResponse[UserResponse]: Созданный пользователь
+        ApiResponse[UserResponse]: Созданный или обновленный пользователь
         
     Raises:
-        HTTPException: Если пользователь с таким telegram_id уже существует
+        HTTPException: Если не удалось сохранить пользователя
     """
     try:
-        db_user = user_service.create_user(db=db, **user.model_dump())
-        return ApiResponse(success=True, data=db_user)
+        db_user = user_service.upsert_user(db=db, **user.model_dump())
+        response = api_ok(db_user, UserResponse)
+        # Токен read-your-writes: следующие чтения клиента пойдут в primary, пока реплика не догонит запись
+        replica_router.attach_write_token(response, replica_router.write_token(db))
+        return response
     except Exception as e:
         logger.error(f"Failed to create user: {e}", exc_info=True)
         raise HTTPException(
@@ -34,13 +38,13 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)) -> ApiResponse[
             detail=str(e)
         )
 
-@router.get("/id/{id}", response_model=ApiResponse[UserResponse])
-def get_user(id: UUID, db: Session = Depends(get_db)) -> ApiResponse[UserResponse]:
+@router.get("/id/{user_id}", response_model=ApiResponse[UserResponse])
+def get_user(user_id: UUID, db: Session = Depends(get_read_db)) -> Response:
     """
     Получение пользователя по ID.
     
     Args:
-        id (UUID): ID пользователя
+        user_id (UUID): ID пользователя
         
     Returns:
         ApiResponse[UserResponse]: Данные пользователя
@@ -49,10 +53,14 @@ def get_user(id: UUID, db: Session = Depends(get_db)) -> ApiResponse[UserRespons
         HTTPException: Если пользователь не найден
     """
     try:
-        user = user_service.get_user_by_id(db=db, id=str(id))
+        user = user_service.get_user_by_id(db=db, id=str(user_id))
+        if not user and replica_router.is_replica(db):
+            # Пользователя мог только что создать бот (без токена read-your-writes), а реплика еще не догнала primary
+            with SessionLocal() as primary:
+                user = user_service.get_user_by_id(db=primary, id=str(user_id))
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        return ApiResponse(success=True, data=user)
+        return api_ok(user, UserResponse)
     except HTTPException:
         raise
     except Exception as e:
@@ -63,12 +71,16 @@ def get_user(id: UUID, db: Session = Depends(get_db)) -> ApiResponse[UserRespons
         )
 
 @router.get("/telegram_id/{telegram_id}", response_model=ApiResponse[UserResponse])
-def get_user_by_telegram(telegram_id: int, db: Session = Depends(get_db)) -> ApiResponse[UserResponse]:
+def get_user_by_telegram(telegram_id: int, db: Session = Depends(get_read_db)) -> Response:
     try:
         user = user_service.get_user_by_telegram_id(db=db, telegram_id=telegram_id)
+        if not user and replica_router.is_replica(db):
+            # Пользователь мог только что зарегистрироваться в боте, а реплика еще не догнала primary
+            with SessionLocal() as primary:
+                user = user_service.get_user_by_telegram_id(db=primary, telegram_id=telegram_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        return ApiResponse(success=True, data=user)
+        return api_ok(user, UserResponse)
     except HTTPException:
         raise
     except Exception as e:
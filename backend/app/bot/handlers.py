@@ -4,9 +4,11 @@ import logging
 from sqlalchemy.exc import IntegrityError
 
 from app.config import settings
-from app.database import SessionLocal
-from app.services.user_service import user_service
-from app.services.room_service import room_service
+from app.database import AsyncSessionLocal, async_engine
+from app.services.user_service import async_user_service, user_service
+from app.services.room_service import async_room_service
+from app.services.activity_service import activity_tracker
+from app.bot.update_processor import PerUserUpdateProcessor
 
 logger = logging.getLogger(__name__)
 
@@ -17,33 +19,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     
     if user:
         try:
-            db = SessionLocal()
-            try:
-                # Проверяем, существует ли пользователь
-                db_user = user_service.get_user_by_telegram_id(db, user.id)
-                
-                if not db_user:
-                    # Создаем нового пользователя
-                    db_user = user_service.create_user(
-                        db=db,
-                        telegram_id=user.id,
-                        first_name=user.first_name,
-                        username=user.username
-                    )
-                    logger.info("Created new user: telegram_id=%s username=%s", user.id, user.username)
-                else:
-                    # Обновляем имя пользователя, если оно изменилось
-                    db_user = user_service.update_user_name(
-                        db=db,
-                        user=db_user,
-                        first_name=user.first_name,
-                        username=user.username
-                    )
-                    logger.info("Updated existing user: telegram_id=%s username=%s", user.id, user.username)
-            
-            finally:
-                db.close()
-                
+            async with AsyncSessionLocal() as db:
+                # Создаем пользователя или обновляем имя одним запросом (upsert)
+                db_user = await async_user_service.upsert_user(
+                    db=db,
+                    telegram_id=user.id,
+                    first_name=user.first_name,
+                    username=user.username
+                )
+                logger.info("Registered user: telegram_id=%s username=%s", user.id, user.username)
+
+                activity_tracker.touch(db_user.id)
+
         except IntegrityError as e:
             logger.error("Database integrity error: %s", str(e))
         except Exception as e:
@@ -84,16 +71,16 @@ async def create_room(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         return
 
     try:
-        db = SessionLocal()
-        try:
+        async with AsyncSessionLocal() as db:
             # Получаем пользователя из БД
-            db_user = user_service.get_user_by_telegram_id(db, user.id)
+            db_user = await async_user_service.get_identity_by_telegram_id(db, user.id)
             if not db_user:
                 await update.message.reply_text("❌ Сначала выполните /start для регистрации")
                 return
+            activity_tracker.touch(db_user.id)
 
             # Проверяем, не в комнате ли уже пользователь
-            current_room = room_service.get_user_current_room(db, db_user)
+            current_room = await async_room_service.get_user_current_room(db, db_user)
             if current_room:
                 await update.message.reply_text(
                     f"❌ Вы уже в комнате {current_room.id}\n"
@@ -102,7 +89,7 @@ async def create_room(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
                 return
 
             # Создаем комнату
-            room = room_service.create_room(db, db_user)
+            room = await async_room_service.create_room(db, db_user)
 
             await update.message.reply_text(
                 f"🏠 Комната создана!\n\n"
@@ -116,9 +103,13 @@ async def create_room(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
             logger.info("Room created: %s by user %s", room.id, user.id)
 
-        finally:
-            db.close()
-
+    except IntegrityError as e:
+        # Пользователь из кэша уже удален: комната нарушила внешний ключ на users
+        if user_service.forget_deleted_user(user.id, e):
+            await update.message.reply_text("❌ Сначала выполните /start для регистрации")
+            return
+        logger.error("Error creating room for user %s: %s", user.id, str(e))
+        await update.message.reply_text("❌ Произошла ошибка при создании комнаты")
     except Exception as e:
         logger.error("Error creating room for user %s: %s", user.id, str(e))
         await update.message.reply_text("❌ Произошла ошибка при создании комнаты")
@@ -144,16 +135,16 @@ async def join_room(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     room_code = args[0].upper()  # Код всегда в верхнем регистре
 
     try:
-        db = SessionLocal()
-        try:
+        async with AsyncSessionLocal() as db:
             # Получаем пользователя из БД
-            db_user = user_service.get_user_by_telegram_id(db, user.id)
+            db_user = await async_user_service.get_identity_by_telegram_id(db, user.id)
             if not db_user:
                 await update.message.reply_text("❌ Сначала выполните /start для регистрации")
                 return
+            activity_tracker.touch(db_user.id)
 
             # Проверяем, не в комнате ли уже пользователь
-            current_room = room_service.get_user_current_room(db, db_user)
+            current_room = await async_room_service.get_user_current_room(db, db_user)
             if current_room:
                 await update.message.reply_text(
                     f"❌ Вы уже в комнате {current_room.id}\n"
@@ -162,7 +153,7 @@ async def join_room(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
                 return
 
             # Присоединяемся к комнате
-            room = room_service.join_room(db, db_user, room_code)
+            room = await async_room_service.join_room(db, db_user, room_code)
 
             await update.message.reply_text(
                 f"✅ Вы присоединились к комнате `{room_code}`!\n\n"
@@ -174,9 +165,6 @@ async def join_room(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
             logger.info("User %s joined room %s", user.id, room_code)
 
-        finally:
-            db.close()
-
     except ValueError as e:
         await update.message.reply_text(f"❌ {str(e)}")
     except Exception as e:
@@ -192,22 +180,22 @@ async def leave_room(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         return
 
     try:
-        db = SessionLocal()
-        try:
+        async with AsyncSessionLocal() as db:
             # Получаем пользователя из БД
-            db_user = user_service.get_user_by_telegram_id(db, user.id)
+            db_user = await async_user_service.get_identity_by_telegram_id(db, user.id)
             if not db_user:
                 await update.message.reply_text("❌ Сначала выполните /start для регистрации")
                 return
+            activity_tracker.touch(db_user.id)
 
             # Находим текущую комнату пользователя
-            current_room = room_service.get_user_current_room(db, db_user)
+            current_room = await async_room_service.get_user_current_room(db, db_user)
             if not current_room:
                 await update.message.reply_text("❌ Вы не состоите ни в одной комнате")
                 return
 
             # Выходим из комнаты
-            room = room_service.leave_room(db, db_user, current_room.id)
+            room = await async_room_service.leave_room(db, db_user, current_room.id)
 
             await update.message.reply_text(
                 f"✅ Вы вышли из комнаты `{current_room.id}`\n\n"
@@ -217,9 +205,6 @@ async def leave_room(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
 
             logger.info("User %s left room %s", user.id, current_room.id)
 
-        finally:
-            db.close()
-
     except ValueError as e:
         await update.message.reply_text(f"❌ {str(e)}")
     except Exception as e:
@@ -235,17 +220,17 @@ async def room_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
 
     try:
-        db = SessionLocal()
-        try:
+        async with AsyncSessionLocal() as db:
             # Получаем пользователя из БД
-            db_user = user_service.get_user_by_telegram_id(db, user.id)
+            db_user = await async_user_service.get_identity_by_telegram_id(db, user.id)
             if not db_user:
                 await update.message.reply_text("❌ Сначала выполните /start для регистрации")
                 return
+            activity_tracker.touch(db_user.id)
 
-            # Находим текущую комнату пользователя
-            current_room = room_service.get_user_current_room(db, db_user)
-            if not current_room:
+            # Информация о текущей комнате пользователя (снимок из кэша или БД)
+            room_info_data = await async_room_service.get_user_room_info(db, db_user.telegram_id)
+            if not room_info_data:
                 await update.message.reply_text(
                     "❌ Вы не состоите ни в одной комнате\n\n"
                     "🏠 Создайте комнату: /create_room\n"
@@ -253,9 +238,6 @@ async def room_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
                 )
                 return
 
-            # Получаем информацию о комнате
-            room_info_data = room_service.get_room_info(db, current_room.id)
-
             # Формируем сообщение
             message = f"🏠 Комната `{room_info_data['room_code']}`\n\n"
             message += f"👥 Участники ({room_info_data['participants_count']}):\n"
@@ -270,10 +252,7 @@ async def room_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
             await update.message.reply_text(message, parse_mode='Markdown')
 
-            logger.info("Room info shown for user %s, room %s", user.id, current_room.id)
-
-        finally:
-            db.close()
+            logger.info("Room info shown for user %s, room %s", user.id, room_info_data['room_code'])
 
     except ValueError as e:
         await update.message.reply_text(f"❌ {str(e)}")
@@ -282,14 +261,44 @@ async def room_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text("❌ Произошла ошибка при получении информации о комнате")
 
 
-def build_app() -> Application:
-    if not settings.TELEGRAM_BOT_TOKEN:
-        raise RuntimeError("TELEGRAM_BOT_TOKEN не задан")
-    return Application.builder().token(settings.TELEGRAM_BOT_TOKEN).build()
+async def _dispose_db(application: Application) -> None:
+    """Закрывает соединения асинхронного пула при остановке бота"""
+    await async_engine.dispose()
 
 
-def run_polling() -> None:
-    app = build_app()
+def build_app(webhook: bool = False) -> Application:
+    """
+    Создает Application с зарегистрированными командами.
+
+    Args:
+        webhook: True — без Updater: апдейты приходят в webhook-эндпоинт FastAPI
+            и кладутся в application.update_queue (см. app/bot/webhook.py)
+    """
+    if not settings.TELEGRAM_BOT_TOKEN:
+        raise RuntimeError("TELEGRAM_BOT_TOKEN не задан")
+    builder = (
+        Application.builder()
+        .token(settings.TELEGRAM_BOT_TOKEN)
+        # Апдейты разных пользователей обрабатываются параллельно, одного пользователя — по порядку
+        .concurrent_updates(PerUserUpdateProcessor(
+            settings.BOT_CONCURRENT_UPDATES,
+            drain_timeout=settings.APP_GRACEFUL_TIMEOUT_SECONDS,
+        ))
+    )
+    if settings.TELEGRAM_API_BASE_URL:
+        # Локальная подмена Bot API (например, app.scripts.telegram_standin) для офлайн-проверки
+        builder = builder.base_url(settings.TELEGRAM_API_BASE_URL)
+    if webhook:
+        # Пул БД общий с API, его закрывает lifespan приложения
+        builder = builder.updater(None)
+    else:
+        builder = builder.post_shutdown(_dispose_db)
+    app = builder.build()
+    register_handlers(app)
+    return app
+
+
+def register_handlers(app: Application) -> None:
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_cmd))
 
@@ -299,5 +308,8 @@ def run_polling() -> None:
     app.add_handler(CommandHandler("leave_room", leave_room))
     app.add_handler(CommandHandler("room_info", room_info))
 
+
+def run_polling() -> None:
+    app = build_app()
     logger.info("Starting Telegram bot polling")
-    app.run_polling(close_loop=False)
\ No newline at end of file
+    app.run_polling(close_loop=False)
@@ -0,0 +1,119 @@
+"""
+Параллельная обработка апдейтов Telegram с сохранением порядка для каждого пользователя.
+
+По умолчанию PTB обрабатывает апдейты строго по одному. С concurrent_updates апдейты
+разных чатов обрабатываются одновременно, но тогда две быстрые команды одного
+пользователя (например, /join_room и сразу /room_info) могут выполниться в любом порядке.
+PerUserUpdateProcessor ограничивает общее количество одновременных апдейтов и при этом
+выполняет апдейты одного пользователя последовательно, в порядке поступления.
+
+PTB занимает общий слот (одно из max_concurrent_updates мест) до вызова do_process_update,
+поэтому апдейты одного пользователя не ждут друг друга внутри слота: первый апдейт
+пользователя обрабатывает его очередь, а следующие только встают в нее и сразу освобождают
+слот. Пользователь, присылающий апдейты пачкой, занимает один слот, а не все.
+
+При остановке shutdown() ждет, пока очереди будут обработаны (не дольше drain_timeout),
+и только потом закрывает оставшиеся апдейты — их количество пишется в лог.
+"""
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Optional
+
+import structlog
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from app.logging_config import logger
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Не больше max_concurrent_updates апдейтов одновременно, апдейты одного пользователя — по очереди"""
+
+    def __init__(self, max_concurrent_updates: int, drain_timeout: float = 30.0):
+        """
+        Args:
+            max_concurrent_updates: Максимум апдейтов, обрабатываемых одновременно
+            drain_timeout: Сколько секунд shutdown() ждет обработки очередей
+        """
+        super().__init__(max_concurrent_updates)
+        self.drain_timeout = drain_timeout
+        # Ключ пользователя -> очередь (контекст логов, корутина) апдейтов, ждущих обработки.
+        # Ключ есть в словаре, пока апдейты пользователя обрабатывает держатель слота
+        self._queues: dict[Any, deque] = {}
+        # Установлено, когда очередей нет (shutdown() ждет его)
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @staticmethod
+    def _key(update: object) -> Optional[Any]:
+        """Ключ очереди: пользователь, иначе чат; None — апдейт без отправителя, порядок не важен"""
+        if isinstance(update, Update):
+            if update.effective_user:
+                return ("user", update.effective_user.id)
+            if update.effective_chat:
+                return ("chat", update.effective_chat.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        # Логи обработки апдейта получают update_id и пользователя (как request_id у HTTP-запросов)
+        context = {"update_id": getattr(update, "update_id", None)}
+        key = self._key(update)
+        if key is not None:
+            context[f"{key[0]}_id"] = key[1]
+
+        if key is None:
+            with structlog.contextvars.bound_contextvars(**context):
+                await coroutine
+            return
+
+        queue = self._queues.get(key)
+        if queue is not None:
+            # Апдейты пользователя уже обрабатываются: встаем в очередь и отдаем слот другим чатам
+            queue.append((context, coroutine))
+            return
+        queue = self._queues[key] = deque([(context, coroutine)])
+        self._idle.clear()
+        try:
+            await self._drain(queue)
+        finally:
+            self._queues.pop(key, None)
+            if not self._queues:
+                self._idle.set()
+
+    @staticmethod
+    async def _drain(queue: deque) -> None:
+        """Выполняет апдейты пользователя по порядку, пока очередь не опустеет"""
+        while queue:
+            context, coroutine = queue[0]
+            with structlog.contextvars.bound_contextvars(**context):
+                try:
+                    await coroutine
+                except Exception:
+                    # Ошибка одного апдейта не должна остановить обработку следующих
+                    logger.exception("Failed to process update")
+                finally:
+                    queue.popleft()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        # Принятые апдейты не теряем: держатели слотов дообрабатывают свои очереди
+        if self._queues:
+            try:
+                async with asyncio.timeout(self.drain_timeout):
+                    await self._idle.wait()
+            except TimeoutError:
+                pass
+        # Не успевшие выполниться корутины закрываем, чтобы не было предупреждений "never awaited"
+        # (первая корутина очереди выполняется — ее завершает сама обработка)
+        dropped = 0
+        for queue in self._queues.values():
+            while len(queue) > 1:
+                _, coroutine = queue.pop()
+                coroutine.close()
+                dropped += 1
+        self._queues.clear()
+        self._idle.set()
+        if dropped:
+            logger.warning(f"Update processor shutdown: dropped {dropped} queued update(s) after {self.drain_timeout}s")
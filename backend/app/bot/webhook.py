@@ -0,0 +1,112 @@
+"""
+Webhook-режим бота (BOT_MODE=webhook): Telegram присылает апдейты POST-запросом
+в эндпоинт FastAPI, а не бот опрашивает Telegram (long polling).
+
+Бот работает в процессе API: общий пул соединений БД, общие кэши пользователей
+и комнат, и API можно масштабировать несколькими экземплярами за балансировщиком.
+Эндпоинт только кладет апдейт в очередь Application и сразу отвечает 200 —
+обработка идет в фоне (PerUserUpdateProcessor), Telegram не ждет ответа бота.
+
+- Секрет обязателен: без TELEGRAM_WEBHOOK_SECRET кто угодно мог бы прислать поддельный апдейт
+  от имени любого пользователя, поэтому в webhook-режиме без секрета приложение не стартует.
+- Webhook в Telegram регистрирует один процесс: лаунчер (app/server.py) до запуска воркеров.
+  Воркеры, запущенные лаунчером, только обрабатывают апдейты; при запуске без лаунчера
+  (uvicorn app.main:app) регистрирует единственный процесс в lifespan.
+"""
+import asyncio
+import hmac
+import os
+from typing import TYPE_CHECKING, Optional
+
+from telegram import Bot, Update
+
+from app.config import settings
+from app.logging_config import logger
+
+if TYPE_CHECKING:
+    from telegram.ext import Application
+
+# Выставляет лаунчер после регистрации webhook; воркеры наследуют окружение и не регистрируют его повторно
+REGISTERED_ENV = "APP_TELEGRAM_WEBHOOK_REGISTERED"
+
+
+def _build_app() -> "Application":
+    # Обработчики бота нужны только в webhook-режиме: API без бота их не импортирует
+    from app.bot.handlers import build_app
+    return build_app(webhook=True)
+
+
+class TelegramWebhook:
+    """Жизненный цикл Application без Updater: старт/остановка из lifespan FastAPI и прием апдейтов"""
+
+    def __init__(self):
+        self.application: Optional["Application"] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.BOT_MODE == "webhook"
+
+    def validate(self) -> None:
+        """Без секрета эндпоинт принял бы апдейты от кого угодно — такой конфиг не запускаем"""
+        if not settings.TELEGRAM_WEBHOOK_SECRET:
+            raise RuntimeError("BOT_MODE=webhook требует TELEGRAM_WEBHOOK_SECRET")
+
+    async def start(self) -> None:
+        """Инициализирует бота и запускает обработку очереди апдейтов; без лаунчера регистрирует webhook"""
+        self.validate()
+        self.application = _build_app()
+        await self.application.initialize()
+        await self.application.start()
+        if os.environ.get(REGISTERED_ENV) != "1":
+            await self._set_webhook(self.application.bot)
+
+    def register(self) -> None:
+        """
+        Регистрирует webhook в Telegram из лаунчера, один раз до запуска воркеров.
+        Воркеры получают REGISTERED_ENV в окружении и не вызывают set_webhook сами.
+        """
+        self.validate()
+
+        async def _register() -> None:
+            bot = _build_app().bot
+            async with bot:
+                await self._set_webhook(bot)
+
+        asyncio.run(_register())
+        os.environ[REGISTERED_ENV] = "1"
+
+    async def _set_webhook(self, bot: Bot) -> None:
+        if not settings.TELEGRAM_WEBHOOK_URL:
+            logger.warning("TELEGRAM_WEBHOOK_URL не задан: webhook в Telegram не зарегистрирован")
+            return
+        url = settings.TELEGRAM_WEBHOOK_URL.rstrip("/") + settings.TELEGRAM_WEBHOOK_PATH
+        await bot.set_webhook(
+            url=url,
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        logger.info(f"Telegram webhook set to {url}")
+
+    async def stop(self) -> None:
+        """Дожидается обработки уже принятых апдейтов и останавливает бота"""
+        if self.application is None:
+            return
+        await self.application.stop()
+        await self.application.shutdown()
+        self.application = None
+
+    def check_secret(self, token: Optional[str]) -> bool:
+        """Проверяет заголовок X-Telegram-Bot-Api-Secret-Token; без настроенного секрета апдейты не принимаются"""
+        if not settings.TELEGRAM_WEBHOOK_SECRET:
+            return False
+        return token is not None and hmac.compare_digest(token, settings.TELEGRAM_WEBHOOK_SECRET)
+
+    async def feed(self, payload: dict) -> None:
+        """Разбирает JSON апдейта и кладет его в очередь Application"""
+        if self.application is None:
+            raise RuntimeError("Telegram webhook не запущен")
+        update = Update.de_json(payload, self.application.bot)
+        await self.application.update_queue.put(update)
+
+
+telegram_webhook = TelegramWebhook()
@@ -1,18 +1,36 @@
 """
-Настройка SQLAlchemy в синхронном (последовательные операции) режиме
+Настройка SQLAlchemy: синхронный режим (последовательные операции) для скриптов, бота и
+обычных эндпоинтов, и асинхронный режим (asyncpg) для эндпоинтов с большим количеством
+одновременных запросов. Читающие эндпоинты могут читать с реплики (REPLICA_DATABASE_URL)
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import Optional
+
+from starlette.requests import Request  # fastapi.Request — тот же класс, без импорта всего FastAPI в процесс бота
+from starlette.responses import Response
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from app.config import settings
+from app.db_pool import engine_options, instrument_engine
+from app.logging_config import logger
+from app.metrics import registry
+from app.query_stats import instrument_queries
+from app.slow_queries import instrument_slow_queries
 
 # Создает подключение к БД, внутри объекта engine хранятся параметры доступа к БД (URL и тд)
     # Args:
         # settings.DATABASE_URL — подтягивает URL из файла конфигурации
-        # pool_pre_ping=True — проверка соединения перед использованием (важно для прода)
+        # engine_options() — размер пула, overflow, recycle, pre-ping и statement_timeout из Settings (DB_*)
         # future=True - включает интерфейс API SQAlchemy 2.0
 
     # Engine создается только один раз — при запуске приложения
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, future=True)
+engine = create_engine(settings.DATABASE_URL, future=True, **engine_options("sync"))
+# Метрики пула (занятые соединения, время ожидания, таймауты) — см. app/db_pool.py
+instrument_engine(engine, "sync")
+# Учет SQL на HTTP-запрос (количество, время, N+1) — см. app/query_stats.py
+instrument_queries(engine)
+# Журнал медленных запросов с EXPLAIN (SLOW_QUERY_LOG_ENABLED) — см. app/slow_queries.py
+instrument_slow_queries(engine)
 
 """
 Sessionmaker - фабрика для создания сессий БД
@@ -62,4 +80,220 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+"""
+Асинхронный режим (asyncpg)
+
+Синхронный эндпоинт (def) FastAPI выполняет в пуле потоков, поэтому одновременных запросов
+не больше, чем потоков в пуле. Асинхронный эндпоинт (async def) ждет ответа БД, не занимая
+поток: пока один запрос ждет PostgreSQL, event loop обслуживает другие.
+
+- async_engine — тот же PostgreSQL, но через драйвер asyncpg (свой пул соединений)
+- AsyncSessionLocal — фабрика асинхронных сессий
+- expire_on_commit=False — после commit объекты не "протухают": в async-режиме ленивая
+  подгрузка атрибутов невозможна, поэтому объекты должны оставаться читаемыми
+"""
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, **engine_options("async", asyncio=True))
+instrument_engine(async_engine.sync_engine, "async")
+instrument_queries(async_engine.sync_engine)
+instrument_slow_queries(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    """
+    Асинхронный аналог get_db() для эндпоинтов async def: Depends(get_async_db).
+    Сессия закрывается после ответа (async with), даже если эндпоинт упал с ошибкой.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+
+"""
+Чтение с реплики
+
+Если задан REPLICA_DATABASE_URL, у каждого режима две фабрики сессий:
+- writer (SessionLocal / AsyncSessionLocal) — основная БД, для записей и всего остального
+- reader (ReplicaSessionLocal / AsyncReplicaSessionLocal) — реплика, для читающих эндпоинтов
+
+Эндпоинт выбирает фабрику зависимостью: Depends(get_db) / Depends(get_async_db) — writer,
+Depends(get_read_db) / Depends(get_async_read_db) — reader. Reader-зависимость все равно
+отдает сессию основной БД, если:
+- реплика недоступна или отстает больше REPLICA_MAX_LAG_SECONDS (проверяет replica_router.check());
+- клиент еще не должен видеть реплику (read-your-writes): пишущий эндпоинт отдает в ответе
+  токен — LSN своей записи в primary (заголовок X-Write-LSN и cookie write_lsn,
+  replica_router.attach_write_token). Клиент присылает его обратно (заголовок или cookie),
+  и пока реплика не применила WAL до этого LSN (pg_last_wal_replay_lsn), чтения идут в primary.
+Токен хранится у клиента, поэтому гарантия работает при любом числе воркеров и экземпляров API.
+Записи без HTTP-клиента (бот) токена не дают: поиск пользователя, не найденного на реплике,
+повторяется в primary (см. app/api/users.py).
+"""
+replica_reads_total = registry.counter(
+    "db_replica_routing_total", "Выбор БД для читающих запросов", ["target", "reason"]
+)
+replica_available_gauge = registry.gauge("db_replica_available", "Реплика доступна (1) или нет (0)")
+replica_lag_gauge = registry.gauge("db_replica_lag_seconds", "Отставание реплики от primary")
+
+replica_engine = None
+async_replica_engine = None
+ReplicaSessionLocal = None
+AsyncReplicaSessionLocal = None
+
+if settings.REPLICA_DATABASE_URL:
+    replica_engine = create_engine(
+        settings.REPLICA_DATABASE_URL,
+        future=True,
+        **engine_options("replica", connect_timeout=settings.REPLICA_CONNECT_TIMEOUT_SECONDS),
+    )
+    instrument_engine(replica_engine, "replica")
+    instrument_queries(replica_engine)
+    instrument_slow_queries(replica_engine)
+    async_replica_engine = create_async_engine(
+        settings.ASYNC_REPLICA_DATABASE_URL,
+        **engine_options("async_replica", asyncio=True, connect_timeout=settings.REPLICA_CONNECT_TIMEOUT_SECONDS),
+    )
+    instrument_engine(async_replica_engine.sync_engine, "async_replica")
+    instrument_queries(async_replica_engine.sync_engine)
+    instrument_slow_queries(async_replica_engine.sync_engine)
+
+    ReplicaSessionLocal = sessionmaker(bind=replica_engine, autoflush=False, autocommit=False, future=True)
+    AsyncReplicaSessionLocal = async_sessionmaker(
+        bind=async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+# lag: 0, если это не standby или весь полученный WAL уже применен
+# (иначе при простое primary pg_last_xact_replay_timestamp() "стареет" без реального отставания)
+# replay_lsn: до какого места WAL реплика применила изменения; NULL, если это не standby
+REPLICA_STATUS_SQL = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END AS lag, "
+    "CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()::text END AS replay_lsn"
+)
+# Позиция WAL primary после записи — токен read-your-writes
+WRITE_LSN_SQL = text("SELECT pg_current_wal_lsn()::text")
+WRITE_TOKEN_HEADER = "X-Write-LSN"
+WRITE_TOKEN_COOKIE = "write_lsn"
+
+
+def parse_lsn(value: Optional[str]) -> Optional[int]:
+    """LSN PostgreSQL ("16/B374D848") -> число для сравнения; None, если строка некорректная"""
+    if not value:
+        return None
+    high, sep, low = value.partition("/")
+    try:
+        return (int(high, 16) << 32) | int(low, 16) if sep else None
+    except ValueError:
+        return None
+
+
+class ReplicaRouter:
+    """Решает, можно ли отдать читающему запросу сессию реплики"""
+
+    def __init__(self):
+        self.available = replica_engine is not None
+        self.lag_seconds = 0.0
+        # Применено на реплике (число, см. parse_lsn); None — база не standby, сравнивать не с чем
+        self.replay_lsn: Optional[int] = 0
+        replica_available_gauge.set_function(lambda: 1.0 if self.enabled and self.available else 0.0)
+        replica_lag_gauge.set_function(lambda: self.lag_seconds)
+
+    @property
+    def enabled(self) -> bool:
+        return replica_engine is not None
+
+    def is_replica(self, db: Session | AsyncSession) -> bool:
+        """Сессия читает с реплики (у AsyncSession get_bind() возвращает sync_engine)"""
+        if not self.enabled:
+            return False
+        return db.get_bind() in (replica_engine, async_replica_engine.sync_engine)
+
+    def write_token(self, db: Session) -> Optional[str]:
+        """LSN primary после закоммиченной записи; без реплики токен не нужен"""
+        if not self.enabled:
+            return None
+        return db.execute(WRITE_LSN_SQL).scalar()
+
+    async def async_write_token(self, db: AsyncSession) -> Optional[str]:
+        """Асинхронный write_token()"""
+        if not self.enabled:
+            return None
+        return (await db.execute(WRITE_LSN_SQL)).scalar()
+
+    @staticmethod
+    def attach_write_token(response: Response, token: Optional[str]) -> None:
+        """Отдает токен клиенту: заголовок для API-клиентов и cookie для браузера"""
+        if token is None:
+            return
+        response.headers[WRITE_TOKEN_HEADER] = token
+        response.set_cookie(
+            WRITE_TOKEN_COOKIE,
+            token,
+            max_age=int(settings.REPLICA_READ_YOUR_WRITES_SECONDS),
+            httponly=True,
+            samesite="lax",
+        )
+
+    def use_replica(self, write_lsn: Optional[int]) -> bool:
+        if not self.enabled:
+            return False
+        if not self.available:
+            reason = "replica_down"
+        elif self.lag_seconds > settings.REPLICA_MAX_LAG_SECONDS:
+            reason = "replica_lag"
+        elif write_lsn is not None and self.replay_lsn is not None and write_lsn > self.replay_lsn:
+            reason = "read_your_writes"
+        else:
+            replica_reads_total.inc(target="replica", reason="ok")
+            return True
+        replica_reads_total.inc(target="primary", reason=reason)
+        return False
+
+    def check(self) -> None:
+        """Проверяет доступность, отставание и примененный LSN реплики (вызывается фоновым воркером)"""
+        if not self.enabled:
+            return
+        try:
+            with replica_engine.connect() as connection:
+                lag, replay_lsn = connection.execute(REPLICA_STATUS_SQL).one()
+        except Exception as e:
+            if self.available:
+                logger.warning(f"Read replica is unavailable, reading from primary: {e}")
+            self.available = False
+            return
+        if not self.available:
+            logger.info("Read replica is available again")
+        self.available = True
+        self.lag_seconds = float(lag or 0.0)
+        self.replay_lsn = parse_lsn(replay_lsn)
+
+
+replica_router = ReplicaRouter()
+
+
+def _request_write_lsn(request: Request) -> Optional[int]:
+    """Токен read-your-writes из запроса: заголовок X-Write-LSN или cookie write_lsn"""
+    return parse_lsn(request.headers.get(WRITE_TOKEN_HEADER) or request.cookies.get(WRITE_TOKEN_COOKIE))
+
+
+def get_read_db(request: Request):
+    """Как get_db(), но для читающих эндпоинтов: сессия реплики, если она доступна и актуальна"""
+    use_replica = replica_router.use_replica(_request_write_lsn(request))
+    db = ReplicaSessionLocal() if use_replica else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    """Как get_async_db(), но для читающих эндпоинтов: сессия реплики, если она доступна и актуальна"""
+    use_replica = replica_router.use_replica(_request_write_lsn(request))
+    factory = AsyncReplicaSessionLocal if use_replica else AsyncSessionLocal
+    async with factory() as db:
+        yield db
@@ -0,0 +1,178 @@
+"""
+Пулы соединений SQLAlchemy: настройки из Settings и метрики пула.
+
+Синхронный engine (скрипты, фоновые потоки, часть эндпоинтов) и асинхронный
+(горячие эндпоинты и бот) имеют свои пулы. Для каждого пула собираются:
+- db_pool_size / db_pool_checked_out / db_pool_checked_in / db_pool_overflow — текущее состояние
+- db_pool_checkout_wait_seconds — сколько запрос ждал свободное соединение
+- db_pool_checkout_timeouts_total — запросы, не дождавшиеся соединения за DB_POOL_TIMEOUT
+- db_pool_connections_created_total / db_pool_invalidations_total / db_pool_pings_total
+Все метрики с меткой pool ("sync" / "async").
+"""
+import time
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.config import settings
+from app.logging_config import logger
+from app.metrics import registry
+
+# Ожидание соединения обычно близко к нулю, поэтому бакеты мельче стандартных
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+pool_size_gauge = registry.gauge("db_pool_size", "Постоянный размер пула соединений", ["pool"])
+pool_checked_out_gauge = registry.gauge("db_pool_checked_out", "Соединения, выданные из пула прямо сейчас", ["pool"])
+pool_checked_in_gauge = registry.gauge("db_pool_checked_in", "Свободные соединения в пуле", ["pool"])
+pool_overflow_gauge = registry.gauge("db_pool_overflow", "Соединения сверх pool_size (overflow)", ["pool"])
+pool_wait_seconds = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Время ожидания соединения из пула", ["pool"], buckets=POOL_WAIT_BUCKETS
+)
+pool_timeouts_total = registry.counter(
+    "db_pool_checkout_timeouts_total", "Запросы соединения, завершившиеся таймаутом пула", ["pool"]
+)
+pool_connects_total = registry.counter(
+    "db_pool_connections_created_total", "Новые соединения с БД, открытые пулом", ["pool"]
+)
+pool_invalidations_total = registry.counter(
+    "db_pool_invalidations_total", "Соединения, признанные нерабочими и закрытые", ["pool"]
+)
+pool_pings_total = registry.counter(
+    "db_pool_pings_total", "Проверки соединения перед выдачей (pre-ping)", ["pool"]
+)
+
+
+class _TimedPoolMixin:
+    """Замеряет время ожидания соединения и считает таймауты пула"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts_total.inc(pool=self.logging_name)
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started, pool=self.logging_name)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    """QueuePool синхронного engine с метриками ожидания"""
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool асинхронного engine с метриками ожидания"""
+
+
+def engine_options(pool_name: str, asyncio: bool = False, connect_timeout: Optional[int] = None) -> dict:
+    """
+    Параметры create_engine()/create_async_engine() из Settings.
+
+    Args:
+        pool_name: Метка пула в метриках и логах ("sync" / "async" / "replica" / "async_replica")
+        asyncio: True — для asyncpg (другой класс пула и способ задать statement_timeout)
+        connect_timeout: Таймаут установки соединения в секундах (None — по умолчанию драйвера)
+    """
+    options = {
+        "poolclass": TimedAsyncAdaptedQueuePool if asyncio else TimedQueuePool,
+        "pool_logging_name": pool_name,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        # "always" — проверка при каждой выдаче (лишний round trip на каждый запрос);
+        # "idle" проверяет только долго простаивавшие соединения (см. instrument_engine)
+        "pool_pre_ping": settings.DB_POOL_PRE_PING == "always",
+    }
+
+    connect_args = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if asyncio:
+            connect_args["server_settings"] = {"statement_timeout": timeout}
+        else:
+            connect_args["options"] = f"-c statement_timeout={timeout}"
+    if connect_timeout is not None:
+        connect_args["timeout" if asyncio else "connect_timeout"] = connect_timeout
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def instrument_engine(engine: Engine, pool_name: str) -> None:
+    """
+    Подключает метрики к пулу engine и, при DB_POOL_PRE_PING=idle, проверку
+    соединений, которые простаивали в пуле дольше DB_POOL_PRE_PING_IDLE_SECONDS.
+
+    Для асинхронного engine передается async_engine.sync_engine.
+    """
+    # engine.pool берется при каждом чтении: после engine.dispose() пул пересоздается
+    pool_size_gauge.set_function(lambda: engine.pool.size(), pool=pool_name)
+    pool_checked_out_gauge.set_function(lambda: engine.pool.checkedout(), pool=pool_name)
+    pool_checked_in_gauge.set_function(lambda: engine.pool.checkedin(), pool=pool_name)
+    pool_overflow_gauge.set_function(lambda: max(engine.pool.overflow(), 0), pool=pool_name)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        pool_connects_total.inc(pool=pool_name)
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        pool_invalidations_total.inc(pool=pool_name)
+
+    if settings.DB_POOL_PRE_PING != "idle":
+        return
+
+    idle_seconds = settings.DB_POOL_PRE_PING_IDLE_SECONDS
+    dialect = engine.dialect
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        if connection_record is not None:
+            connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        pool_pings_total.inc(pool=pool_name)
+        try:
+            dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            logger.warning(f"Stale connection in '{pool_name}' pool, reconnecting: {e}")
+            # Пул закроет соединение и выдаст новое
+            raise exc.DisconnectionError() from e
+
+
+def pool_saturated(engine: Engine) -> bool:
+    """Все соединения пула (включая overflow) выданы: новый запрос будет ждать соединение"""
+    if settings.DB_MAX_OVERFLOW < 0:
+        # Overflow без ограничения: пул открывает новые соединения и не ждет
+        return False
+    pool = engine.pool
+    return pool.checkedout() >= pool.size() + settings.DB_MAX_OVERFLOW
+
+
+def pool_status(engine: Engine) -> dict:
+    """Снимок состояния пула для health-эндпоинта"""
+    pool = engine.pool
+    name = pool.logging_name
+    waits = pool_wait_seconds.samples()
+    wait = next((value for labels, value in waits if labels.get("pool") == name), None)
+    return {
+        "pool": name,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "saturated": pool_saturated(engine),
+        "checkouts": wait["count"] if wait else 0,
+        "avg_wait_seconds": (wait["sum"] / wait["count"]) if wait and wait["count"] else 0.0,
+        "timeouts": pool_timeouts_total.value(pool=name),
+        "connections_created": pool_connects_total.value(pool=name),
+        "invalidations": pool_invalidations_total.value(pool=name),
+    }
@@ -1,42 +1,201 @@
 """
 Настройка логирования для Movie Tinder Bot
+
+Запись логов не блокирует обработку запросов: логгер кладет запись в очередь (QueueHandler),
+а консоль и файлы пишет отдельный поток (QueueListener). Для INFO/DEBUG можно включить
+сэмплирование (LOG_INFO_SAMPLE_RATE) и ограничение частоты с одной строки кода
+(LOG_RATE_LIMIT_PER_SECOND). При LOG_FORMAT=json записи выводятся в JSON (structlog)
+вместе с контекстом запроса (request_id и т.д., см. app/request_logging.py).
+
+Дополнительные поля записи передаются через extra:
+    logger.info("Request finished", extra={"fields": {"status": 200, "duration_ms": 12.3}})
+В JSON это отдельные ключи, в тексте — key=value в конце строки.
+
+Импорт модуля ничего не настраивает (не создает папки и файлы, не запускает поток):
+модули берут `logger` отсюда, а setup_logging() вызывается один раз при старте процесса —
+в lifespan FastAPI, в run_bot.main() или в main() скрипта. До этого логгер без хендлеров,
+и Python выводит в stderr только WARNING и выше.
 """
+import atexit
+import copy
 import logging
 import logging.handlers
 import os
+import queue
+import random
+import threading
+import time
 from pathlib import Path
+from typing import Optional
+
+import structlog
+
+from app.config import settings
+from app.metrics import registry
+
+logs_dropped_total = registry.counter(
+    "logs_dropped_total", "Лог-записи, не попавшие в лог", ["reason"]
+)
+
+# Поток, который пишет записи из очереди в консоль и файлы (один на процесс)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Выставляет лаунчер (app/server.py), когда в файлы логов пишут несколько процессов;
+# воркеры uvicorn и процесс бота наследуют окружение
+SHARED_FILES_ENV = "APP_LOG_SHARED_FILES"
+
+
+class _LogQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не блокирует вызывающий поток: при заполненной очереди запись
+    отбрасывается (и считается в logs_dropped_total), а не ждет освобождения места.
+    """
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            logs_dropped_total.inc(reason="queue_full")
+
+    def prepare(self, record):
+        # Сообщение и traceback собираются здесь, в потоке приложения, а форматирование —
+        # в потоке записи. Контекст запроса (contextvars) тоже нужно взять здесь:
+        # в потоке записи его уже нет.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        # ProcessorFormatter (JSON) очищает exc_text до обработки, поэтому копия для него
+        record.traceback_text = record.exc_text
+        record.context = structlog.contextvars.get_contextvars()
+        return record
+
+
+class _SamplingFilter(logging.Filter):
+    """Сэмплирование и ограничение частоты INFO/DEBUG-записей; WARNING и выше проходят всегда"""
+
+    def __init__(self, sample_rate: float, rate_limit_per_second: int):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit_per_second
+        self._lock = threading.Lock()
+        # (файл, строка) -> [секунда, количество записей в эту секунду]
+        self._windows: dict[tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            logs_dropped_total.inc(reason="sampled")
+            return False
+        if self.rate_limit > 0:
+            second = int(time.monotonic())
+            key = (record.pathname, record.lineno)
+            with self._lock:
+                window = self._windows.get(key)
+                if window is None or window[0] != second:
+                    if len(self._windows) > 10_000:
+                        self._windows.clear()
+                    window = self._windows[key] = [second, 0]
+                window[1] += 1
+                if window[1] > self.rate_limit:
+                    logs_dropped_total.inc(reason="rate_limited")
+                    return False
+        return True
+
+
+def _record_fields(record: logging.LogRecord) -> dict:
+    """Контекст запроса (request_id, ...) и поля из extra={"fields": {...}}"""
+    fields = dict(getattr(record, "context", None) or {})
+    fields.update(getattr(record, "fields", None) or {})
+    return fields
+
+
+def _add_record_context(logger, method_name, event_dict):
+    """Контекст запроса, поля записи и traceback, собранные в _LogQueueHandler.prepare()"""
+    record = event_dict.get("_record")
+    if record is not None:
+        for key, value in _record_fields(record).items():
+            event_dict.setdefault(key, value)
+        if getattr(record, "traceback_text", None):
+            event_dict["exception"] = record.traceback_text
+    return event_dict
+
+
+class _TextFormatter(logging.Formatter):
+    """Обычный текстовый формат + контекст и поля записи (request_id=... status=...) в конце строки"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = _record_fields(record)
+        if not fields:
+            return super().format(record)
+        # Поля вставляются до traceback, чтобы остаться в первой строке записи
+        record = copy.copy(record)
+        record.msg = f"{record.msg} [" + " ".join(f"{key}={value}" for key, value in fields.items()) + "]"
+        return super().format(record)
+
+
+def _build_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return structlog.stdlib.ProcessorFormatter(
+            foreign_pre_chain=[
+                structlog.stdlib.add_logger_name,
+                structlog.stdlib.add_log_level,
+                structlog.processors.TimeStamper(fmt="iso", utc=True),
+                _add_record_context,
+            ],
+            processors=[
+                structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                structlog.processors.JSONRenderer(ensure_ascii=False),
+            ],
+        )
+    # Формат логирования:
+    # %(asctime)s — дата и время
+    # %(name)s — имя логгера (tinder_movie)
+    # %(levelname)s — уровень логирования (DEBUG, INFO, WARNING, ERROR)
+    # %(message)s — сообщение
+    # datefmt='%Y-%m-%d %H:%M:%S' — формат даты и времени (2026-01-11 12:00:00)
+    return _TextFormatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+
+def shared_log_files() -> bool:
+    """В файлы логов пишет несколько процессов: ротация только внешняя"""
+    return settings.LOG_EXTERNAL_ROTATION or os.environ.get(SHARED_FILES_ENV) == "1"
+
+
+def _file_handler(path: str, backup_count: int) -> logging.Handler:
+    if shared_log_files():
+        return logging.handlers.WatchedFileHandler(path)
+    return logging.handlers.TimedRotatingFileHandler(path, when='midnight', interval=1, backupCount=backup_count)
 
 
 def setup_logging(log_level: str = "INFO", log_file: str = "logs/app.log") -> logging.Logger:
     """
     Настройка системы логирования
-    
+
     Args:
-        log_level: Уровень логирования 
+        log_level: Уровень логирования
         (DEBUG — детальная информация для отладки, INFO — основная информация, WARNING — предупреждения, ERROR — ошибки)
         log_file: Путь к файлу логов
-        
+
     Returns:
         Настроенный логгер
     """
+    global _listener
+
     # Создаем папку для логов
     log_path = Path(log_file)
     log_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Настройка форматирования
-    formatter = logging.Formatter(
-        """
-        Формат логирования:
-        %(asctime)s — дата и время
-        %(name)s — имя логгера (tinder_movie)
-        %(levelname)s — уровень логирования (DEBUG, INFO, WARNING, ERROR)
-        %(message)s — сообщение
-        datefmt='%Y-%m- %H:%M:%S' — формат даты и времени (2026-01-11 12:00:00)
-        """
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
+
+    # Настройка форматирования (text или json, см. LOG_FORMAT)
+    formatter = _build_formatter(settings.LOG_FORMAT)
+
     # Основной логгер
     """
     Функция logging.getLogger() создает и возвращает экземпляр класса с заданным именем:
@@ -45,7 +204,7 @@ def setup_logging(log_level: str = "INFO", log_file: str = "logs/app.log") -> lo
     если нет, то функция создаст новый логгер с именем 'tinder_movie' и вернет его экземпляр
     """
     logger = logging.getLogger('tinder_movie')
-    
+
     """
     Функция getattr() возвращает значение атрибута с именем log_level.upper() из модуля logging,
     log_level.upper() - это строка 'INFO', 'DEBUG', 'WARNING', 'ERROR' в верхнем регистре
@@ -55,27 +214,26 @@ def setup_logging(log_level: str = "INFO", log_file: str = "logs/app.log") -> lo
     После установки уровня логер не будет пропускать сообщения ниже этого уровня.
     """
     logger.setLevel(getattr(logging, log_level.upper()))
-    
-    # Очищаем существующие хендлеры
+
+    # Повторная настройка (например, из main()) заменяет прежние хендлеры и поток записи
+    stop_logging()
     logger.handlers.clear()
-    
+
     # Консольный хендлер
     """
     StreamHeandler() — это вывод логов в консоль
     setLevel() — устанавливает тот же уровень логирования, что и у логгер
     setFormatter() — применяет наш formatter
-    addHandler() — добавляет этот хендлер к логгеру, чтобы сообщения отправлялись в консоль
     """
     console_handler = logging.StreamHandler()
     console_handler.setLevel(getattr(logging, log_level.upper()))
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
+
     # Файловый хендлер (ротация по дням)
     """
     Хендлер — это компонент, который определяет куда и как записывать логи.
     TimedRotatingFileHandler() — это хендлер, который записывает логи в файл:
-    
+
         Args:
             log_file = "logs/app.log" - базовое имя файла, куда записываются логи
             when:'midnight': когда ротировать (есть секунды, минуты, часы, дни и тд)
@@ -85,32 +243,58 @@ def setup_logging(log_level: str = "INFO", log_file: str = "logs/app.log") -> lo
     Ротирование - это создание, переименование и уделание файлов логов
 
     Каждый день логер создает новый файл app.log, а предыдущий переименовывается в дату (напр. app.log.2025-11-11)
+
+    Если в файл пишут несколько процессов (воркеры uvicorn, процесс бота), каждый из них
+    переименовывал бы файл в полночь сам по себе, и записи терялись бы. Тогда используется
+    WatchedFileHandler: процессы только дописывают в файл (O_APPEND), а ротирует его внешний
+    logrotate; после переименования каждый процесс сам открывает новый файл.
     """
-    file_handler = logging.handlers.TimedRotatingFileHandler(
-        log_file,
-        when='midnight',
-        interval=1,
-        backupCount=30  # храним 30 дней
-    )
+    file_handler = _file_handler(log_file, backup_count=30)  # храним 30 дней
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
+
     # Отдельный файл только для ошибок
     error_log_file = str(log_path.parent / "errors.log")
-    error_handler = logging.handlers.TimedRotatingFileHandler(
-        # Логика создания хендлера такая же, как и в блоке выше
-        error_log_file,
-        when='midnight',
-        interval=1,
-        backupCount=90  # храним 90 дней
-    )
+    # Логика создания хендлера такая же, как и в блоке выше
+    error_handler = _file_handler(error_log_file, backup_count=90)  # храним 90 дней
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
-    logger.addHandler(error_handler)
-    
+
+    # Очередь: логгер только кладет запись в очередь, хендлеры выше работают в потоке QueueListener
+    """
+    QueueHandler — единственный хендлер логгера: logger.info() в потоке запроса стоит
+    одну операцию с очередью, а запись в консоль и файлы (I/O) делает QueueListener в своем потоке.
+    respect_handler_level=True — у каждого хендлера остается свой уровень (errors.log — только ERROR).
+    """
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = _LogQueueHandler(log_queue)
+    queue_handler.addFilter(_SamplingFilter(settings.LOG_INFO_SAMPLE_RATE, settings.LOG_RATE_LIMIT_PER_SECOND))
+    logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, error_handler, respect_handler_level=True
+    )
+    _listener.start()
+    # При выходе дописываем очередь (повторная регистрация не дублирует вызов)
+    atexit.unregister(stop_logging)
+    atexit.register(stop_logging)
+
     # Функция возвращает настроенный объект логгера
     return logger
 
-# Создаем экземпляр для импорта в другие модули
-logger = setup_logging()
\ No newline at end of file
+
+def stop_logging() -> None:
+    """Дописывает оставшиеся в очереди записи и останавливает поток записи (при завершении процесса)"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    # Без потока записи очередь никто не читает: снимаем QueueHandler с логгера
+    logging.getLogger('tinder_movie').handlers.clear()
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+# Логгер для импорта в другие модули; хендлеры добавляет setup_logging()
+logger = logging.getLogger('tinder_movie')
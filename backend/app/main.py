@@ -4,22 +4,117 @@
 
 # TODO: Написать коммент к каждому блоку кода (см. #1 в issue)
 
+import argparse
+import asyncio
+from contextlib import asynccontextmanager
+
 from dotenv import load_dotenv
 
 from app.config import settings
 from app.logging_config import setup_logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from .api.users import router as users_router
 from .api.swipes import router as swipes_router
 from .api.movies import router as movies_router
 from .api.matches import router as matches_router
 from .api.rooms import router as rooms_router
+from .api.responses import ApiJSONResponse
+from .services.room_expiry_service import room_sweeper
+from .services.activity_service import activity_flusher
+from .services.cache_bus import cache_bus
+from .services.notification_service import notification_service
+from .database import async_engine, async_replica_engine, engine, replica_engine, replica_router
+from .services.periodic import PeriodicWorker
+from .db_pool import pool_saturated, pool_status
+from .admission import AdmissionControlMiddleware
+from .metrics_multiproc import expose as expose_metrics, metrics_snapshots
+from .request_metrics import RequestMetricsMiddleware
+from .query_stats import QueryStatsMiddleware
+from .request_logging import RequestContextMiddleware
+from .bot.webhook import telegram_webhook
 from fastapi.middleware.cors import CORSMiddleware
 
+
+# Проверка доступности и отставания реплики для чтения (если REPLICA_DATABASE_URL задан)
+replica_monitor = PeriodicWorker(
+    name="replica-monitor",
+    interval=settings.REPLICA_CHECK_INTERVAL_SECONDS,
+    task=replica_router.check,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Жизненный цикл приложения: код до yield выполняется при старте сервера,
+    код после yield — при остановке. Здесь запускаются и останавливаются фоновые задачи.
+    Импорт модулей приложения ресурсов не создает: логирование и клиенты внешних API
+    настраиваются здесь, один раз на процесс.
+    """
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
+    # События изменения комнат и пользователей из других процессов (бот, другие воркеры)
+    cache_bus.start()
+    # Снимки метрик для сложения по воркерам в GET /metrics
+    if settings.METRICS_MULTIPROC_DIR:
+        metrics_snapshots.start()
+    # Очередь уведомлений о матчах; досылает уведомления, не отправленные до прошлой остановки
+    await asyncio.to_thread(notification_service.start)
+    if settings.ROOM_SWEEP_ENABLED:
+        room_sweeper.start()
+    activity_flusher.start()
+    if replica_router.enabled:
+        replica_router.check()
+        replica_monitor.start()
+    # В webhook-режиме бот работает внутри API и делит с ним пул БД и кэши
+    if telegram_webhook.enabled:
+        await telegram_webhook.start()
+    yield
+    if telegram_webhook.enabled:
+        await telegram_webhook.stop()
+    # Дожидаемся отправки уведомлений; не успевшие вернутся в БД и будут досланы после рестарта
+    await asyncio.to_thread(notification_service.stop, settings.APP_GRACEFUL_TIMEOUT_SECONDS)
+    room_sweeper.stop(timeout=30)
+    activity_flusher.stop(timeout=30)
+    replica_monitor.stop(timeout=10)
+    cache_bus.stop(timeout=5)
+    metrics_snapshots.stop(timeout=5)
+    await async_engine.dispose()
+    if async_replica_engine is not None:
+        await async_replica_engine.dispose()
+
+
 app = FastAPI(
     title="Movie Tinder API",
-    debug=settings.APP_DEBUG)
+    debug=settings.APP_DEBUG,
+    # Ответы по умолчанию сериализуются orjson (быстрее json, нативно UUID и datetime)
+    default_response_class=ApiJSONResponse,
+    lifespan=lifespan)
+
+
+"""
+Admission control: лимиты одновременных запросов по группам маршрутов и быстрые 503 с Retry-After
+при перегрузке вместо долгого ожидания соединения с БД. Добавляется до CORS, чтобы CORS был
+внешним слоем и 503 тоже получали CORS-заголовки (последний добавленный middleware — внешний).
+"""
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        pool_saturated=lambda: pool_saturated(async_engine.sync_engine) or pool_saturated(engine),
+    )
 
+"""
+Учет SQL на каждый запрос: warning в лог при превышении QUERY_BUDGET_* и при N+1
+(один и тот же SQL много раз), в development — заголовки X-DB-Statements / X-DB-Time-Ms.
+"""
+app.add_middleware(QueryStatsMiddleware)
+
+"""
+Метрики запросов (задержка по маршрутам, коды ответов, запросы в обработке) — снаружи admission
+control, чтобы отклоненные с 503 запросы и время ожидания в очереди тоже попадали в метрики.
+Читаются через GET /metrics.
+"""
+app.add_middleware(RequestMetricsMiddleware, router=app.router)
 
 """
 CORS middleware — это механизм безопасности
@@ -33,8 +128,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Клиент может прочитать X-Request-ID, чтобы сослаться на запрос в логах
+    expose_headers=["X-Request-ID"],
 )
 
+"""
+Внешний слой: request_id для всех логов запроса (включая отказы admission control
+и ошибки CORS), заголовок X-Request-ID в ответе и access-лог с длительностью.
+"""
+app.add_middleware(RequestContextMiddleware)
+
 """
 Метод .include_router() подключает маршруты (эндпоинты) из других модулей приложения
 
@@ -79,27 +182,96 @@ def health_check():
     return {"status": "ok"}
 
 
+"""
+Состояние пулов соединений с БД: сколько соединений занято, overflow, среднее ожидание
+и таймауты. Помогает подобрать DB_POOL_SIZE / DB_MAX_OVERFLOW по реальной нагрузке.
+"""
+@app.get("/health/db-pool")
+def db_pool_health():
+    pools = [pool_status(engine), pool_status(async_engine.sync_engine)]
+    if replica_router.enabled:
+        pools += [pool_status(replica_engine), pool_status(async_replica_engine.sync_engine)]
+    return {
+        "status": "ok",
+        "pools": pools,
+        "replica": {
+            "enabled": replica_router.enabled,
+            "available": replica_router.available,
+            "lag_seconds": replica_router.lag_seconds,
+        },
+    }
+
+
+"""
+Метрики в текстовом формате Prometheus: HTTP-запросы, операции сервисов
+(service_operation_seconds), пулы БД, admission control, кэши, реплика.
+Внешний сервис не нужен: можно смотреть curl-ом или подключить scrape Prometheus.
+При нескольких воркерах (METRICS_MULTIPROC_DIR) любой из них отдает сумму по всем процессам,
+gauge — с меткой pid (см. app/metrics_multiproc.py).
+"""
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(expose_metrics(), media_type="text/plain; version=0.0.4")
+
+
+"""
+Webhook Telegram (BOT_MODE=webhook): Telegram присылает каждый апдейт POST-запросом сюда.
+Апдейт кладется в очередь бота, ответ 200 возвращается сразу, не дожидаясь обработки.
+В режиме polling маршрут не регистрируется; в webhook-режиме без TELEGRAM_WEBHOOK_SECRET
+приложение не импортируется (telegram_webhook.validate), и маршрут не появляется.
+"""
+async def telegram_webhook_endpoint(
+    request: Request,
+    x_telegram_bot_api_secret_token: str | None = Header(default=None),
+):
+    if not telegram_webhook.check_secret(x_telegram_bot_api_secret_token):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    await telegram_webhook.feed(await request.json())
+    return {"ok": True}
+
+
+if telegram_webhook.enabled:
+    telegram_webhook.validate()
+    app.add_api_route(
+        settings.TELEGRAM_WEBHOOK_PATH,
+        telegram_webhook_endpoint,
+        methods=["POST"],
+        include_in_schema=False,
+    )
+
+
 def main():
-    """Основная функция запуска приложения"""
+    """Запуск API в проде: uvicorn с воркерами, при необходимости — бот (см. app/server.py)"""
     load_dotenv()
+    parser = argparse.ArgumentParser(description="Movie Tinder API")
+    parser.add_argument("--host", default=settings.APP_HOST)
+    parser.add_argument("--port", type=int, default=settings.APP_PORT)
+    parser.add_argument("--workers", type=int, default=settings.APP_WORKERS, help="0 — по числу ядер")
+    parser.add_argument("--with-bot", action="store_true", default=settings.APP_RUN_BOT,
+                        help="Запустить бота (BOT_MODE=polling) дочерним процессом")
+    parser.add_argument("--reload", action="store_true", help="Перезапуск при изменении кода (разработка, 1 воркер)")
+    args = parser.parse_args()
+
     logger = setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
 
     logger.info("=" * 50)
     logger.info("Movie Tinder Bot API - Запуск приложения")
     logger.info("=" * 50)
     logger.info(f"Режим: {'development' if settings.APP_DEBUG else 'production'}")
-    logger.info(f"Хост: {settings.APP_HOST}:{settings.APP_PORT}")
+    logger.info(f"Хост: {args.host}:{args.port}")
     logger.info(f"База данных: {settings.DATABASE_URL.split('@')[1] if '@' in settings.DATABASE_URL else 'не настроена'}")
     logger.info(f"Telegram Bot Token: {'настроен' if settings.TELEGRAM_BOT_TOKEN else 'НЕ НАСТРОЕН'}")
     logger.info("=" * 50)
 
-    print("Приложение запущено")
-    logger.info("Приложение успешно запущено")
+    # Запуск сервера (uvicorn, процесс бота) нужен только CLI: воркеры импортируют app.main
+    # ради app, и им не нужны app.server и app.run_bot
+    from .server import serve
+    serve(host=args.host, port=args.port, workers=args.workers, with_bot=args.with_bot, reload=args.reload)
 
 """
 Это защита от случайного запуска скрипта при импорте модуля:
 если мы напишем import main, то скрипт не запустится.
-Для запуска нужно явно указать python3 main.py
+Для запуска: python -m app.main (из папки backend/)
 """
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""
+Метрики приложения в памяти процесса: счетчики, gauge и гистограммы.
+
+Реестр не зависит от внешних сервисов: сервисы регистрируют метрики
+через registry.counter()/gauge()/histogram() и обновляют их на горячем пути,
+а снаружи метрики можно прочитать через registry.collect() или в текстовом
+формате Prometheus через registry.expose() (эндпоинт GET /metrics). Реестр свой
+у каждого процесса; сложение метрик воркеров — app/metrics_multiproc.py.
+
+Время операций сервисов замеряется декоратором @timed("operation") или блоком
+with track("operation"): — гистограмма service_operation_seconds{operation}.
+"""
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+# Границы бакетов гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    """Базовый класс метрики: имя, описание и набор меток (labels)."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def samples(self) -> list[tuple[dict, object]]:
+        """Возвращает снимок значений: список пар (метки, значение)."""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик (количество событий)."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """Текущее значение, которое может расти и уменьшаться.
+
+    Вместо set() можно задать функцию через set_function() —
+    тогда значение вычисляется в момент чтения (удобно для статистики пула и кэшей).
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # Метки -> функция, вычисляющая значение при чтении
+        self._functions: dict[tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        with self._lock:
+            function = self._functions.get(key)
+            if function is None:
+                return self._values.get(key, 0.0)
+        return float(function())
+
+    def samples(self) -> list[tuple[dict, object]]:
+        with self._lock:
+            functions = list(self._functions.items())
+        computed = [(dict(zip(self.labelnames, key)), float(function())) for key, function in functions]
+        keys = {key for key, _ in functions}
+        return computed + [
+            (labels, value) for labels, value in super().samples()
+            if self._key(labels) not in keys
+        ]
+
+
+class _HistogramValue:
+    """Накопленные значения одной гистограммы (для одного набора меток)."""
+
+    __slots__ = ("bucket_counts", "count", "sum")
+
+    def __init__(self, buckets_count: int):
+        self.bucket_counts = [0] * buckets_count
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    """Распределение значений по бакетам (задержки, время ожидания и т.д.)."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = _HistogramValue(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data.bucket_counts[i] += 1
+                    break
+            data.count += 1
+            data.sum += value
+
+    def samples(self) -> list[tuple[dict, object]]:
+        """Значения гистограммы: счетчики по бакетам накопительно (как в Prometheus)."""
+        result = []
+        with self._lock:
+            items = [
+                (key, list(data.bucket_counts), data.count, data.sum)
+                for key, data in self._values.items()
+            ]
+        for key, bucket_counts, count, total in items:
+            cumulative = []
+            running = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                running += bucket_count
+                cumulative.append((bound, running))
+            result.append((
+                dict(zip(self.labelnames, key)),
+                {"buckets": cumulative, "count": count, "sum": total},
+            ))
+        return result
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса. Повторная регистрация с тем же именем возвращает ту же метрику."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def collect(self) -> list[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> list[dict]:
+        """Значения всех метрик в виде словарей (для render() и снимков в app/metrics_multiproc.py)"""
+        return [
+            {
+                "name": metric.name,
+                "type": metric.type_name,
+                "help": metric.documentation,
+                "samples": metric.samples(),
+            }
+            for metric in self.collect()
+        ]
+
+    def expose(self) -> str:
+        """Все метрики в текстовом формате Prometheus (text exposition format 0.0.4)"""
+        return render(self.snapshot())
+
+
+def render(families: Iterable[dict]) -> str:
+    """Метрики из snapshot() в текстовом формате Prometheus, отсортированные по имени"""
+    lines = []
+    for family in sorted(families, key=lambda f: f["name"]):
+        name = family["name"]
+        lines.append(f"# HELP {name} {_escape_help(family['help'])}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for labels, value in family["samples"]:
+            if family["type"] == Histogram.type_name:
+                for bound, count in value["buckets"]:
+                    lines.append(_sample(f"{name}_bucket", {**labels, "le": _format_value(bound)}, count))
+                lines.append(_sample(f"{name}_bucket", {**labels, "le": "+Inf"}, value["count"]))
+                lines.append(_sample(f"{name}_sum", labels, value["sum"]))
+                lines.append(_sample(f"{name}_count", labels, value["count"]))
+            else:
+                lines.append(_sample(name, labels, value))
+    return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _sample(name: str, labels: dict, value: float) -> str:
+    if not labels:
+        return f"{name} {_format_value(value)}"
+    rendered = ",".join(f'{label}="{_escape_label(str(label_value))}"' for label, label_value in labels.items())
+    return f"{name}{{{rendered}}} {_format_value(value)}"
+
+
+# Общий реестр для всего процесса
+registry = MetricsRegistry()
+
+service_operation_seconds = registry.histogram(
+    "service_operation_seconds", "Время операций сервисов (свайп, проверка матча, Kinopoisk, уведомления)", ["operation"]
+)
+service_operation_errors_total = registry.counter(
+    "service_operation_errors_total", "Операции сервисов, завершившиеся исключением", ["operation"]
+)
+
+
+@contextmanager
+def track(operation: str):
+    """Замеряет время блока: with track("catalog_refill"): ..."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        service_operation_errors_total.inc(operation=operation)
+        raise
+    finally:
+        service_operation_seconds.observe(time.perf_counter() - started, operation=operation)
+
+
+def timed(operation: str):
+    """Декоратор: замеряет время вызова функции (обычной или async) как операцию operation"""
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with track(operation):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with track(operation):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,120 @@
+"""
+Метрики нескольких процессов (воркеры uvicorn, процесс бота) в одном ответе GET /metrics.
+
+Реестр app/metrics.py живет в памяти процесса, а запрос scrape попадает в случайный воркер.
+Если задан METRICS_MULTIPROC_DIR, каждый процесс раз в METRICS_SNAPSHOT_INTERVAL_SECONDS
+(и при остановке) записывает снимок своих метрик в metrics_<pid>.json, а /metrics любого
+воркера обновляет свой снимок и складывает все:
+- counter и histogram суммируются, включая снимки завершившихся процессов (счетчики не убывают);
+- gauge отдаются отдельно для каждого живого процесса с меткой pid.
+Снимки других процессов отстают не больше чем на METRICS_SNAPSHOT_INTERVAL_SECONDS.
+
+Каталог должен быть локальным для хоста (pid проверяется через os.kill) и очищается
+при запуске сервера (app/server.py). Без METRICS_MULTIPROC_DIR /metrics отдает метрики
+только своего процесса.
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+from app.metrics import Histogram, registry, render
+from app.services.periodic import PeriodicWorker
+
+SNAPSHOT_PREFIX = "metrics_"
+
+
+def _snapshot_path(directory: str, pid: int) -> Path:
+    return Path(directory) / f"{SNAPSHOT_PREFIX}{pid}.json"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+def write_snapshot(directory: Optional[str] = None) -> None:
+    """Записывает снимок метрик процесса атомарно (временный файл + rename)"""
+    directory = directory or settings.METRICS_MULTIPROC_DIR
+    path = _snapshot_path(directory, os.getpid())
+    with tempfile.NamedTemporaryFile("w", dir=directory, prefix=".tmp_", suffix=".json", delete=False) as file:
+        json.dump(registry.snapshot(), file)
+    os.replace(file.name, path)
+
+
+def merge(directory: str) -> list[dict]:
+    """Складывает снимки всех процессов из каталога в семейства метрик для render()"""
+    merged: dict[str, dict] = {}
+    for path in sorted(Path(directory).glob(f"{SNAPSHOT_PREFIX}*.json")):
+        try:
+            pid = int(path.stem[len(SNAPSHOT_PREFIX):])
+            families = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # Файл удалили или он чужой — пропускаем
+            continue
+        alive = pid == os.getpid() or _pid_alive(pid)
+        for family in families:
+            target = merged.setdefault(family["name"], {**family, "samples": {}})
+            samples = target["samples"]
+            for labels, value in family["samples"]:
+                if family["type"] == "gauge":
+                    if not alive:
+                        continue
+                    labels = {**labels, "pid": str(pid)}
+                key = tuple(sorted(labels.items()))
+                current = samples.get(key)
+                if current is None:
+                    samples[key] = (labels, value)
+                elif family["type"] == Histogram.type_name:
+                    _, total = current
+                    samples[key] = (labels, {
+                        "buckets": [
+                            (bound, count + other)
+                            for (bound, count), (_, other) in zip(total["buckets"], value["buckets"])
+                        ],
+                        "count": total["count"] + value["count"],
+                        "sum": total["sum"] + value["sum"],
+                    })
+                else:
+                    samples[key] = (labels, current[1] + value)
+    return [{**family, "samples": list(family["samples"].values())} for family in merged.values()]
+
+
+def expose() -> str:
+    """Текст для GET /metrics: сумма по всем процессам или метрики только этого процесса"""
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return registry.expose()
+    write_snapshot(directory)
+    return render(merge(directory))
+
+
+def prepare_directory() -> str:
+    """
+    Готовит каталог снимков перед запуском воркеров: создает (по умолчанию — временный)
+    и удаляет снимки прошлого запуска. Путь передается воркерам через окружение.
+    """
+    directory = settings.METRICS_MULTIPROC_DIR or tempfile.mkdtemp(prefix="movie-tinder-metrics-")
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    for path in Path(directory).glob(f"{SNAPSHOT_PREFIX}*.json"):
+        path.unlink(missing_ok=True)
+    os.environ["METRICS_MULTIPROC_DIR"] = directory
+    settings.METRICS_MULTIPROC_DIR = directory
+    return directory
+
+
+# Периодическая запись снимка метрик процесса (запускается, если задан METRICS_MULTIPROC_DIR)
+metrics_snapshots = PeriodicWorker(
+    name="metrics-snapshot",
+    interval=settings.METRICS_SNAPSHOT_INTERVAL_SECONDS,
+    task=write_snapshot,
+    run_on_stop=True,
+)
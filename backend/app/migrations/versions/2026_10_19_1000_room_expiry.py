@@ -0,0 +1,97 @@
+"""room expiry: last activity and archive tables
+
+Revision ID: 2026_10_19_1000
+Revises: 2025_12_06_1400
+Create Date: 2026-10-19 10:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2026_10_19_1000"
+down_revision: Union[str, None] = "2025_12_06_1400"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # rooms: время последней активности (для существующих комнат — now())
+    op.add_column(
+        "rooms",
+        sa.Column(
+            "last_activity_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+        ),
+    )
+    op.create_index("idx_rooms_last_activity_at", "rooms", ["last_activity_at"], unique=False)
+    # GIN-индекс для поиска комнаты участника (participants @> [telegram_id])
+    op.create_index(
+        "idx_rooms_participants",
+        "rooms",
+        ["participants"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+    # user_swipes_archive
+    op.create_table(
+        "user_swipes_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("movie_id", postgresql.UUID(as_uuid=True), nullable=False),
+        # Как в user_swipes: varchar, а не ENUM (native_enum=False)
+        sa.Column("swipe_type", sa.Enum(name="swipe_type", native_enum=False), nullable=False),
+        sa.Column("swiped_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("group_participants", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("room_id", sa.String(), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("idx_user_swipes_archive_archived_at", "user_swipes_archive", ["archived_at"], unique=False)
+
+    # matches_archive
+    op.create_table(
+        "matches_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column("movie_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("matched_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("is_notified", sa.Boolean(), nullable=False),
+        sa.Column("group_participants", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("room_id", sa.String(), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("idx_matches_archive_archived_at", "matches_archive", ["archived_at"], unique=False)
+
+    # retired_groups: прежние составы групп, которые очистка проверит через SESSION_DURATION_HOURS
+    op.create_table(
+        "retired_groups",
+        sa.Column("participants", postgresql.JSONB(astext_type=sa.Text()), primary_key=True, nullable=False),
+        sa.Column("retired_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("idx_retired_groups_retired_at", "retired_groups", ["retired_at"], unique=False)
+    # Составы, накопленные до миграции; составы живых комнат очистка просто снимет с учета
+    op.execute(
+        "INSERT INTO retired_groups (participants) "
+        "SELECT DISTINCT group_participants FROM user_swipes ON CONFLICT DO NOTHING"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_retired_groups_retired_at", table_name="retired_groups")
+    op.drop_table("retired_groups")
+
+    op.drop_index("idx_matches_archive_archived_at", table_name="matches_archive")
+    op.drop_table("matches_archive")
+
+    op.drop_index("idx_user_swipes_archive_archived_at", table_name="user_swipes_archive")
+    op.drop_table("user_swipes_archive")
+
+    op.drop_index("idx_rooms_participants", table_name="rooms")
+    op.drop_index("idx_rooms_last_activity_at", table_name="rooms")
+    op.drop_column("rooms", "last_activity_at")
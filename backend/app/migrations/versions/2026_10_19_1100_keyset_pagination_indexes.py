@@ -0,0 +1,49 @@
+"""keyset pagination indexes
+
+Revision ID: 2026_10_19_1100
+Revises: 2026_10_19_1000
+Create Date: 2026-10-19 11:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2026_10_19_1100"
+down_revision: Union[str, None] = "2026_10_19_1000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Индексы под ORDER BY (sort, id) keyset-пагинации (app/pagination.py)
+    op.create_index("idx_movies_created_at_id", "movies", ["created_at", "id"], unique=False)
+    op.create_index("idx_matches_matched_at_id", "matches", ["matched_at", "id"], unique=False)
+
+    # users: неизменный ключ пагинации (last_active постоянно переписывается);
+    # существующим строкам — время миграции
+    op.add_column(
+        "users",
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("idx_users_created_at_id", "users", ["created_at", "id"], unique=False)
+
+    # Свайпы пользователя: (user_id, swiped_at, id) покрывает и поиск по user_id
+    op.create_index(
+        "idx_user_swipes_user_swiped_at", "user_swipes", ["user_id", "swiped_at", "id"], unique=False
+    )
+    op.drop_index("idx_user_swipes_user_id", table_name="user_swipes")
+
+
+def downgrade() -> None:
+    op.create_index("idx_user_swipes_user_id", "user_swipes", ["user_id"], unique=False)
+    op.drop_index("idx_user_swipes_user_swiped_at", table_name="user_swipes")
+
+    op.drop_index("idx_users_created_at_id", table_name="users")
+    op.drop_column("users", "created_at")
+
+    op.drop_index("idx_matches_matched_at_id", table_name="matches")
+    op.drop_index("idx_movies_created_at_id", table_name="movies")
@@ -0,0 +1,33 @@
+"""pending match notifications index
+
+Revision ID: 2026_10_19_1200
+Revises: 2026_10_19_1100
+Create Date: 2026-10-19 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2026_10_19_1200"
+down_revision: Union[str, None] = "2026_10_19_1100"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Частичный индекс: при старте ищутся только матчи с неотправленными уведомлениями
+    op.create_index(
+        "idx_matches_pending_notification",
+        "matches",
+        ["matched_at"],
+        unique=False,
+        postgresql_where=sa.text("is_notified IS false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_matches_pending_notification", table_name="matches")
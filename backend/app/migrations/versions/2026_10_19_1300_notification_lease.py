@@ -0,0 +1,27 @@
+"""match notification lease
+
+Revision ID: 2026_10_19_1300
+Revises: 2026_10_19_1200
+Create Date: 2026-10-19 13:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2026_10_19_1300"
+down_revision: Union[str, None] = "2026_10_19_1200"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Аренда неотправленного уведомления: до этого момента матч отправляет забравший его процесс
+    op.add_column("matches", sa.Column("notify_lease_until", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("matches", "notify_lease_until")
@@ -0,0 +1,74 @@
+"""Архивные таблицы для свайпов и матчей истекших комнат.
+
+Горячие таблицы user_swipes и matches содержат только данные живых сессий,
+а история истекших комнат и прежних составов групп переносится сюда
+фоновой очисткой (room_expiry_service).
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, Column, DateTime, Enum, Index, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+from app.database import Base
+from app.models.swipe import SwipeType
+
+
+class UserSwipeArchive(Base):
+    """
+    Свайп из истекшей комнаты. Колонки повторяют user_swipes + room_id и archived_at:
+    типы те же, что в БД у user_swipes (swipe_type — varchar, group_participants — jsonb),
+    поэтому перенос INSERT ... SELECT обходится без приведения типов.
+    """
+    __tablename__ = "user_swipes_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    movie_id = Column(UUID(as_uuid=True), nullable=False)
+    swipe_type = Column(Enum(SwipeType, name="swipe_type", native_enum=False), nullable=False)
+    swiped_at = Column(DateTime(timezone=True), nullable=False)
+    group_participants = Column(JSONB, nullable=False)
+    room_id = Column(String, nullable=True)  # Код истекшей комнаты
+    archived_at = Column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        Index("idx_user_swipes_archive_archived_at", "archived_at"),
+    )
+
+
+class MatchArchive(Base):
+    """Матч из истекшей комнаты. Колонки повторяют matches + room_id и archived_at."""
+    __tablename__ = "matches_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    movie_id = Column(UUID(as_uuid=True), nullable=False)
+    matched_at = Column(DateTime(timezone=True), nullable=False)
+    is_notified = Column(Boolean, nullable=False)
+    group_participants = Column(JSONB, nullable=False)
+    room_id = Column(String, nullable=True)
+    archived_at = Column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        Index("idx_matches_archive_archived_at", "archived_at"),
+    )
+
+
+class RetiredGroup(Base):
+    """
+    Прежний состав группы: отмечается, когда участник входит в комнату или выходит из нее
+    (room_service). Свайпы и матчи состава больше не совпадают с комнатой, и очистка
+    переносит их в архив, если состав не вернулся ни в одну комнату за SESSION_DURATION_HOURS.
+    """
+    __tablename__ = "retired_groups"
+
+    participants = Column(JSONB, primary_key=True)  # Отсортированный список telegram_id
+    retired_at = Column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        Index("idx_retired_groups_retired_at", "retired_at"),
+    )
@@ -18,8 +18,10 @@ from sqlalchemy import JSON, Boolean, Column, DateTime, ForeignKey, Index, Uniqu
         # напр., в нашем случае в одном мэтче не можем быть двух одинаковых 
         # movie_id (фильма) и group_participants (списка участников)
 from sqlalchemy.dialects.postgresql import UUID  # Тип данных в PostgreSQL 
+from sqlalchemy.orm import relationship  # Связь между моделями (match.movie)
 
 from app.database import Base  # Общий родительский класс, от него наследуются все модели
+from app.models.movie import Movie
 
 
 class Match(Base):
@@ -42,8 +44,17 @@ class Match(Base):
     is_notified = Column(Boolean, default=False, nullable=False)
         # Boolean: тип данных True/False
         # default=False: по умолчанию, когда мэтч только случился, уведомление еще не отправлено, поэтому False
+        # True ставится только после успешной отправки (NotificationService)
+    notify_lease_until = Column(DateTime(timezone=True), nullable=True)
+        # Аренда отправки: пока время не наступило, уведомление отправляет забравший матч процесс;
+        # NULL или прошедшее время — матч может забрать любой процесс (resume_pending)
     group_participants = Column(JSON, nullable=False)
         # JSON: тип данных, который хранит список/массив в БД, в нашем случае это список telegram_id участников группы
+    movie = relationship(Movie)
+        # relationship: объект Movie по movie_id (match.movie)
+        # В синхронной сессии подгружается при первом обращении отдельным запросом;
+        # в асинхронной ленивая загрузка невозможна, поэтому запросы матчей загружают фильм
+        # заранее через selectinload (см. MatchService.movie_options)
     
     # Настройка правил для таблицы
     __table_args__ = (
@@ -51,4 +62,8 @@ class Match(Base):
         # name="uq_match_movie_group" — имя этого правила в БД
         UniqueConstraint("movie_id", "group_participants", name="uq_match_movie_group"),
         Index("idx_matches_group_participants", "group_participants", postgresql_using="gin"),
+        # Keyset-пагинация матчей: ORDER BY matched_at DESC, id DESC
+        Index("idx_matches_matched_at_id", "matched_at", "id"),
+        # Неотправленные уведомления, которые подхватываются при старте (NotificationService.resume_pending)
+        Index("idx_matches_pending_notification", "matched_at", postgresql_where=is_notified.is_(False)),
     )
@@ -2,13 +2,20 @@
 import uuid  # Генерация уникальных id для записи в таблице
 from datetime import datetime, timezone  # Время по Гринвичу (всемирное координированное время)
 
-from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Float, Index, Integer, String, Text
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import deferred
 
 from app.database import Base
 
 
 class Movie(Base):
+    """Фильм из каталога.
+
+    description (длинный Text) отложенный: обычный SELECT его не читает. Эндпоинты,
+    которым он нужен, загружают его явно (MovieService.load_options / undefer),
+    в синхронной сессии обращение к незагруженному полю догружает его отдельным запросом.
+    """
     __tablename__ = "movies"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -18,9 +25,14 @@ class Movie(Base):
     year = Column(Integer, nullable=False)
     genre = Column(String, nullable=False)
     poster_url = Column(String, nullable=False)
-    description = Column(Text, nullable=True)
+    description = deferred(Column(Text, nullable=True))
     rating = Column(Float, nullable=True)
     created_at = Column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
     )
     is_active = Column(Boolean, default=True, nullable=False)  # Статус фильма - отображается или скрыт
+
+    __table_args__ = (
+        # Keyset-пагинация list_movies() / iter_movies(): ORDER BY created_at, id
+        Index("idx_movies_created_at_id", "created_at", "id"),
+    )
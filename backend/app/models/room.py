@@ -13,6 +13,9 @@ class Room(Base):
 
     participants — список telegram_id участников комнаты (хранится как JSON,
     а не отдельная таблица, для простоты и скорости чтения состава группы).
+
+    last_activity_at — время последней активности в комнате (вход/выход, свайпы).
+    Комнаты без активности дольше SESSION_DURATION_HOURS удаляются фоновой очисткой.
     """
     __tablename__ = "rooms"
 
@@ -22,8 +25,13 @@ class Room(Base):
     created_at = Column(
         DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
     )
+    last_activity_at = Column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
 
     __table_args__ = (
         Index("idx_rooms_creator_id", "creator_id"),
         Index("idx_rooms_created_at", "created_at"),
+        Index("idx_rooms_last_activity_at", "last_activity_at"),
+        Index("idx_rooms_participants", "participants", postgresql_using="gin"),
     )
@@ -29,13 +29,16 @@ class UserSwipe(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     movie_id = Column(UUID(as_uuid=True), ForeignKey("movies.id", ondelete="CASCADE"), nullable=False)
-    swipe_type = Column(Enum(SwipeType, name="swipe_type"), nullable=False)
+    # В БД колонка varchar (миграция initial, native_enum=False); с native ENUM asyncpg передавал бы
+    # параметры как тип swipe_type, и сравнение varchar = swipe_type падало бы
+    swipe_type = Column(Enum(SwipeType, name="swipe_type", native_enum=False), nullable=False)
     swiped_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
     group_participants = Column(JSON, nullable=False)
 
     __table_args__ = (
         UniqueConstraint("user_id", "movie_id", "group_participants", name="uq_swipe_user_movie_group"),
-        Index("idx_user_swipes_user_id", "user_id"),
+        # Свайпы пользователя с keyset-пагинацией по (swiped_at, id); префикс user_id заменяет отдельный индекс
+        Index("idx_user_swipes_user_swiped_at", "user_id", "swiped_at", "id"),
     )
 
 
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import BigInteger, Column, DateTime, String
+from sqlalchemy import BigInteger, Column, DateTime, Index, String, func
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.database import Base
@@ -12,6 +12,7 @@ class User(Base):
 
     last_active — время последней активности, используется для отслеживания
     активных пользователей.
+    created_at — время регистрации, неизменный ключ keyset-пагинации.
     """
     __tablename__ = "users"
 
@@ -22,3 +23,12 @@ class User(Base):
     last_active = Column(
         DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
     )
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+
+    __table_args__ = (
+        # Keyset-пагинация list_users() / iter_users(): ORDER BY created_at, id
+        Index("idx_users_created_at_id", "created_at", "id"),
+    )
@@ -0,0 +1,106 @@
+"""
+Keyset (cursor) пагинация списков.
+
+LIMIT/OFFSET заставляет PostgreSQL прочитать и выбросить все строки предыдущих страниц,
+поэтому чем глубже страница, тем она медленнее. Keyset-пагинация продолжает выборку
+сразу после последней строки предыдущей страницы:
+
+    WHERE (sort, id) < (:sort, :id) ORDER BY sort DESC, id DESC LIMIT :n
+
+С индексом по (sort, id) каждая страница стоит одинаково. id в ключе нужен, чтобы строки
+с одинаковым временем не терялись и не повторялись на границе страниц.
+
+Курсор для клиента непрозрачный: base64url от [значение сортировки, id] последней строки.
+"""
+import base64
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Generic, Iterator, Optional, Sequence, TypeVar
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+
+class InvalidCursor(ValueError):
+    """Курсор поврежден или выдан не этим списком"""
+
+
+@dataclass
+class Page(Generic[T]):
+    """Страница списка; next_cursor=None — страница последняя"""
+    items: list[T]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(sort_value: datetime, id_value) -> str:
+    raw = json.dumps([sort_value.isoformat(), str(id_value)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """
+    Raises:
+        InvalidCursor: Если курсор не удается разобрать
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, id_value = json.loads(raw)
+        return datetime.fromisoformat(sort_value), uuid.UUID(id_value)
+    except (ValueError, TypeError, AttributeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def keyset_stmt(stmt: Select, sort_col, id_col, limit: int, cursor: Optional[str] = None, descending: bool = True) -> Select:
+    """
+    Добавляет к запросу условие курсора, сортировку по (sort_col, id_col) и LIMIT.
+
+    Выбирается limit + 1 строка: лишняя строка означает, что есть следующая страница (см. make_page).
+
+    Args:
+        stmt: select(...) с фильтрами списка, без order_by/limit
+        sort_col: Колонка сортировки (created_at / swiped_at / matched_at ...)
+        id_col: Первичный ключ (разрешает равные значения sort_col)
+        limit: Размер страницы
+        cursor: next_cursor предыдущей страницы (None — первая страница)
+        descending: True — новые первыми
+    """
+    if cursor is not None:
+        key = tuple_(sort_col, id_col)
+        bound = decode_cursor(cursor)
+        stmt = stmt.where(key < bound if descending else key > bound)
+    if descending:
+        stmt = stmt.order_by(sort_col.desc(), id_col.desc())
+    else:
+        stmt = stmt.order_by(sort_col.asc(), id_col.asc())
+    return stmt.limit(limit + 1)
+
+
+def make_page(rows: Sequence[T], limit: int, sort_attr: str) -> Page[T]:
+    """Страница из результата keyset_stmt(): next_cursor строится по последней строке страницы"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return Page(rows)
+    items = rows[:limit]
+    last = items[-1]
+    return Page(items, encode_cursor(getattr(last, sort_attr), last.id))
+
+
+def iter_keyset(db: Session, stmt: Select, sort_col, id_col, batch_size: int = 500) -> Iterator:
+    """
+    Потоково обходит всю выборку пачками по batch_size (по возрастанию (sort_col, id_col)).
+
+    Для скриптов: в памяти одновременно не больше одной пачки строк,
+    и каждая пачка читается по индексу так же быстро, как первая.
+    """
+    cursor = None
+    while True:
+        rows = db.execute(keyset_stmt(stmt, sort_col, id_col, batch_size, cursor, descending=False)).scalars().all()
+        page = make_page(rows, batch_size, sort_col.key)
+        yield from page.items
+        if page.next_cursor is None:
+            return
+        cursor = page.next_cursor
@@ -0,0 +1,184 @@
+"""
+Учет SQL-запросов на один HTTP-запрос: количество, суммарное время в БД и N+1.
+
+Слушатели before/after_cursor_execute на всех engine (instrument_queries) пишут каждый
+выполненный statement в QueryStats текущего запроса (ContextVar). QueryStatsMiddleware
+создает QueryStats на запрос и после ответа:
+- пишет warning, если запрос превысил QUERY_BUDGET_STATEMENTS или QUERY_BUDGET_DB_TIME_MS;
+- пишет warning о N+1, если один и тот же SQL выполнился QUERY_N_PLUS_ONE_THRESHOLD раз и больше
+  (типично — ленивая загрузка связи в цикле);
+- при QUERY_STATS_HEADERS добавляет заголовки X-DB-Statements / X-DB-Time-Ms / X-DB-Repeated.
+
+Для тестов — query_budget(): with query_budget(3): client.post("/api/swipes/", ...)
+падает с AssertionError, если запросы внутри блока выполнили больше 3 statements.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.logging_config import logger
+from app.metrics import registry
+
+db_statements_per_request = registry.histogram(
+    "db_statements_per_request", "SQL statements на один HTTP-запрос", ["route"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+db_time_per_request_seconds = registry.histogram(
+    "db_time_per_request_seconds", "Суммарное время SQL на один HTTP-запрос", ["route"]
+)
+db_n_plus_one_total = registry.counter(
+    "db_n_plus_one_total", "HTTP-запросы с повторяющимся одинаковым SQL (N+1)", ["route"]
+)
+
+
+class QueryStats:
+    """SQL statements, выполненные в рамках одного запроса (или блока query_budget)"""
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.by_statement: Counter[str] = Counter()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.statements += 1
+        self.db_time += elapsed
+        self.by_statement[statement] += 1
+
+    def repeated(self, threshold: Optional[int] = None) -> list[tuple[str, int]]:
+        """Одинаковые statements, выполненные threshold раз и больше (кандидаты в N+1)"""
+        threshold = threshold or settings.QUERY_N_PLUS_ONE_THRESHOLD
+        return [(sql, count) for sql, count in self.by_statement.most_common() if count >= threshold]
+
+    def merge(self, other: "QueryStats") -> None:
+        self.statements += other.statements
+        self.db_time += other.db_time
+        self.by_statement.update(other.by_statement)
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Подписчики на статистику завершенных HTTP-запросов (query_budget)
+_observers: list[Callable[[QueryStats], None]] = []
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def instrument_queries(engine: Engine) -> None:
+    """Подключает учет statements к engine (для асинхронного — async_engine.sync_engine)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(connection, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            connection.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(connection, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is None:
+            return
+        started = connection.info.get("query_started")
+        if not started:
+            return
+        stats.record(statement, time.perf_counter() - started.pop())
+
+
+def _shorten(statement: str, limit: int = 200) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware: считает SQL каждого HTTP-запроса, логирует превышение бюджета и N+1"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.QUERY_STATS_HEADERS:
+                headers = list(message.get("headers", []))
+                headers += [
+                    (b"x-db-statements", str(stats.statements).encode()),
+                    (b"x-db-time-ms", f"{stats.db_time * 1000:.1f}".encode()),
+                    (b"x-db-repeated", str(len(stats.repeated())).encode()),
+                ]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._report(scope, stats)
+
+    @staticmethod
+    def _report(scope, stats: QueryStats) -> None:
+        route = getattr(scope.get("route"), "path", "<unmatched>")
+        if stats.statements:
+            db_statements_per_request.observe(stats.statements, route=route)
+            db_time_per_request_seconds.observe(stats.db_time, route=route)
+
+        request = f"{scope.get('method')} {scope.get('path')}"
+        db_time_ms = stats.db_time * 1000
+        if stats.statements > settings.QUERY_BUDGET_STATEMENTS or db_time_ms > settings.QUERY_BUDGET_DB_TIME_MS:
+            logger.warning(
+                f"Query budget exceeded: {request} ran {stats.statements} statements "
+                f"in {db_time_ms:.1f} ms (budget {settings.QUERY_BUDGET_STATEMENTS} / {settings.QUERY_BUDGET_DB_TIME_MS:g} ms)"
+            )
+        repeated = stats.repeated()
+        if repeated:
+            db_n_plus_one_total.inc(route=route)
+            sql, count = repeated[0]
+            logger.warning(f"Possible N+1 in {request}: same statement executed {count} times: {_shorten(sql)}")
+
+        for observer in list(_observers):
+            observer(stats)
+
+
+@contextmanager
+def query_budget(max_statements: int, allow_repeated: bool = False):
+    """
+    Проверка бюджета запросов для pytest.
+
+    Считает statements, выполненные внутри блока: и в HTTP-запросах через
+    TestClient (через QueryStatsMiddleware), и при прямых вызовах сервисов.
+
+        with query_budget(4):
+            client.post("/api/swipes/", json=..., headers=...)
+
+    Raises:
+        AssertionError: Если statements больше max_statements или (без allow_repeated) найден N+1
+    """
+    total = QueryStats()
+    _observers.append(total.merge)
+    direct = QueryStats()
+    token = _current.set(direct)
+    try:
+        yield total
+    finally:
+        _current.reset(token)
+        _observers.remove(total.merge)
+    total.merge(direct)
+
+    assert total.statements <= max_statements, (
+        f"Query budget exceeded: {total.statements} statements > {max_statements}\n"
+        + "\n".join(f"{count}x {_shorten(sql)}" for sql, count in total.by_statement.most_common())
+    )
+    if not allow_repeated:
+        repeated = total.repeated()
+        assert not repeated, "Possible N+1:\n" + "\n".join(f"{count}x {_shorten(sql)}" for sql, count in repeated)
@@ -0,0 +1,89 @@
+"""
+Контекст запроса для логов и access-лог.
+
+RequestContextMiddleware присваивает каждому HTTP-запросу request_id (берет заголовок
+X-Request-ID клиента или прокси, иначе генерирует) и кладет его в contextvars structlog:
+все записи логгера tinder_movie во время запроса получают request_id (и telegram_id,
+если он есть в заголовке), а ответ — заголовок X-Request-ID.
+
+После ответа пишется строка access-лога с методом, маршрутом, кодом ответа и duration_ms.
+Быстрые успешные запросы сэмплируются (LOG_ACCESS_SAMPLE_RATE), ошибки 5xx и запросы
+дольше LOG_ACCESS_SLOW_MS пишутся всегда (уровень WARNING).
+"""
+import random
+import re
+import time
+import uuid
+
+import structlog
+
+from app.config import settings
+from app.logging_config import logger
+
+# Принимаем чужой request id, только если он короткий и безопасный для логов и заголовков
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+_SKIP_ACCESS_LOG = ("/metrics",)
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+class RequestContextMiddleware:
+    """ASGI middleware: request_id в контексте логов и в ответе, access-лог с длительностью"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _header(scope, b"x-request-id")
+        if not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        context = {"request_id": request_id}
+        telegram_id = _header(scope, b"telegram-id")
+        if telegram_id.isdigit():
+            context["telegram_id"] = int(telegram_id)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", request_id.encode())]}
+            await send(message)
+
+        with structlog.contextvars.bound_contextvars(**context):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._access_log(scope, status, (time.perf_counter() - started) * 1000)
+
+    @staticmethod
+    def _access_log(scope, status: int, duration_ms: float) -> None:
+        path = scope.get("path", "")
+        if path.startswith(_SKIP_ACCESS_LOG):
+            return
+        notable = status >= 500 or duration_ms >= settings.LOG_ACCESS_SLOW_MS
+        if not notable and random.random() >= settings.LOG_ACCESS_SAMPLE_RATE:
+            return
+        fields = {
+            "method": scope.get("method"),
+            "path": path,
+            "route": getattr(scope.get("route"), "path", None),
+            "status": status,
+            "duration_ms": round(duration_ms, 1),
+        }
+        message = f"{fields['method']} {path} {status} {fields['duration_ms']}ms"
+        if notable:
+            logger.warning(message, extra={"fields": fields})
+        else:
+            logger.info(message, extra={"fields": fields})
@@ -0,0 +1,75 @@
+"""
+Метрики HTTP-запросов: задержка, коды ответов и запросы в обработке по маршрутам.
+
+Метка route — шаблон пути из роутера FastAPI (/api/movies/{id}), а не сам путь,
+чтобы число рядов метрик не росло с каждым новым id. Запросы, не совпавшие ни с одним
+маршрутом, попадают в route="<unmatched>".
+
+Метрики читаются через GET /metrics вместе с остальными (app/metrics.py).
+"""
+import time
+from typing import Optional
+
+from starlette.routing import Match
+
+from app.metrics import registry
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP-запросы по маршруту и коду ответа", ["method", "route", "status"]
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ["method", "route"]
+)
+http_requests_in_progress = registry.gauge(
+    "http_requests_in_progress", "HTTP-запросы, обрабатываемые сейчас", ["method", "route"]
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware: замеряет каждый HTTP-запрос от получения до отправки тела ответа.
+
+    router — роутер приложения (app.router), по нему определяется шаблон маршрута
+    до обработки запроса, чтобы учитывать запрос в in-progress с правильной меткой.
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+
+    def _route_for(self, scope) -> str:
+        partial: Optional[str] = None
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                # Путь совпал, метод нет (405)
+                partial = route.path
+        return partial or UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "GET")
+        route = self._route_for(scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration_seconds.observe(time.perf_counter() - started, method=method, route=route)
+            http_requests_total.inc(method=method, route=route, status=status)
+            http_requests_in_progress.dec(method=method, route=route)
@@ -7,6 +7,10 @@ from dotenv import load_dotenv
 from app.config import settings
 from app.logging_config import setup_logging
 from app.bot.handlers import run_polling
+from app.services.activity_service import activity_flusher
+from app.services.cache_bus import cache_bus
+from app.metrics_multiproc import metrics_snapshots
+from app.services.notification_service import notification_service
 
 def main():
     """Запускает Telegram-бота Movie Tinder"""
@@ -23,12 +27,30 @@ def main():
         logger.error("Критическая ошибка: TELEGRAM_BOT_TOKEN не найден!")
         return
 
+    if settings.BOT_MODE == "webhook":
+        # Апдейты принимает API (app.main), отдельный процесс бота не нужен
+        logger.error("BOT_MODE=webhook: бот работает внутри API, запустите uvicorn app.main:app")
+        return
+
+    # Клиент Telegram для уведомлений о матчах и фоновая запись активности пользователей (last_active)
+    notification_service.start()
+    activity_flusher.start()
+    # Кэши комнат и пользователей сбрасываются по событиям от API
+    cache_bus.start()
+    # Метрики бота попадают в GET /metrics API через общий каталог снимков
+    if settings.METRICS_MULTIPROC_DIR:
+        metrics_snapshots.start()
     try:
         logger.info("Бот начинает опрос серверов (polling)...")
         # 3. Запускаем бесконечный цикл бота
         run_polling()
     except Exception as e:
         logger.exception(f"Бот упал с ошибкой: {e}")
+    finally:
+        notification_service.stop(settings.APP_GRACEFUL_TIMEOUT_SECONDS)
+        activity_flusher.stop(timeout=30)
+        cache_bus.stop(timeout=5)
+        metrics_snapshots.stop(timeout=5)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
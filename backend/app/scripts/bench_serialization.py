@@ -0,0 +1,122 @@
+"""
+Микробенчмарк сериализации ответов API: прежний путь FastAPI против api_ok().
+
+Прежний путь (как в FastAPI для эндпоинта с response_model):
+    ApiResponse(data=<модель из ORM>) -> model_dump() -> повторная валидация по response_model
+    -> dump_python(mode="json") -> json.dumps (JSONResponse)
+Новый путь:
+    api_ok(<ORM-объект>, Model) — одна валидация from_attributes -> dump_python() -> orjson
+
+База данных не нужна: ORM-строки заменены объектами с теми же атрибутами.
+
+Использование:
+    python -m app.scripts.bench_serialization [--iterations 2000]
+"""
+import argparse
+import timeit
+from functools import lru_cache
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.api.responses import api_ok
+from app.api.schemas import ApiResponse, MatchResponse, MovieResponse, SwipeResponse
+
+
+def _movie(i: int = 0) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        kinopoisk_id=1000 + i,
+        title=f"Фильм {i}",
+        title_original=f"Movie {i}",
+        year=2000 + i % 25,
+        genre="драма, комедия",
+        poster_url=f"https://example.com/posters/{i}.jpg",
+        description="Описание фильма " * 20,
+        rating=7.5,
+        created_at=datetime.now(timezone.utc),
+        is_active=True,
+    )
+
+
+def _match(i: int = 0) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        movie_id=uuid.uuid4(),
+        matched_at=datetime.now(timezone.utc),
+        is_notified=True,
+        group_participants=[111111 + i, 222222 + i, 333333 + i],
+        movie=None,
+    )
+
+
+def _swipe() -> SimpleNamespace:
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        movie_id=uuid.uuid4(),
+        swipe_type="like",
+        swiped_at=datetime.now(timezone.utc),
+        group_participants=[111111, 222222],
+    )
+
+
+@lru_cache(maxsize=None)
+def _legacy_adapter(response_type) -> TypeAdapter:
+    # FastAPI создает адаптер response_model один раз на маршрут
+    return TypeAdapter(response_type)
+
+
+def legacy_response(obj, model, many: bool = False) -> bytes:
+    """Прежний путь: модель в эндпоинте, затем повторная валидация и jsonable-сериализация FastAPI"""
+    data_type = list[model] if many else model
+    response_type = ApiResponse[data_type]
+    if many:
+        data = [model.model_validate(item, from_attributes=True) for item in obj]
+    else:
+        data = model.model_validate(obj, from_attributes=True)
+    result = response_type(success=True, data=data)
+
+    adapter = _legacy_adapter(response_type)
+    value = adapter.validate_python(result.model_dump())
+    return JSONResponse(adapter.dump_python(value, mode="json")).body
+
+
+def optimized_response(obj, model, many: bool = False) -> bytes:
+    return api_ok(obj, model, many=many).body
+
+
+def run(iterations: int) -> list[dict]:
+    cases = [
+        ("movie", _movie(), MovieResponse, False),
+        ("swipe", _swipe(), SwipeResponse, False),
+        ("matches x50", [_match(i) for i in range(50)], MatchResponse, True),
+    ]
+    results = []
+    for name, obj, model, many in cases:
+        before = timeit.timeit(lambda: legacy_response(obj, model, many), number=iterations) / iterations
+        after = timeit.timeit(lambda: optimized_response(obj, model, many), number=iterations) / iterations
+        results.append({
+            "case": name,
+            "before_us": round(before * 1e6, 1),
+            "after_us": round(after * 1e6, 1),
+            "speedup": round(before / after, 2) if after else None,
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации ответов API")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'case':<14}{'before, us':>12}{'after, us':>12}{'speedup':>10}")
+    for row in run(args.iterations):
+        print(f"{row['case']:<14}{row['before_us']:>12}{row['after_us']:>12}{row['speedup']:>9}x")
+
+
+if __name__ == "__main__":
+    main()
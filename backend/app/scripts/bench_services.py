@@ -0,0 +1,486 @@
+"""
+Микробенчмарки сервисов на реальном Postgres с базовыми замерами (baseline) в JSON.
+
+Замеряются горячие вызовы: SwipeService.create_swipe и check_match, MatchService.create_match,
+RoomService.join_room, MovieService.get_random_movie — каждый в своей сессии, как в запросе API.
+
+Три команды:
+
+1. seed — заливает тестовые данные объема --swipes (от 10^3 до 10^7) одним INSERT ... SELECT
+   из generate_series на каждую таблицу (данные генерирует сам Postgres, минуты даже для 10^7):
+   комнаты по --room-size участников, у каждого участника --swipes-per-user свайпов по общим
+   для комнаты фильмам с долей лайков --like-ratio, матчи там, где лайкнули все.
+   Тестовые строки помечены диапазонами (telegram_id от 8000000000, kinopoisk_id от 900000000,
+   коды комнат BN...) и удаляются перед повторной заливкой (тестовые фильмы переиспользуются);
+   остальные данные не трогаются.
+   Лучше запускать на отдельной базе: createdb tinder_movie_bench && alembic upgrade head.
+
+2. run — прогоняет замеры и пишет результат (p50/p95/mean/min/max в мс, ops/s) в JSON.
+   Записи, созданные замерами, удаляются после каждого замера.
+
+3. compare — сравнивает результат с baseline и возвращает код 1, если какой-то вызов
+   стал медленнее порога (--threshold, по умолчанию +20% по p50).
+
+Использование:
+    DATABASE_URL=postgresql://.../tinder_movie_bench python -m app.scripts.bench_services seed --swipes 1e6
+    python -m app.scripts.bench_services run --output benchmarks/services-1e6.json
+    python -m app.scripts.bench_services run --output /tmp/current.json
+    python -m app.scripts.bench_services compare benchmarks/services-1e6.json /tmp/current.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+# Матчи, созданные замером, не должны уходить в Telegram (load_dotenv не перезаписывает
+# уже заданные переменные, поэтому пустой токен действует и при .env с настоящим)
+os.environ["TELEGRAM_BOT_TOKEN"] = ""
+
+from sqlalchemy import text  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.logging_config import logger, setup_logging  # noqa: E402
+from app.models.match import Match  # noqa: E402
+from app.models.swipe import SwipeType, UserSwipe  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.match_service import match_service  # noqa: E402
+from app.services.movie_service import movie_service  # noqa: E402
+from app.services.room_service import room_service  # noqa: E402
+from app.services.swipe_service import swipe_service  # noqa: E402
+
+# Диапазоны тестовых строк; верхние границы не задевают пользователей load_test (от 9000000000)
+TELEGRAM_ID_BASE = 8_000_000_000
+TELEGRAM_ID_END = 9_000_000_000
+KINOPOISK_ID_BASE = 900_000_000
+KINOPOISK_ID_END = 1_000_000_000
+ROOM_PREFIX = "BN"
+# Пользователь вне комнат для замера join_room
+SPARE_TELEGRAM_ID = TELEGRAM_ID_BASE + 999_999_999
+# Шаг сдвига колоды между комнатами: соседние комнаты свайпают разные фильмы
+ROOM_DECK_STRIDE = 7
+
+
+# --- seed ---
+
+def _column_type(db, table: str, column: str) -> str:
+    """Фактический тип колонки в базе (swipe_type в миграциях — varchar, в модели — enum)"""
+    return db.execute(
+        text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = CAST(:table AS regclass) AND attname = :column"
+        ),
+        {"table": table, "column": column},
+    ).scalar_one()
+
+
+def clear(db, movies: int) -> None:
+    """
+    Удаляет тестовые свайпы, матчи, комнаты и пользователей; фильмы 1..movies остаются.
+
+    Свайпы и матчи удаляются явно по индексированным user_id и movie_id: каскад от удаления
+    фильма ищет свайпы по movie_id без индекса — полным проходом по user_swipes на каждый фильм.
+    """
+    params = {**_range_params(), "movies": movies}
+    db.execute(text("""
+        DELETE FROM user_swipes WHERE user_id IN (
+            SELECT id FROM users WHERE telegram_id >= :telegram_base AND telegram_id < :telegram_end
+        )
+    """), params)
+    db.execute(text("""
+        DELETE FROM matches WHERE movie_id IN (
+            SELECT id FROM movies WHERE kinopoisk_id >= :kinopoisk_base AND kinopoisk_id < :kinopoisk_end
+        )
+    """), params)
+    db.execute(text("DELETE FROM rooms WHERE id LIKE :prefix || '%'"), params)
+    db.execute(text("DELETE FROM users WHERE telegram_id >= :telegram_base AND telegram_id < :telegram_end"), params)
+    # Лишние фильмы остаются только при уменьшении --movies
+    db.execute(
+        text("DELETE FROM movies WHERE kinopoisk_id > :kinopoisk_base + :movies AND kinopoisk_id < :kinopoisk_end"),
+        params,
+    )
+
+
+def seed(swipes: int, room_size: int, swipes_per_user: int, movies: int, like_ratio: float) -> dict:
+    if swipes_per_user > movies:
+        raise ValueError("--swipes-per-user не может быть больше --movies (свайп по фильму в группе один)")
+    rooms = max(1, swipes // (room_size * swipes_per_user))
+    params = {
+        **_range_params(),
+        "movies": movies,
+        "rooms": rooms,
+        "room_size": room_size,
+        "per_user": swipes_per_user,
+        "like_ratio": like_ratio,
+        "stride": ROOM_DECK_STRIDE,
+        "spare": SPARE_TELEGRAM_ID,
+    }
+    db = SessionLocal()
+    try:
+        swipe_type = _column_type(db, "user_swipes", "swipe_type")
+        steps = [
+            ("clear", None),
+            ("movies", """
+                INSERT INTO movies (id, kinopoisk_id, title, title_original, year, genre, poster_url,
+                                    description, rating, created_at, is_active)
+                SELECT gen_random_uuid(), :kinopoisk_base + g, 'Bench movie ' || g, 'Bench movie ' || g,
+                       1960 + g % 65, (ARRAY['драма', 'комедия', 'фантастика', 'триллер'])[1 + g % 4],
+                       'https://example.com/posters/' || g || '.jpg', repeat('Описание. ', 20),
+                       5 + (g % 45) / 10.0, now() - g * interval '1 minute', true
+                FROM generate_series(1, :movies) AS g
+                ON CONFLICT (kinopoisk_id) DO NOTHING
+            """),
+            ("users", """
+                INSERT INTO users (id, telegram_id, username, first_name, last_active)
+                SELECT gen_random_uuid(), :telegram_base + g, 'bench_' || g, 'Bench ' || g,
+                       now() - random() * interval '30 days'
+                FROM generate_series(0, :rooms * :room_size - 1) AS g
+                UNION ALL
+                SELECT gen_random_uuid(), :spare, 'bench_spare', 'Bench spare', now()
+            """),
+            ("rooms", """
+                INSERT INTO rooms (id, creator_id, participants, created_at, last_activity_at)
+                SELECT :prefix || lpad(r::text, 7, '0'), u.id,
+                       (SELECT jsonb_agg(:telegram_base + r * :room_size + i ORDER BY i)
+                        FROM generate_series(0, :room_size - 1) AS i),
+                       now(), now()
+                FROM generate_series(0, :rooms - 1) AS r
+                JOIN users u ON u.telegram_id = :telegram_base + r * :room_size
+            """),
+            ("swipes", f"""
+                INSERT INTO user_swipes (id, user_id, movie_id, swipe_type, swiped_at, group_participants)
+                SELECT gen_random_uuid(), u.id, m.id,
+                       CAST(CASE WHEN random() < :like_ratio THEN 'like' ELSE 'dislike' END AS {swipe_type}),
+                       now() - random() * interval '30 days', r.participants
+                FROM rooms r
+                CROSS JOIN LATERAL jsonb_array_elements_text(r.participants) AS p(telegram_id)
+                JOIN users u ON u.telegram_id = CAST(p.telegram_id AS bigint)
+                CROSS JOIN generate_series(0, :per_user - 1) AS j
+                JOIN movies m ON m.kinopoisk_id =
+                    :kinopoisk_base + 1 + (CAST(substr(r.id, 3) AS int) * :stride + j) % :movies
+                WHERE r.id LIKE :prefix || '%'
+            """),
+            ("matches", """
+                INSERT INTO matches (id, movie_id, matched_at, is_notified, group_participants)
+                SELECT gen_random_uuid(), s.movie_id, max(s.swiped_at), true, s.group_participants
+                FROM user_swipes s
+                JOIN users u ON u.id = s.user_id
+                WHERE u.telegram_id >= :telegram_base AND u.telegram_id < :telegram_end
+                GROUP BY s.movie_id, s.group_participants
+                HAVING count(*) = :room_size AND bool_and(CAST(s.swipe_type AS text) = 'like')
+            """),
+        ]
+        for name, sql in steps:
+            started = time.perf_counter()
+            # Заливка 10^7 строк дольше DB_STATEMENT_TIMEOUT_MS приложения: снимаем его на транзакцию
+            db.execute(text("SET LOCAL statement_timeout = 0"))
+            if sql is None:
+                clear(db, movies)
+            else:
+                db.execute(text(sql), params)
+            db.commit()
+            logger.info(f"Seed step {name}: {time.perf_counter() - started:.1f}s")
+        db.execute(text("SET LOCAL statement_timeout = 0"))
+        db.execute(text("ANALYZE movies; ANALYZE users; ANALYZE rooms; ANALYZE user_swipes; ANALYZE matches"))
+        db.commit()
+        return volume(db)
+    finally:
+        db.close()
+
+
+def volume(db) -> dict:
+    """Объем тестовых данных в базе (прочие строки не учитываются)"""
+    row = db.execute(text("""
+        WITH bench_movies AS (
+            SELECT id FROM movies WHERE kinopoisk_id >= :kinopoisk_base AND kinopoisk_id < :kinopoisk_end
+        )
+        SELECT
+            (SELECT count(*) FROM bench_movies) AS movies,
+            (SELECT count(*) FROM users WHERE telegram_id >= :telegram_base AND telegram_id < :telegram_end) AS users,
+            (SELECT count(*) FROM rooms WHERE id LIKE :prefix || '%') AS rooms,
+            (SELECT count(*) FROM user_swipes WHERE movie_id IN (SELECT id FROM bench_movies)) AS swipes,
+            (SELECT count(*) FROM matches WHERE movie_id IN (SELECT id FROM bench_movies)) AS matches
+    """), _range_params()).one()
+    return dict(row._mapping)
+
+
+def _range_params() -> dict:
+    return {
+        "kinopoisk_base": KINOPOISK_ID_BASE,
+        "kinopoisk_end": KINOPOISK_ID_END,
+        "telegram_base": TELEGRAM_ID_BASE,
+        "telegram_end": TELEGRAM_ID_END,
+        "prefix": ROOM_PREFIX,
+    }
+
+
+# --- run ---
+
+class Fixtures:
+    """Выборка тестовых комнат, их участников и фильмов для аргументов замеров"""
+
+    def __init__(self, db, sample: int):
+        rooms = db.execute(
+            text("SELECT id, participants FROM rooms WHERE id LIKE :prefix ORDER BY random() LIMIT :limit"),
+            {"prefix": f"{ROOM_PREFIX}%", "limit": sample},
+        ).all()
+        if not rooms:
+            raise RuntimeError("Нет тестовых данных: сначала python -m app.scripts.bench_services seed")
+        self.rooms = [(row.id, sorted(row.participants)) for row in rooms]
+        telegram_ids = [telegram_id for _, participants in self.rooms for telegram_id in participants]
+        self.user_ids = {
+            row.telegram_id: str(row.id)
+            for row in db.execute(
+                text("SELECT id, telegram_id FROM users WHERE telegram_id = ANY(:ids)"), {"ids": telegram_ids}
+            )
+        }
+        self.movies = [
+            str(movie_id) for movie_id in db.execute(
+                text(
+                    "SELECT id FROM movies WHERE kinopoisk_id >= :kinopoisk_base AND kinopoisk_id < :kinopoisk_end "
+                    "ORDER BY kinopoisk_id"
+                ),
+                _range_params(),
+            ).scalars()
+        ]
+        self.swipes_per_user = db.execute(
+            text("SELECT count(*) FROM user_swipes WHERE user_id = CAST(:user_id AS uuid)"),
+            {"user_id": self.user_ids[self.rooms[0][1][0]]},
+        ).scalar_one()
+
+    def room(self, i: int) -> tuple[str, list[int]]:
+        return self.rooms[i % len(self.rooms)]
+
+    def movie(self, room_code: str, position: int) -> str:
+        """position-я карточка колоды комнаты (как в seed); позиции от swipes_per_user еще не свайпнуты"""
+        number = int(room_code[len(ROOM_PREFIX):])
+        return self.movies[(number * ROOM_DECK_STRIDE + position) % len(self.movies)]
+
+
+def _time_calls(
+    call: Callable[[int], None], iterations: int, warmup: int, teardown: Optional[Callable[[int], None]] = None
+) -> list[float]:
+    """Замеряет call(i) в мс; teardown(i) (откат побочного эффекта) выполняется вне замера"""
+    durations = []
+    # Прогрев берет свои индексы после замеряемых, чтобы аргументы не повторялись
+    for i in list(range(iterations, iterations + warmup)) + list(range(iterations)):
+        started = time.perf_counter()
+        call(i)
+        elapsed = (time.perf_counter() - started) * 1000
+        if teardown:
+            teardown(i)
+        if i < iterations:
+            durations.append(elapsed)
+    return durations
+
+
+def _summary(durations: list[float], rounds: int) -> dict:
+    ordered = sorted(durations)
+    return {
+        "iterations": len(ordered),
+        "rounds": rounds,
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+        "ops_per_s": round(1000 / statistics.fmean(ordered), 1),
+    }
+
+
+def _in_session(function: Callable) -> Callable[[int], None]:
+    """Каждый вызов — в своей сессии, как запрос API (checkout соединения входит в замер)"""
+    def call(i: int) -> None:
+        with SessionLocal() as db:
+            function(db, i)
+    return call
+
+
+def run(iterations: int, rounds: int, warmup: int, sample: int) -> dict:
+    with SessionLocal() as db:
+        fixtures = Fixtures(db, sample)
+        data_volume = volume(db)
+        server_version = db.execute(text("SHOW server_version")).scalar_one()
+        spare = db.query(User).filter(User.telegram_id == SPARE_TELEGRAM_ID).one()
+        spare_id = spare.id
+    offset = fixtures.swipes_per_user
+    if offset + iterations + warmup > len(fixtures.movies):
+        # Иначе карточки пойдут по второму кругу и замер попадет на уже существующие свайпы и матчи
+        raise ValueError(
+            f"--iterations + --warmup не должны превышать {len(fixtures.movies) - offset} "
+            "(несвайпнутые фильмы колоды); залейте данные с большим --movies"
+        )
+    created_swipes: list[str] = []
+    created_matches: list[str] = []
+
+    def create_swipe(db, i: int) -> None:
+        room_code, participants = fixtures.room(i)
+        telegram_id = participants[i % len(participants)]
+        swipe = swipe_service.create_swipe(
+            db, user_id=fixtures.user_ids[telegram_id], movie_id=fixtures.movie(room_code, offset + i),
+            swipe_type=SwipeType.like, group_participants=participants,
+        )
+        created_swipes.append(str(swipe.id))
+
+    def check_match(db, i: int) -> None:
+        room_code, participants = fixtures.room(i)
+        swipe_service.check_match(db, fixtures.movie(room_code, i % max(1, offset)), participants)
+
+    def create_match(db, i: int) -> None:
+        room_code, participants = fixtures.room(i)
+        match = match_service.create_match(db, fixtures.movie(room_code, offset + i), participants)
+        created_matches.append(str(match.id))
+
+    def join_room(db, i: int) -> None:
+        room_service.join_room(db, db.get(User, spare_id), fixtures.room(i)[0])
+
+    def leave_room(db, i: int) -> None:
+        room_service.leave_room(db, db.get(User, spare_id), fixtures.room(i)[0])
+
+    def get_random_movie(db, i: int) -> None:
+        movie_service.get_random_movie(db)
+
+    cases = {
+        "swipe.create_swipe": (create_swipe, None),
+        "swipe.check_match": (check_match, None),
+        "match.create_match": (create_match, None),
+        "room.join_room": (join_room, leave_room),
+        "movie.get_random_movie": (get_random_movie, None),
+    }
+    # Раунды чередуют вызовы: фоновая нагрузка на машине распределяется по всем замерам поровну
+    durations: dict[str, list[float]] = {name: [] for name in cases}
+    for round_number in range(rounds):
+        for name, (function, teardown) in cases.items():
+            logger.info(f"Benchmark {name}: round {round_number + 1}/{rounds}, {iterations} iterations")
+            durations[name] += _time_calls(
+                _in_session(function), iterations, warmup, _in_session(teardown) if teardown else None
+            )
+            # Записи удаляются после каждого раунда, поэтому аргументы раундов совпадают
+            _cleanup(created_swipes, created_matches)
+    results = {name: _summary(samples, rounds) for name, samples in durations.items()}
+
+    return {
+        "suite": "services",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "postgres": server_version,
+        "volume": data_volume,
+        "iterations": iterations,
+        "rounds": rounds,
+        "cases": results,
+    }
+
+
+def _cleanup(swipe_ids: list[str], match_ids: list[str]) -> None:
+    """Удаляет записи, созданные замерами, чтобы объем данных не менялся между прогонами"""
+    with SessionLocal() as db:
+        if swipe_ids:
+            db.query(UserSwipe).filter(UserSwipe.id.in_(swipe_ids)).delete(synchronize_session=False)
+        if match_ids:
+            db.query(Match).filter(Match.id.in_(match_ids)).delete(synchronize_session=False)
+        db.commit()
+    swipe_ids.clear()
+    match_ids.clear()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+# --- compare ---
+
+def compare(baseline: dict, current: dict, metric: str, threshold: float) -> list[dict]:
+    rows = []
+    for name, base in baseline["cases"].items():
+        now = current["cases"].get(name)
+        if now is None:
+            continue
+        change = (now[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+        rows.append({
+            "case": name,
+            "baseline": base[metric],
+            "current": now[metric],
+            "change": round(change, 4),
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def _print_comparison(rows: list[dict], metric: str, threshold: float) -> None:
+    print(f"{'case':<26}{'baseline ' + metric:>20}{'current':>12}{'change':>10}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<26}{row['baseline']:>20}{row['current']:>12}{row['change']:>+10.1%}{flag}")
+    print(f"threshold: +{threshold:.0%}")
+
+
+def _scale(value: str) -> int:
+    """Объем свайпов: 1000, 1e6, 10_000_000; допустимо от 10^3 до 10^7"""
+    number = int(float(value))
+    if not 10 ** 3 <= number <= 10 ** 7:
+        raise argparse.ArgumentTypeError("объем свайпов должен быть от 1e3 до 1e7")
+    return number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микробенчмарки сервисов с baseline в JSON")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = subparsers.add_parser("seed", help="Залить тестовые данные")
+    seed_parser.add_argument("--swipes", type=_scale, default=10 ** 5, help="Сколько свайпов (1e3..1e7)")
+    seed_parser.add_argument("--room-size", type=int, default=3)
+    seed_parser.add_argument("--swipes-per-user", type=int, default=100)
+    seed_parser.add_argument("--movies", type=int, default=1000)
+    seed_parser.add_argument("--like-ratio", type=float, default=0.6)
+
+    run_parser = subparsers.add_parser("run", help="Прогнать замеры")
+    run_parser.add_argument("--iterations", type=int, default=100, help="Вызовов в раунде")
+    run_parser.add_argument("--rounds", type=int, default=5)
+    run_parser.add_argument("--warmup", type=int, default=10)
+    run_parser.add_argument("--sample-rooms", type=int, default=500, help="Из скольких комнат брать аргументы")
+    run_parser.add_argument("--output", help="Записать результат в JSON (baseline: benchmarks/services-<объем>.json)")
+
+    compare_parser = subparsers.add_parser("compare", help="Сравнить результат с baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--metric", default="p50_ms", choices=["p50_ms", "p95_ms", "mean_ms"])
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Допустимое замедление (0.2 = +20%%)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+        if baseline.get("volume") != current.get("volume"):
+            print(f"warning: data volume differs: baseline {baseline.get('volume')}, current {current.get('volume')}")
+        rows = compare(baseline, current, args.metric, args.threshold)
+        _print_comparison(rows, args.metric, args.threshold)
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+        return
+
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
+    if args.command == "seed":
+        print(json.dumps(seed(args.swipes, args.room_size, args.swipes_per_user, args.movies, args.like_ratio), indent=2))
+        return
+
+    result = run(args.iterations, args.rounds, args.warmup, args.sample_rooms)
+    if args.output:
+        path = Path(args.output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(result["cases"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
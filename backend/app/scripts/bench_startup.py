@@ -0,0 +1,152 @@
+"""
+Бенчмарк холодного старта: время импорта API (app.main) и бота (app.run_bot).
+
+Каждый замер — отдельный процесс `python -X importtime -c "import <модуль>"`, чтобы кэш модулей
+не влиял на результат. Печатается минимум и медиана по запускам и самые дорогие по собственному
+времени пакеты (первые кандидаты на отложенный импорт).
+
+Заодно проверяется, что импорт не имеет побочных эффектов: не добавляет хендлеры логгеру,
+не запускает потоки, не создает файлы логов и не создает клиент Telegram (все это делается
+в lifespan FastAPI или при старте бота). Логи пишутся во временную папку (LOG_FILE), так что
+созданный при импорте файл будет замечен.
+
+Код возврата 1, если медиана превысила бюджет или найден побочный эффект — можно запускать в CI.
+
+Использование:
+    python -m app.scripts.bench_startup [--runs 5] [--api-budget-ms 2000] [--bot-budget-ms 1500] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+TARGETS = {"api": "app.main", "bot": "app.run_bot"}
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Выполняется в дочернем процессе после импорта: состояние, которое импорт не должен менять
+_PROBE = """
+import json, logging, sys, threading
+notification = sys.modules.get("app.services.notification_service")
+print(json.dumps({
+    "log_handlers": len(logging.getLogger("tinder_movie").handlers),
+    "threads": [t.name for t in threading.enumerate() if t is not threading.main_thread()],
+    "telegram_bot": bool(notification and notification.notification_service.bot is not None),
+}))
+"""
+
+
+def _parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Строки 'import time: self | cumulative | name' -> (модуль, self мкс, cumulative мкс)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module: str) -> dict:
+    """Один холодный импорт модуля в новом процессе"""
+    with tempfile.TemporaryDirectory() as log_dir:
+        env = {**os.environ, "LOG_FILE": str(Path(log_dir) / "app.log")}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}\n{_PROBE}"],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        log_files = sorted(path.name for path in Path(log_dir).iterdir())
+
+    rows = _parse_importtime(result.stderr)
+    total_us = next(cumulative for name, _, cumulative in rows if name == module)
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    probe["log_files"] = log_files
+    return {"total_ms": total_us / 1000, "rows": rows, "side_effects": probe}
+
+
+def _top_packages(rows: list[tuple[str, int, int]], top: int) -> list[dict]:
+    """Собственное время импорта, сгруппированное по пакету верхнего уровня (app — по модулям)"""
+    totals: dict[str, int] = {}
+    for name, self_us, _ in rows:
+        key = name if name.startswith("app.") else name.split(".")[0]
+        totals[key] = totals.get(key, 0) + self_us
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": name, "self_ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def _side_effect_problems(side_effects: dict) -> list[str]:
+    problems = []
+    if side_effects["log_handlers"]:
+        problems.append(f"logger has {side_effects['log_handlers']} handler(s) after import")
+    if side_effects["threads"]:
+        problems.append(f"threads started at import: {', '.join(side_effects['threads'])}")
+    if side_effects["log_files"]:
+        problems.append(f"files created at import: {', '.join(side_effects['log_files'])}")
+    if side_effects["telegram_bot"]:
+        problems.append("telegram Bot created at import")
+    return problems
+
+
+def run(target: str, runs: int, budget_ms: float, top: int) -> dict:
+    samples = [measure(TARGETS[target]) for _ in range(runs)]
+    totals = [sample["total_ms"] for sample in samples]
+    median = statistics.median(totals)
+    fastest = min(samples, key=lambda sample: sample["total_ms"])
+    problems = _side_effect_problems(samples[-1]["side_effects"])
+    return {
+        "target": target,
+        "module": TARGETS[target],
+        "runs": runs,
+        "min_ms": round(min(totals), 1),
+        "median_ms": round(median, 1),
+        "budget_ms": budget_ms,
+        "over_budget": median > budget_ms,
+        "side_effects": problems,
+        "top_packages": _top_packages(fastest["rows"], top),
+    }
+
+
+def _print_report(report: dict) -> None:
+    status = "OVER BUDGET" if report["over_budget"] else "ok"
+    print(
+        f"{report['target']} ({report['module']}): median={report['median_ms']}ms "
+        f"min={report['min_ms']}ms budget={report['budget_ms']}ms [{status}]"
+    )
+    for package in report["top_packages"]:
+        print(f"   {package['self_ms']:>8}ms  {package['package']}")
+    for problem in report["side_effects"]:
+        print(f"   SIDE EFFECT: {problem}")
+    print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Время импорта API и бота и проверка побочных эффектов импорта")
+    parser.add_argument("--target", choices=["api", "bot", "all"], default="all")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--api-budget-ms", type=float, default=2000)
+    parser.add_argument("--bot-budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=10, help="Сколько самых дорогих пакетов показать")
+    parser.add_argument("--json", action="store_true", help="Вывести результаты в JSON")
+    args = parser.parse_args()
+
+    budgets = {"api": args.api_budget_ms, "bot": args.bot_budget_ms}
+    targets = list(TARGETS) if args.target == "all" else [args.target]
+    reports = [run(target, args.runs, budgets[target], args.top) for target in targets]
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+    else:
+        for report in reports:
+            _print_report(report)
+
+    if any(report["over_budget"] or report["side_effects"] for report in reports):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
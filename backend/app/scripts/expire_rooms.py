@@ -0,0 +1,30 @@
+"""
+Разовый запуск очистки неактивных комнат (то же, что делает фоновый воркер в API).
+
+Использование:
+    python -m app.scripts.expire_rooms
+
+Удаляет комнаты без активности дольше SESSION_DURATION_HOURS,
+переносит их свайпы и матчи (и свайпы прежних составов групп, не совпадающих
+ни с одной комнатой) в архивные таблицы и печатает статистику.
+"""
+from app.services.room_expiry_service import room_expiry_service
+from app.config import settings
+from app.logging_config import logger, setup_logging
+
+
+def main() -> None:
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
+    totals = room_expiry_service.run_once()
+    logger.info("=" * 50)
+    logger.info("Room sweep complete:")
+    logger.info(f"  Rooms expired: {totals['rooms']}")
+    logger.info(f"  Orphan groups archived: {totals['orphan_groups']}")
+    logger.info(f"  Swipes archived: {totals['swipes']}")
+    logger.info(f"  Matches archived: {totals['matches']}")
+    logger.info(f"  Batches: {totals['batches']}")
+    logger.info("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
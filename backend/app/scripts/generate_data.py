@@ -0,0 +1,434 @@
+"""
+Генератор синтетических данных продового объема: пользователи, комнаты, свайпы и матчи.
+
+Распределения приближены к реальному использованию:
+- размер комнаты — по весам --room-sizes (по умолчанию чаще пары, реже группы до MAX_ROOM_SIZE);
+  в комнатах состоит доля --room-share пользователей, каждый не больше чем в одной;
+- популярность фильмов — закон Ципфа (--movie-skew): колоды комнат собираются в основном
+  из верхушки каталога, популярные фильмы лайкают чаще;
+- склонность к лайку у каждого пользователя своя (бета-распределение со средним --like-ratio);
+- время — сессии комнат: вечерний пик по часам, выходные активнее, несколько «всплесков»
+  (--bursts дней с кратной нагрузкой), внутри сессии свайпы идут с интервалом в секунды;
+  участники досматривают колоду на разную глубину, часть бросает раньше.
+Матч создается, когда фильм лайкнули все участники комнаты (как в swipe_service.check_match).
+
+Ограничения модели соблюдаются при генерации: у комнаты свой состав (group_participants —
+отсортированный список без повторов, как normalize_group_participants), фильм в колоде
+комнаты встречается один раз — пары (user_id, movie_id, group_participants) и
+(movie_id, group_participants) уникальны (uq_swipe_user_movie_group, uq_match_movie_group).
+
+Активность укладывается в --days последних дней, а комнаты — в окно SESSION_DURATION_HOURS:
+иначе очистка комнат (ROOM_SWEEP_ENABLED) при старте API заархивирует их вместе со свайпами
+и матчами. Более длинная история (--days больше окна) генерируется только при
+ROOM_SWEEP_ENABLED=false, и с ним же нужно запускать API на этой базе. Все матчи
+генерируются уже уведомленными (is_notified), чтобы API не писал несуществующим telegram_id.
+
+Загрузка — COPY FROM STDIN пачками по --chunk строк в одной транзакции, затем ANALYZE.
+Сгенерированные строки помечены диапазонами (telegram_id от 7000000000, kinopoisk_id
+от 800000000) и удаляются флагом --clear; фильмы каталога остаются и переиспользуются. Грузить лучше в отдельную базу:
+createdb tinder_movie_perf && DATABASE_URL=... alembic upgrade head.
+
+Использование:
+    DATABASE_URL=postgresql://.../tinder_movie_perf python -m app.scripts.generate_data --users 1000000 --clear
+    python -m app.scripts.generate_data --users 10000 --csv-dir /tmp/dataset   # без БД, файлы для COPY
+"""
+import abc
+import argparse
+import io
+import itertools
+import json
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from random import Random
+from typing import Optional
+
+from app.config import settings
+from app.database import engine
+from app.logging_config import logger, setup_logging
+
+TELEGRAM_ID_BASE = 7_000_000_000
+KINOPOISK_ID_BASE = 800_000_000
+ROOM_CODE_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+GENRES = ["драма", "комедия", "фантастика", "триллер", "боевик", "мелодрама", "детектив", "мультфильм"]
+
+# Относительная активность по часам суток (UTC+3): ночью почти никого, пик вечером
+HOUR_WEIGHTS = [3, 2, 1, 1, 1, 1, 2, 3, 4, 5, 5, 6, 6, 6, 6, 7, 8, 10, 13, 16, 18, 17, 12, 6]
+WEEKEND_FACTOR = 1.6
+BURST_FACTOR = 4.0
+
+TABLES = {
+    "movies": ("id", "kinopoisk_id", "title", "title_original", "year", "genre", "poster_url",
+               "description", "rating", "created_at", "is_active"),
+    "users": ("id", "telegram_id", "username", "first_name", "last_active"),
+    "rooms": ("id", "creator_id", "participants", "created_at", "last_activity_at"),
+    "user_swipes": ("id", "user_id", "movie_id", "swipe_type", "swiped_at", "group_participants"),
+    "matches": ("id", "movie_id", "matched_at", "is_notified", "group_participants"),
+}
+
+
+def parse_room_sizes(value: str) -> dict[int, float]:
+    """"2:55,3:25,4:12,5:8" -> {размер: вес}"""
+    sizes = {}
+    for part in value.split(","):
+        size, weight = part.split(":")
+        sizes[int(size)] = float(weight)
+    if min(sizes) < 2 or max(sizes) > settings.MAX_ROOM_SIZE:
+        raise argparse.ArgumentTypeError(f"размер комнаты должен быть от 2 до {settings.MAX_ROOM_SIZE}")
+    return sizes
+
+
+def max_live_days() -> int:
+    """
+    Сколько последних дней может занимать активность, чтобы комнаты не считались истекшими.
+
+    Комнату без активности дольше SESSION_DURATION_HOURS удаляет очистка (room_expiry_service);
+    запас — сутки на выравнивание начала по полуночи и сутки жизни данных после загрузки.
+    """
+    return max(0, settings.SESSION_DURATION_HOURS // 24 - 2)
+
+
+def _timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+class ChunkedSink(abc.ABC):
+    """Копит строки таблиц в текстовом формате COPY и сбрасывает их пачками по chunk строк"""
+
+    def __init__(self, chunk: int):
+        self.chunk = chunk
+        self._buffers: dict[str, list[str]] = {table: [] for table in TABLES}
+        self.counts: dict[str, int] = dict.fromkeys(TABLES, 0)
+
+    def write(self, table: str, row: tuple) -> None:
+        buffer = self._buffers[table]
+        buffer.append("\t".join(row))
+        if len(buffer) >= self.chunk:
+            self.flush(table)
+
+    def flush(self, table: str) -> None:
+        buffer = self._buffers[table]
+        if not buffer:
+            return
+        self._write_chunk(table, "\n".join(buffer) + "\n")
+        self.counts[table] += len(buffer)
+        buffer.clear()
+
+    @abc.abstractmethod
+    def _write_chunk(self, table: str, data: str) -> None:
+        """Записывает пачку строк таблицы (текстовый формат COPY)"""
+
+    def close(self) -> None:
+        for table in TABLES:
+            self.flush(table)
+
+
+class CopySink(ChunkedSink):
+    """COPY ... FROM STDIN в одной транзакции; фиксируется в close()"""
+
+    def __init__(self, connection, chunk: int):
+        super().__init__(chunk)
+        self.connection = connection
+        self.cursor = connection.cursor()
+
+    def _write_chunk(self, table: str, data: str) -> None:
+        self.cursor.copy_expert(f"COPY {table} ({', '.join(TABLES[table])}) FROM STDIN", io.StringIO(data))
+
+    def close(self) -> None:
+        super().close()
+        for table in TABLES:
+            self.cursor.execute(f"ANALYZE {table}")
+        self.connection.commit()
+
+
+class TsvDirSink(ChunkedSink):
+    """Тот же формат в файлы <таблица>.tsv — для загрузки через psql \\copy или без БД"""
+
+    def __init__(self, directory: Path, chunk: int):
+        super().__init__(chunk)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._files = {table: open(directory / f"{table}.tsv", "w", encoding="utf-8") for table in TABLES}
+
+    def _write_chunk(self, table: str, data: str) -> None:
+        self._files[table].write(data)
+
+    def close(self) -> None:
+        super().close()
+        for file in self._files.values():
+            file.close()
+
+
+class DatasetGenerator:
+    """Генерирует строки всех таблиц в порядке внешних ключей и отдает их в sink"""
+
+    def __init__(self, args: argparse.Namespace, catalog: dict[int, str]):
+        """
+        Args:
+            args: Параметры командной строки
+            catalog: Уже загруженные фильмы (ранг -> id); генерируются только недостающие
+        """
+        self.args = args
+        self.catalog = catalog
+        self.rng = Random(args.seed)
+        self.now = time.time()
+        # Полные сутки до сегодняшней полуночи UTC: часы профиля совпадают с часами меток
+        self.start = (self.now // 86400 - args.days) * 86400
+        self.movie_ids: list[str] = []
+        self.movie_cum_weights: list[float] = []
+        self.user_ids: list[str] = []
+        self._day_cum_weights = self._day_weights()
+        self._hour_cum_weights = list(itertools.accumulate(HOUR_WEIGHTS))
+        # Параметры бета-распределения склонности к лайку: среднее like_ratio, умеренный разброс
+        concentration = 6.0
+        self._like_alpha = args.like_ratio * concentration
+        self._like_beta = (1 - args.like_ratio) * concentration
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _day_weights(self) -> list[float]:
+        weights = []
+        for day in range(self.args.days):
+            weekday = datetime.fromtimestamp(self.start + day * 86400, timezone.utc).weekday()
+            weights.append(WEEKEND_FACTOR if weekday >= 5 else 1.0)
+        for day in self.rng.sample(range(self.args.days), min(self.args.bursts, self.args.days)):
+            weights[day] *= BURST_FACTOR
+        return list(itertools.accumulate(weights))
+
+    def _session_start(self) -> float:
+        """Начало сессии комнаты: день с учетом выходных и всплесков, час — по суточному профилю"""
+        day = self.rng.choices(range(self.args.days), cum_weights=self._day_cum_weights)[0]
+        hour = self.rng.choices(range(24), cum_weights=self._hour_cum_weights)[0]
+        # Профиль задан в московском времени, метки — в UTC
+        started = self.start + day * 86400 + (hour - 3) * 3600 + self.rng.random() * 3600
+        return max(started, self.start)
+
+    def generate(self, sink: ChunkedSink) -> None:
+        self._movies(sink)
+        sink.flush("movies")
+        self._users(sink)
+        sink.flush("users")
+        self._rooms(sink)
+
+    def _movies(self, sink: ChunkedSink) -> None:
+        created = _timestamp(self.start)
+        for rank in range(self.args.movies):
+            if rank in self.catalog:
+                self.movie_ids.append(self.catalog[rank])
+                continue
+            # Свой генератор на фильм: карточка не зависит от того, какие фильмы уже загружены
+            rng = Random(f"{self.args.seed}-movie-{rank}")
+            movie_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            self.movie_ids.append(movie_id)
+            sink.write("movies", (
+                movie_id, str(KINOPOISK_ID_BASE + rank), f"Фильм {rank}", f"Movie {rank}",
+                str(rng.randint(1960, 2025)), rng.choice(GENRES),
+                f"https://example.com/posters/{KINOPOISK_ID_BASE + rank}.jpg",
+                f"Описание фильма {rank}. " * rng.randint(3, 15), f"{rng.uniform(5.0, 9.5):.1f}",
+                created, "t",
+            ))
+        # Популярность по Ципфу: rank 0 — самый популярный
+        self.movie_cum_weights = list(itertools.accumulate(
+            1 / (rank + 1) ** self.args.movie_skew for rank in range(self.args.movies)
+        ))
+
+    def _users(self, sink: ChunkedSink) -> None:
+        for number in range(self.args.users):
+            user_id = self._uuid()
+            self.user_ids.append(user_id)
+            last_active = self.start + self.rng.random() * (self.now - self.start)
+            sink.write("users", (
+                user_id, str(TELEGRAM_ID_BASE + number), f"user_{number}", f"User {number}", _timestamp(last_active),
+            ))
+
+    def _room_code(self, number: int) -> str:
+        """Код из 6 символов, как у room_service; разным номерам — разные коды"""
+        # Простой множитель перемешивает коды соседних номеров
+        value = (number * 1_000_003 + 7_919) % 36 ** 6
+        code = []
+        for _ in range(6):
+            value, digit = divmod(value, 36)
+            code.append(ROOM_CODE_ALPHABET[digit])
+        return "".join(code)
+
+    def _deck(self, size: int) -> list[int]:
+        """Колода комнаты: фильмы без повторов, популярные чаще"""
+        deck: dict[int, None] = {}
+        while len(deck) < size:
+            for rank in self.rng.choices(range(self.args.movies), cum_weights=self.movie_cum_weights, k=size - len(deck)):
+                deck.setdefault(rank)
+        return list(deck)
+
+    def _rooms(self, sink: ChunkedSink) -> None:
+        args = self.args
+        rng = self.rng
+        sizes, weights = zip(*args.room_sizes.items())
+        members = list(range(args.users))
+        rng.shuffle(members)
+        members = members[:int(args.users * args.room_share)]
+        position = 0
+        number = 0
+        while True:
+            size = rng.choices(sizes, weights=weights)[0]
+            if position + size > len(members):
+                break
+            participants = sorted(members[position:position + size])
+            position += size
+            self._room(sink, self._room_code(number), participants)
+            number += 1
+            if number % 50_000 == 0:
+                logger.info(f"Generated {number} rooms, {sink.counts['user_swipes']} swipes copied")
+
+    def _room(self, sink: ChunkedSink, code: str, participants: list[int]) -> None:
+        args = self.args
+        rng = self.rng
+        telegram_ids = [TELEGRAM_ID_BASE + member for member in participants]
+        group = json.dumps(telegram_ids)
+        # Не больше половины каталога: иначе добор хвоста по Ципфу без повторов идет слишком долго
+        deck_size = min(max(1, args.movies // 2), max(1, int(rng.lognormvariate(math.log(args.deck_median), 0.8))))
+        deck = self._deck(deck_size)
+
+        started = self._session_start()
+        last_activity = started
+        # Сколько участников лайкнули deck[i] и время последнего лайка — для матчей
+        likes = [0] * deck_size
+        liked_at = [0.0] * deck_size
+        for member in participants:
+            # Большинство досматривает колоду, остальные бросают на случайной глубине
+            depth = deck_size if rng.random() < 0.6 else max(1, int(deck_size * rng.random()))
+            bias = rng.betavariate(self._like_alpha, self._like_beta)
+            moment = started + rng.expovariate(1 / 30)
+            user_id = self.user_ids[member]
+            for index in range(depth):
+                rank = deck[index]
+                moment += rng.expovariate(1 / args.swipe_gap_seconds)
+                # Популярным фильмам лайк чуть вероятнее, хвосту каталога — реже
+                chance = bias + 0.15 * (0.5 - rank / args.movies)
+                liked = rng.random() < chance
+                if liked:
+                    likes[index] += 1
+                    liked_at[index] = max(liked_at[index], moment)
+                sink.write("user_swipes", (
+                    self._uuid(), user_id, self.movie_ids[rank], "like" if liked else "dislike",
+                    _timestamp(min(moment, self.now)), group,
+                ))
+            last_activity = max(last_activity, moment)
+
+        for index, count in enumerate(likes):
+            if count == len(participants):
+                # Все матчи уже уведомлены: иначе resume_pending() при старте API начнет писать
+                # несуществующим telegram_id
+                sink.write("matches", (
+                    self._uuid(), self.movie_ids[deck[index]], _timestamp(min(liked_at[index], self.now)),
+                    "t", group,
+                ))
+
+        sink.write("rooms", (
+            code, self.user_ids[participants[0]], group, _timestamp(started), _timestamp(min(last_activity, self.now)),
+        ))
+
+
+def clear(connection, movies: int) -> None:
+    """
+    Удаляет ранее сгенерированные комнаты, пользователей, свайпы и матчи; фильмы 0..movies-1 остаются.
+
+    Свайпы и матчи удаляются явно по индексированным user_id и movie_id: каскад от удаления
+    фильма ищет свайпы по movie_id без индекса — полным проходом по user_swipes на каждый фильм.
+    """
+    users = (TELEGRAM_ID_BASE, TELEGRAM_ID_BASE + 10 ** 9)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM user_swipes WHERE user_id IN (SELECT id FROM users WHERE telegram_id >= %s AND telegram_id < %s)",
+            users,
+        )
+        cursor.execute(
+            "DELETE FROM matches WHERE movie_id IN (SELECT id FROM movies WHERE kinopoisk_id >= %s AND kinopoisk_id < %s)",
+            (KINOPOISK_ID_BASE, KINOPOISK_ID_BASE + 10 ** 8),
+        )
+        cursor.execute(
+            "DELETE FROM rooms WHERE creator_id IN (SELECT id FROM users WHERE telegram_id >= %s AND telegram_id < %s)",
+            users,
+        )
+        cursor.execute("DELETE FROM users WHERE telegram_id >= %s AND telegram_id < %s", users)
+        # Лишние фильмы появляются только при уменьшении --movies; их удаление медленное (каскад выше)
+        cursor.execute(
+            "DELETE FROM movies WHERE kinopoisk_id >= %s AND kinopoisk_id < %s",
+            (KINOPOISK_ID_BASE + movies, KINOPOISK_ID_BASE + 10 ** 8),
+        )
+    connection.commit()
+
+
+def existing_movies(connection, movies: int) -> dict[int, str]:
+    """Сгенерированные ранее фильмы каталога: ранг -> id (их переиспользуем, а не создаем заново)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT kinopoisk_id, id FROM movies WHERE kinopoisk_id >= %s AND kinopoisk_id < %s",
+            (KINOPOISK_ID_BASE, KINOPOISK_ID_BASE + movies),
+        )
+        return {kinopoisk_id - KINOPOISK_ID_BASE: str(movie_id) for kinopoisk_id, movie_id in cursor.fetchall()}
+
+
+def run(args: argparse.Namespace, sink: ChunkedSink, catalog: Optional[dict[int, str]] = None) -> dict:
+    generator = DatasetGenerator(args, catalog or {})
+    started = time.perf_counter()
+    generator.generate(sink)
+    sink.close()
+    elapsed = time.perf_counter() - started
+    total = sum(sink.counts.values())
+    logger.info(f"Generated {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s): {sink.counts}")
+    return {"seconds": round(elapsed, 1), **sink.counts}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Генератор синтетических пользователей, комнат, свайпов и матчей")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--movies", type=int, default=5_000, help="Размер синтетического каталога")
+    parser.add_argument("--room-share", type=float, default=0.7, help="Доля пользователей, состоящих в комнатах")
+    parser.add_argument("--room-sizes", type=parse_room_sizes, default="2:55,3:25,4:12,5:8",
+                        help="Веса размеров комнат, размер:вес через запятую")
+    parser.add_argument("--deck-median", type=float, default=60, help="Медиана размера колоды комнаты")
+    parser.add_argument("--like-ratio", type=float, default=0.55, help="Средняя доля лайков")
+    parser.add_argument("--movie-skew", type=float, default=1.0, help="Показатель Ципфа популярности фильмов")
+    parser.add_argument("--days", type=int, default=14, help="За сколько последних дней распределить активность")
+    parser.add_argument("--bursts", type=int, default=3, help="Сколько дней со всплеском нагрузки")
+    parser.add_argument("--swipe-gap-seconds", type=float, default=4.0, help="Средний интервал между свайпами")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk", type=int, default=100_000, help="Строк в одном COPY")
+    parser.add_argument("--clear", action="store_true", help="Удалить ранее сгенерированные данные")
+    parser.add_argument("--csv-dir", type=Path, help="Записать файлы <таблица>.tsv для COPY вместо загрузки в БД")
+    args = parser.parse_args()
+    if args.users >= 10 ** 9 or args.movies >= 10 ** 8:
+        parser.error("--users должно быть меньше 1e9, --movies — меньше 1e8 (диапазоны меток)")
+    if args.days > max_live_days() and settings.ROOM_SWEEP_ENABLED:
+        parser.error(
+            f"--days {args.days} выходит за SESSION_DURATION_HOURS: очистка комнат сразу заархивирует "
+            f"сгенерированные комнаты. Уменьшите --days до {max_live_days()} или запускайте генератор "
+            "и API с ROOM_SWEEP_ENABLED=false"
+        )
+
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
+    if args.csv_dir:
+        result = run(args, TsvDirSink(args.csv_dir, args.chunk))
+        print(json.dumps(result, indent=2))
+        return
+
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            # Загрузка и очистка миллионов строк дольше DB_STATEMENT_TIMEOUT_MS приложения
+            cursor.execute("SET statement_timeout = 0")
+        if args.clear:
+            clear(connection, args.movies)
+        result = run(args, CopySink(connection, args.chunk), existing_movies(connection, args.movies))
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Локальная подмена Kinopoisk API для нагрузочного теста и офлайн-разработки.
+
+Отвечает на те же запросы, что делает movie_service, детерминированными данными:
+    GET <префикс>/films/top?type=TOP_250_BEST_FILMS&page=N — страница топа (20 фильмов)
+    GET <префикс>/films/<kinopoisk_id>                     — карточка фильма
+Префикс пути не важен, поэтому KINOPOISK_BASE_URL может быть и с /api/v2.2, и без.
+
+Использование:
+    python -m app.scripts.kinopoisk_standin --port 8082 [--latency-ms 50]
+
+    KINOPOISK_BASE_URL=http://127.0.0.1:8082/api/v2.2 KINOPOISK_API_KEY=standin \\
+        python -m app.main
+"""
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from app.config import settings
+from app.logging_config import logger, setup_logging
+
+PAGE_SIZE = 20
+PAGES = 13  # как у TOP_250_BEST_FILMS
+FIRST_ID = 300_000
+GENRES = ["драма", "комедия", "фантастика", "триллер", "боевик", "мелодрама", "детектив", "мультфильм"]
+
+_FILM_PATH = re.compile(r"/films/(\d+)$")
+
+
+def film(kinopoisk_id: int) -> dict:
+    """Карточка фильма в формате /api/v2.2/films/{id}; одинакова для одного id"""
+    rng = random.Random(kinopoisk_id)
+    number = kinopoisk_id - FIRST_ID
+    return {
+        "kinopoiskId": kinopoisk_id,
+        "nameRu": f"Фильм {number}",
+        "nameOriginal": f"Movie {number}",
+        "year": rng.randint(1960, 2025),
+        "genres": [{"genre": rng.choice(GENRES)}],
+        "posterUrl": f"https://kinopoiskapiunofficial.tech/images/posters/kp/{kinopoisk_id}.jpg",
+        "description": f"Описание фильма {number}. " * rng.randint(3, 15),
+        "ratingKinopoisk": round(rng.uniform(5.0, 9.5), 1),
+    }
+
+
+def top_page(page: int) -> dict:
+    """Страница /api/v2.2/films/top"""
+    start = FIRST_ID + (page - 1) * PAGE_SIZE
+    films = [{"filmId": kinopoisk_id} for kinopoisk_id in range(start, start + PAGE_SIZE)] if page <= PAGES else []
+    return {"pagesCount": PAGES, "films": films}
+
+
+class KinopoiskStandinHandler(BaseHTTPRequestHandler):
+    latency_ms = 0.0
+
+    def do_GET(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        match = _FILM_PATH.search(path)
+        if path.endswith("/films/top"):
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            self._reply(200, top_page(page))
+        elif match:
+            self._reply(200, film(int(match.group(1))))
+        else:
+            self._reply(404, {"message": f"Unknown path {url.path}"})
+
+    def _reply(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"[kinopoisk stand-in] {format % args}")
+
+
+def serve(host: str, port: int, latency_ms: float) -> None:
+    KinopoiskStandinHandler.latency_ms = latency_ms
+    server = ThreadingHTTPServer((host, port), KinopoiskStandinHandler)
+    logger.info(f"Kinopoisk API stand-in listening on http://{host}:{port}/api/v2.2/ (latency {latency_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальная подмена Kinopoisk API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Искусственная задержка ответа")
+    args = parser.parse_args()
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
+    serve(args.host, args.port, args.latency_ms)
+
+
+if __name__ == "__main__":
+    main()
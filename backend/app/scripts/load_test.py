@@ -0,0 +1,309 @@
+"""
+Нагрузочный тест: N комнат пользователей, которые свайпают фильмы, как в Mini App.
+
+Подготовка (до замеров):
+- пользователи создаются через POST /api/users/ (telegram_id из диапазона --telegram-id-base),
+- комнаты до MAX_ROOM_SIZE человек — напрямую в БД через room_service (в API комнаты не создаются,
+  это делает бот). Повторный запуск с теми же параметрами переиспользует комнаты.
+
+Сценарий каждого пользователя (как во фронтенде):
+    GET /api/rooms/my -> [GET /api/movies/random | GET /api/movies/{id}] -> пауза -> POST /api/swipes/
+    -> после лайка без матча опрос GET /api/matches/vote-status
+Участники комнаты идут по общей колоде: первый, кто дошел до карточки, берет случайный фильм,
+остальные получают тот же фильм по id — так, как в комнате все видят одинаковые фильмы, и матчи
+действительно случаются.
+
+Результат — пропускная способность, p50/p95/p99 и доля ошибок по каждому эндпоинту в JSON.
+
+Запуск против локального Postgres и подмены Kinopoisk:
+    python -m app.scripts.kinopoisk_standin --port 8082 &
+    KINOPOISK_BASE_URL=http://127.0.0.1:8082/api/v2.2 KINOPOISK_API_KEY=standin python -m app.main &
+    python -m app.scripts.load_test --rooms 50 --duration 60 --output load_report.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+from app.database import SessionLocal
+from app.logging_config import logger, setup_logging
+from app.services.room_service import room_service
+from app.services.user_service import user_service
+
+
+@dataclass
+class EndpointStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    statuses: dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def record(self, latency_ms: float, status: str, ok: bool) -> None:
+        self.latencies_ms.append(latency_ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+
+@dataclass
+class Room:
+    participants: list[int]
+    # Общая колода комнаты: i-я карточка одинакова у всех участников
+    deck: list[str] = field(default_factory=list)
+    deck_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.stats: dict[str, EndpointStats] = {}
+        self.counters = {"swipes": 0, "likes": 0, "matches": 0, "vote_polls": 0}
+        self.deadline = 0.0
+
+    # --- HTTP ---
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[dict]:
+        """Запрос с замером; name — шаблон маршрута для отчета. None — ошибка"""
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status, ok = str(response.status_code), response.is_success
+        except httpx.HTTPError as e:
+            response, status, ok = None, type(e).__name__, False
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.stats.setdefault(name, EndpointStats()).record(latency_ms, status, ok)
+        if not ok or response is None:
+            return None
+        return response.json().get("data")
+
+    async def think(self) -> None:
+        mean = self.args.think_time_ms / 1000
+        await asyncio.sleep(random.uniform(0.5 * mean, 1.5 * mean))
+
+    # --- подготовка ---
+
+    def room_plan(self) -> list[list[int]]:
+        """telegram_id участников каждой комнаты (детерминированно от --seed)"""
+        rng = random.Random(self.args.seed)
+        plan, next_id = [], self.args.telegram_id_base
+        for _ in range(self.args.rooms):
+            size = rng.randint(self.args.min_room_size, self.args.room_size)
+            plan.append(list(range(next_id, next_id + size)))
+            next_id += size
+        return plan
+
+    async def create_users(self, client: httpx.AsyncClient, plan: list[list[int]]) -> None:
+        semaphore = asyncio.Semaphore(50)
+
+        async def create(telegram_id: int) -> None:
+            async with semaphore:
+                response = await client.post(
+                    "/api/users/", json={"telegram_id": telegram_id, "first_name": f"Load {telegram_id}"}
+                )
+                response.raise_for_status()
+
+        await asyncio.gather(*(create(telegram_id) for room in plan for telegram_id in room))
+
+    @staticmethod
+    def create_rooms(plan: list[list[int]]) -> None:
+        """Комнаты с нужным составом; комнаты прошлого запуска с тем же составом переиспользуются"""
+        db = SessionLocal()
+        try:
+            for participants in plan:
+                users = {user.telegram_id: user for user in user_service.get_users_by_telegram_ids(db, participants)}
+                creator = users[participants[0]]
+                current = room_service.get_user_current_room(db, creator)
+                if current and sorted(current.participants) == sorted(participants):
+                    continue
+                for telegram_id in participants:
+                    room = room_service.get_user_current_room(db, users[telegram_id])
+                    if room:
+                        room_service.leave_room(db, users[telegram_id], room.id)
+                room = room_service.create_room(db, creator)
+                for telegram_id in participants[1:]:
+                    room_service.join_room(db, users[telegram_id], room.id)
+        finally:
+            db.close()
+
+    # --- сценарий ---
+
+    async def next_movie(self, client: httpx.AsyncClient, room: Room, position: int) -> Optional[str]:
+        async with room.deck_lock:
+            if position >= len(room.deck):
+                movie = await self.request(client, "GET /api/movies/random", "GET", "/api/movies/random")
+                if not movie:
+                    return None
+                room.deck.append(movie["id"])
+                return movie["id"]
+            movie_id = room.deck[position]
+        movie = await self.request(client, "GET /api/movies/{id}", "GET", f"/api/movies/{movie_id}")
+        return movie["id"] if movie else None
+
+    async def user(self, client: httpx.AsyncClient, room: Room, telegram_id: int) -> None:
+        headers = {"telegram-id": str(telegram_id)}
+        await asyncio.sleep(random.uniform(0, self.args.ramp_up))
+        info = await self.request(client, "GET /api/rooms/my", "GET", "/api/rooms/my", headers=headers)
+        participants = (info or {}).get("participant_ids") or room.participants
+        group = ",".join(str(participant) for participant in sorted(participants))
+
+        position = 0
+        while time.monotonic() < self.deadline:
+            movie_id = await self.next_movie(client, room, position)
+            position += 1
+            if movie_id is None:
+                await self.think()
+                continue
+            await self.think()
+
+            swipe_type = "like" if random.random() < self.args.like_probability else "dislike"
+            result = await self.request(
+                client, "POST /api/swipes/", "POST", "/api/swipes/", headers=headers,
+                json={"movie_id": movie_id, "swipe_type": swipe_type, "group_participants": participants},
+            )
+            self.counters["swipes"] += 1
+            if swipe_type != "like" or result is None:
+                continue
+            self.counters["likes"] += 1
+            if result.get("match_found"):
+                self.counters["matches"] += 1
+                continue
+
+            # Ждем голоса остальных, как экран ожидания во фронтенде
+            for _ in range(self.args.vote_polls):
+                if time.monotonic() >= self.deadline:
+                    break
+                await asyncio.sleep(self.args.vote_poll_interval_ms / 1000)
+                status = await self.request(
+                    client, "GET /api/matches/vote-status", "GET", "/api/matches/vote-status",
+                    params={"movie_id": movie_id, "participants": group},
+                )
+                self.counters["vote_polls"] += 1
+                if status and status.get("match_ready"):
+                    break
+
+    async def run(self) -> dict:
+        plan = self.room_plan()
+        users = sum(len(participants) for participants in plan)
+        limits = httpx.Limits(max_connections=self.args.max_connections or users, max_keepalive_connections=users)
+        async with httpx.AsyncClient(base_url=self.args.base_url, timeout=self.args.timeout, limits=limits) as client:
+            if not self.args.skip_setup:
+                logger.info(f"Preparing {len(plan)} rooms with {users} users")
+                await self.create_users(client, plan)
+                await asyncio.to_thread(self.create_rooms, plan)
+
+            rooms = [Room(participants) for participants in plan]
+            logger.info(f"Running load for {self.args.duration}s")
+            started = time.monotonic()
+            self.deadline = started + self.args.duration
+            await asyncio.gather(*(
+                self.user(client, room, telegram_id) for room in rooms for telegram_id in room.participants
+            ))
+            elapsed = time.monotonic() - started
+        return self.report(len(plan), users, elapsed)
+
+    # --- отчет ---
+
+    def report(self, rooms: int, users: int, elapsed: float) -> dict:
+        endpoints = {name: _summary(stats, elapsed) for name, stats in sorted(self.stats.items())}
+        total = sum(summary["count"] for summary in endpoints.values())
+        errors = sum(summary["errors"] for summary in endpoints.values())
+        return {
+            "base_url": self.args.base_url,
+            "rooms": rooms,
+            "users": users,
+            "duration_s": round(elapsed, 2),
+            "config": {
+                "like_probability": self.args.like_probability,
+                "think_time_ms": self.args.think_time_ms,
+                "vote_polls": self.args.vote_polls,
+                "vote_poll_interval_ms": self.args.vote_poll_interval_ms,
+                "seed": self.args.seed,
+            },
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            **self.counters,
+            "endpoints": endpoints,
+        }
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _summary(stats: EndpointStats, elapsed: float) -> dict:
+    latencies = stats.latencies_ms
+    count = len(latencies)
+    return {
+        "count": count,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "errors": stats.errors,
+        "error_rate": round(stats.errors / count, 4) if count else 0.0,
+        "p50_ms": round(_percentile(latencies, 50), 1),
+        "p95_ms": round(_percentile(latencies, 95), 1),
+        "p99_ms": round(_percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies), 1),
+        "statuses": stats.statuses,
+    }
+
+
+def _print_report(report: dict) -> None:
+    print(
+        f"{report['rooms']} rooms / {report['users']} users, {report['duration_s']}s: "
+        f"{report['requests']} requests, {report['throughput_rps']} rps, error rate {report['error_rate']:.2%}"
+    )
+    print(f"swipes={report['swipes']} likes={report['likes']} matches={report['matches']} vote_polls={report['vote_polls']}")
+    print(f"{'endpoint':<32}{'count':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>9}")
+    for name, summary in report["endpoints"].items():
+        print(
+            f"{name:<32}{summary['count']:>8}{summary['throughput_rps']:>9}{summary['p50_ms']:>9}"
+            f"{summary['p95_ms']:>9}{summary['p99_ms']:>9}{summary['errors']:>9}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест: комнаты пользователей, свайпающих фильмы")
+    parser.add_argument("--base-url", default=f"http://127.0.0.1:{settings.APP_PORT}")
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--room-size", type=int, default=settings.MAX_ROOM_SIZE, help="Максимум участников комнаты")
+    parser.add_argument("--min-room-size", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=30, help="Длительность замера, секунд")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Пользователи стартуют равномерно за столько секунд")
+    parser.add_argument("--like-probability", type=float, default=0.6)
+    parser.add_argument("--think-time-ms", type=float, default=1500, help="Средняя пауза перед свайпом")
+    parser.add_argument("--vote-polls", type=int, default=3, help="Сколько раз опрашивать vote-status после лайка")
+    parser.add_argument("--vote-poll-interval-ms", type=float, default=1000)
+    parser.add_argument("--telegram-id-base", type=int, default=9_000_000_000, help="Первый telegram_id тестовых пользователей")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--max-connections", type=int, default=0, help="Лимит соединений клиента (0 — по числу пользователей)")
+    parser.add_argument("--skip-setup", action="store_true", help="Пользователи и комнаты уже созданы")
+    parser.add_argument("--output", help="Записать JSON-отчет в файл")
+    parser.add_argument("--json", action="store_true", help="Вывести JSON-отчет вместо таблицы")
+    args = parser.parse_args()
+
+    if not 1 <= args.min_room_size <= args.room_size <= settings.MAX_ROOM_SIZE:
+        parser.error(f"Нужно 1 <= --min-room-size <= --room-size <= MAX_ROOM_SIZE ({settings.MAX_ROOM_SIZE})")
+
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
+    random.seed(args.seed)
+    report = asyncio.run(LoadTest(args).run())
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
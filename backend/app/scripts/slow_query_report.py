@@ -0,0 +1,121 @@
+"""
+Отчет по журналу медленных запросов (SLOW_QUERY_LOG_FILE, см. app/slow_queries.py).
+
+Группирует записи по форме запроса (fingerprint) и ранжирует формы по суммарному
+времени: сколько раз запрос был медленным, среднее/p95/максимальное время, места вызова
+и последний снятый план. Формы, в плане которых есть Seq Scan, помечаются — это первые
+кандидаты на индекс (например, JSONB @> без GIN-индекса).
+
+Использование:
+    python -m app.scripts.slow_query_report [--file logs/slow_queries.jsonl] [--top 10]
+        [--sort total|max|count] [--since 2026-10-19T00:00:00+00:00] [--json]
+"""
+import argparse
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+
+def load_records(path: Path, since: Optional[str] = None) -> list[dict]:
+    records = []
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since and record.get("ts", "") < since:
+                continue
+            records.append(record)
+    return records
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def aggregate(records: list[dict]) -> list[dict]:
+    """Сводка по формам запросов"""
+    groups: dict[str, list[dict]] = {}
+    for record in records:
+        groups.setdefault(record["fingerprint"], []).append(record)
+
+    shapes = []
+    for key, items in groups.items():
+        durations = [item["duration_ms"] for item in items]
+        plans = [item["plan"] for item in items if item.get("plan")]
+        latest_plan = plans[-1] if plans else None
+        shapes.append({
+            "fingerprint": key,
+            "query": items[-1]["query"],
+            "count": len(items),
+            "total_ms": round(sum(durations), 1),
+            "avg_ms": round(sum(durations) / len(durations), 1),
+            "p95_ms": round(_percentile(durations, 95), 1),
+            "max_ms": round(max(durations), 1),
+            "call_sites": [site for site, _ in Counter(item.get("call_site") for item in items).most_common(3) if site],
+            "explained": len(plans),
+            "plan_shapes": len({plan["shape"] for plan in plans}),
+            "latest_plan": latest_plan,
+            "seq_scan": bool(latest_plan and latest_plan.get("seq_scans")),
+        })
+    return shapes
+
+
+def _print_report(shapes: list[dict]) -> None:
+    if not shapes:
+        print("No slow queries recorded")
+        return
+    for rank, shape in enumerate(shapes, start=1):
+        flag = "  [SEQ SCAN]" if shape["seq_scan"] else ""
+        print(f"#{rank} {shape['fingerprint']}{flag}")
+        print(
+            f"   count={shape['count']} total={shape['total_ms']}ms avg={shape['avg_ms']}ms "
+            f"p95={shape['p95_ms']}ms max={shape['max_ms']}ms"
+        )
+        print(f"   query: {shape['query'][:300]}")
+        for site in shape["call_sites"]:
+            print(f"   at: {site}")
+        plan = shape["latest_plan"]
+        if plan:
+            changed = f" ({shape['plan_shapes']} different plans seen)" if shape["plan_shapes"] > 1 else ""
+            print(f"   plan: {plan['shape']}{changed}")
+            print(
+                f"   explain: execution={plan.get('execution_ms')}ms "
+                f"buffers hit={plan.get('shared_hit_blocks')} read={plan.get('shared_read_blocks')}"
+            )
+        print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Худшие формы медленных SQL-запросов")
+    parser.add_argument("--file", default=settings.SLOW_QUERY_LOG_FILE)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--sort", choices=["total", "max", "count"], default="total")
+    parser.add_argument("--since", help="Только записи не старше ISO-времени")
+    parser.add_argument("--json", action="store_true", help="Вывести сводку в JSON")
+    args = parser.parse_args()
+
+    path = Path(args.file)
+    if not path.exists():
+        print(f"{path} not found: enable SLOW_QUERY_LOG_ENABLED=true and run the app under load")
+        return
+
+    sort_key = {"total": "total_ms", "max": "max_ms", "count": "count"}[args.sort]
+    shapes = sorted(aggregate(load_records(path, args.since)), key=lambda s: s[sort_key], reverse=True)[:args.top]
+    if args.json:
+        print(json.dumps(shapes, ensure_ascii=False, indent=2))
+    else:
+        _print_report(shapes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Локальная подмена Telegram для офлайн-проверки webhook-режима бота.
+
+Два режима:
+
+1. serve — минимальный Bot API: отвечает на getMe/setWebhook/sendMessage и т.д.
+   и печатает сообщения, которые бот "отправил" пользователям:
+
+    python -m app.scripts.telegram_standin serve --port 8081
+
+   API запускается с подменой адреса Bot API:
+
+    BOT_MODE=webhook TELEGRAM_API_BASE_URL=http://127.0.0.1:8081/bot \\
+        uvicorn app.main:app --port 8000
+
+2. send — отправляет апдейт с командой в webhook-эндпоинт API, как это делает Telegram:
+
+    python -m app.scripts.telegram_standin send "/start" --user-id 111
+    python -m app.scripts.telegram_standin send "/join_room ABC123" --user-id 222
+"""
+import argparse
+import itertools
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import httpx
+
+from app.config import settings
+from app.logging_config import logger, setup_logging
+
+STANDIN_BOT = {
+    "id": 1,
+    "is_bot": True,
+    "first_name": "Movie Tinder (stand-in)",
+    "username": "movie_tinder_standin_bot",
+    "can_join_groups": False,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": False,
+}
+
+_message_ids = itertools.count(1)
+_update_ids = itertools.count(int(time.time()))
+
+
+class BotApiStandinHandler(BaseHTTPRequestHandler):
+    """Отвечает на запросы вида POST /bot<token>/<method> в формате Bot API"""
+
+    def do_POST(self):
+        method = self.path.rstrip("/").rsplit("/", 1)[-1]
+        params = self._read_params()
+
+        if method == "getMe":
+            result = STANDIN_BOT
+        elif method == "sendMessage":
+            chat_id = int(params.get("chat_id", 0))
+            text = params.get("text", "")
+            logger.info(f"[stand-in] -> {chat_id}: {text}")
+            result = {
+                "message_id": next(_message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": STANDIN_BOT,
+                "text": text,
+            }
+        else:
+            # setWebhook, deleteWebhook, setMyCommands и т.д.
+            logger.info(f"[stand-in] {method} {params}")
+            result = True
+
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_params(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode() if length else ""
+        if not raw:
+            return {}
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(raw)
+        return {key: values[0] for key, values in parse_qs(raw).items()}
+
+    def log_message(self, format, *args):
+        # Запросы логируются в do_POST, стандартный access log не нужен
+        pass
+
+
+def build_update(text: str, user_id: int, first_name: str, username: str = None) -> dict:
+    """Апдейт Telegram с текстовым сообщением (командой) от пользователя в личном чате"""
+    user = {"id": user_id, "is_bot": False, "first_name": first_name}
+    if username:
+        user["username"] = username
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": first_name},
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": next(_update_ids), "message": message}
+
+
+def serve(host: str, port: int) -> None:
+    server = ThreadingHTTPServer((host, port), BotApiStandinHandler)
+    logger.info(f"Telegram Bot API stand-in listening on http://{host}:{port}/bot<token>/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def send(url: str, text: str, user_id: int, first_name: str, username: str = None) -> None:
+    headers = {}
+    if settings.TELEGRAM_WEBHOOK_SECRET:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = settings.TELEGRAM_WEBHOOK_SECRET
+    update = build_update(text, user_id, first_name, username)
+    response = httpx.post(url, json=update, headers=headers, timeout=10)
+    logger.info(f"POST {url} -> {response.status_code} {response.text}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальная подмена Telegram для webhook-режима бота")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Запустить подмену Bot API")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8081)
+
+    send_parser = subparsers.add_parser("send", help="Отправить апдейт в webhook API")
+    send_parser.add_argument("text", help="Текст сообщения, например \"/start\"")
+    send_parser.add_argument("--user-id", type=int, default=111)
+    send_parser.add_argument("--first-name", default="Tester")
+    send_parser.add_argument("--username", default=None)
+    send_parser.add_argument(
+        "--url",
+        default=f"http://127.0.0.1:{settings.APP_PORT}{settings.TELEGRAM_WEBHOOK_PATH}",
+    )
+
+    args = parser.parse_args()
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
+    if args.command == "serve":
+        serve(args.host, args.port)
+    else:
+        send(args.url, args.text, args.user_id, args.first_name, args.username)
+
+
+if __name__ == "__main__":
+    main()
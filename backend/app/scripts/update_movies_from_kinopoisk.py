@@ -10,9 +10,12 @@
 2. Если нечего обновлять - добавляет 5 новых популярных фильмов из Kinopoisk API
 """
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.database import SessionLocal
 from app.services.movie_service import movie_service
-from app.logging_config import logger
+from app.logging_config import logger, setup_logging
+
+BATCH_SIZE = 500  # Фильмов за один запрос к БД (и за один commit)
 
 
 def update_movies() -> None:
@@ -22,15 +25,17 @@ def update_movies() -> None:
     """
     db = SessionLocal()
     try:
-        # Получаем все фильмы
-        movies = movie_service.list_movies(db, limit=1000)
-        logger.info(f"Found {len(movies)} movies to check")
-        
+        # Обходим все фильмы пачками (keyset-пагинация), а не первую тысячу
+        checked = 0
         updated = 0
         skipped = 0
         failed = 0
         
-        for movie in movies:
+        for movie in movie_service.iter_movies(db, batch_size=BATCH_SIZE):
+            checked += 1
+            if checked % BATCH_SIZE == 0:
+                # Сохраняем обновления пачки, чтобы не держать в сессии весь каталог
+                db.commit()
             # Пропускаем если уже есть валидный постер (начинается с http)
             if movie.poster_url and movie.poster_url.startswith("http"):
                 skipped += 1
@@ -75,6 +80,7 @@ def update_movies() -> None:
         db.commit()
         logger.info("=" * 50)
         logger.info(f"Update complete:")
+        logger.info(f"  Checked: {checked}")
         logger.info(f"  Updated: {updated}")
         logger.info(f"  Skipped: {skipped}")
         logger.info(f"  Failed: {failed}")
@@ -158,5 +164,6 @@ def _add_new_movies(db: Session) -> None:
 
 
 if __name__ == "__main__":
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
     update_movies()
 
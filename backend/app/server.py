@@ -0,0 +1,121 @@
+"""
+Запуск API в проде: uvicorn с несколькими воркерами и (опционально) ботом в той же группе процессов.
+
+    python -m app.main [--workers N] [--with-bot] [--host 0.0.0.0] [--port 8000]
+
+- Воркеры: APP_WORKERS процессов uvicorn (0 — по числу ядер), event loop uvloop и парсер httptools
+  (APP_LOOP / APP_HTTP). Каждый воркер — отдельный процесс со своим пулом БД и кэшами.
+- Preload: приложение импортируется в главном процессе до запуска воркеров, чтобы ошибка
+  импорта или конфигурации остановила запуск сразу. Воркеры uvicorn создаются через spawn
+  и импортируют приложение заново — память между ними не разделяется.
+- Остановка (SIGTERM/SIGINT): uvicorn перестает принимать соединения и ждет запросы в работе
+  до APP_GRACEFUL_TIMEOUT_SECONDS, затем lifespan каждого воркера дожидается фоновой отправки
+  уведомлений и закрывает пулы БД.
+- Метрики: при нескольких процессах каждый пишет снимок своих метрик в METRICS_MULTIPROC_DIR
+  (по умолчанию — временный каталог), и GET /metrics любого воркера отдает сумму по всем
+  (app/metrics_multiproc.py). Каталог очищается при запуске.
+- Логи: если процессов несколько (воркеры, reload, процесс бота), в общие файлы логов пишут все
+  они, поэтому файлы только дописываются, а ротирует их внешний logrotate (SHARED_FILES_ENV).
+- Бот: при BOT_MODE=webhook он работает в воркерах API, а webhook в Telegram регистрирует
+  главный процесс один раз до запуска воркеров (telegram_webhook.register); при BOT_MODE=polling и APP_RUN_BOT
+  (или --with-bot) запускается один дочерний процесс app.run_bot (Telegram допускает только
+  один polling на токен) и останавливается вместе с сервером.
+"""
+import importlib
+import importlib.util
+import multiprocessing
+import os
+from typing import Optional
+
+import uvicorn
+
+from app.bot.webhook import telegram_webhook
+from app.config import settings
+from app.logging_config import SHARED_FILES_ENV, logger, setup_logging
+from app.metrics_multiproc import prepare_directory
+from app.run_bot import main as run_bot
+
+APP_IMPORT_STRING = "app.main:app"
+
+
+def worker_count(requested: int) -> int:
+    """APP_WORKERS: 0 и меньше — по числу ядер"""
+    return requested if requested > 0 else (os.cpu_count() or 1)
+
+
+def _implementation(name: str, package: str) -> str:
+    """uvloop/httptools, если установлены; иначе uvicorn выберет реализацию сам ("auto")"""
+    if name == package and importlib.util.find_spec(package) is None:
+        logger.warning(f"{package} не установлен, используется реализация uvicorn по умолчанию")
+        return "auto"
+    return name
+
+
+def _start_bot_process() -> Optional[multiprocessing.Process]:
+    if settings.BOT_MODE == "webhook":
+        logger.info("BOT_MODE=webhook: бот работает внутри воркеров API, отдельный процесс не нужен")
+        return None
+    process = multiprocessing.get_context("spawn").Process(target=run_bot, name="telegram-bot")
+    process.start()
+    logger.info(f"Telegram bot (polling) started in process {process.pid}")
+    return process
+
+
+def _stop_bot_process(process: multiprocessing.Process) -> None:
+    """SIGTERM: run_polling завершает обработку апдейтов; после таймаута — SIGKILL"""
+    if process.is_alive():
+        process.terminate()
+    process.join(settings.APP_GRACEFUL_TIMEOUT_SECONDS)
+    if process.is_alive():
+        logger.warning(f"Telegram bot process {process.pid} did not stop in time, killing")
+        process.kill()
+        process.join()
+    if process.exitcode not in (0, None, -15):
+        logger.error(f"Telegram bot process exited with code {process.exitcode}")
+
+
+def serve(
+    host: str = settings.APP_HOST,
+    port: int = settings.APP_PORT,
+    workers: int = settings.APP_WORKERS,
+    with_bot: bool = settings.APP_RUN_BOT,
+    reload: bool = False,
+) -> None:
+    """Запускает uvicorn (и процесс бота) и блокируется до остановки сервера"""
+    workers = 1 if reload else worker_count(workers)
+    if settings.APP_PRELOAD and not reload:
+        importlib.import_module(APP_IMPORT_STRING.split(":")[0])
+
+    logger.info(
+        f"Starting API on {host}:{port}: {workers} worker(s), "
+        f"graceful timeout {settings.APP_GRACEFUL_TIMEOUT_SECONDS}s"
+    )
+    if workers > 1 or reload or (with_bot and settings.BOT_MODE != "webhook"):
+        # Файлы логов общие для всех процессов: ротация в полночь из каждого процесса их бы перетирала
+        os.environ[SHARED_FILES_ENV] = "1"
+        setup_logging(settings.LOG_LEVEL, settings.LOG_FILE)
+        logger.info("Several processes share the log files: rotate them externally (logrotate)")
+        # Scrape попадает в случайный воркер: метрики складываются через общий каталог снимков
+        metrics_dir = prepare_directory()
+        logger.info(f"Metrics of all processes are aggregated via {metrics_dir}")
+
+    if telegram_webhook.enabled:
+        telegram_webhook.register()
+    bot_process = _start_bot_process() if with_bot else None
+    try:
+        uvicorn.run(
+            APP_IMPORT_STRING,
+            host=host,
+            port=port,
+            workers=workers,
+            reload=reload,
+            loop=_implementation(settings.APP_LOOP, "uvloop"),
+            http=_implementation(settings.APP_HTTP, "httptools"),
+            timeout_graceful_shutdown=settings.APP_GRACEFUL_TIMEOUT_SECONDS,
+            # Access-лог пишет RequestContextMiddleware (с request_id и duration_ms)
+            access_log=False,
+        )
+    finally:
+        if bot_process is not None:
+            _stop_bot_process(bot_process)
+        logger.info("API server stopped")
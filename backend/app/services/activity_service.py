@@ -0,0 +1,124 @@
+"""
+Отслеживание активности пользователей (User.last_active) с отложенной записью в БД.
+
+Запросы только отмечают активность в памяти (touch), а фоновый поток раз в
+ACTIVITY_FLUSH_INTERVAL_SECONDS записывает накопленное одним запросом
+UPDATE users ... FROM (VALUES ...). Сколько бы запросов ни сделал пользователь
+за интервал, в БД уходит одна строка VALUES.
+"""
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import DateTime, cast, column, update, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.logging_config import logger
+from app.metrics import registry
+from app.models.user import User
+from app.services.periodic import PeriodicWorker
+
+activity_touches_total = registry.counter(
+    "user_activity_touches_total", "Количество отметок активности пользователей"
+)
+activity_flushed_rows_total = registry.counter(
+    "user_activity_flushed_rows_total", "Количество строк last_active, записанных в БД"
+)
+activity_pending_users = registry.gauge(
+    "user_activity_pending_users", "Пользователи с активностью, еще не записанной в БД"
+)
+
+
+class ActivityTracker:
+    """Буфер последней активности пользователей: user_id -> время последнего запроса"""
+
+    def __init__(self):
+        self._pending: dict[uuid.UUID, datetime] = {}
+        self._lock = threading.Lock()
+        activity_pending_users.set_function(lambda: len(self._pending))
+
+    def touch(self, user_id: uuid.UUID, at: Optional[datetime] = None) -> None:
+        """
+        Отмечает активность пользователя. Не обращается к БД.
+
+        Args:
+            user_id: ID пользователя (User.id)
+            at: Время активности (по умолчанию — сейчас)
+        """
+        at = at or datetime.now(timezone.utc)
+        with self._lock:
+            previous = self._pending.get(user_id)
+            if previous is None or previous < at:
+                self._pending[user_id] = at
+        activity_touches_total.inc()
+
+    def flush(self, db: Session) -> int:
+        """
+        Записывает накопленную активность одним UPDATE ... FROM (VALUES ...).
+
+        Условие last_active < новое значение защищает от перезаписи более свежего
+        времени (например, если запись сделал другой процесс).
+
+        Args:
+            db: Сессия БД
+
+        Returns:
+            int: Количество обновленных строк
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        activity = values(
+            column("id", UUID(as_uuid=True)),
+            column("last_active", DateTime(timezone=True)),
+            name="activity",
+        ).data(list(pending.items()))
+
+        stmt = (
+            update(User)
+            .where(User.id == cast(activity.c.id, UUID(as_uuid=True)))
+            .where(User.last_active < cast(activity.c.last_active, DateTime(timezone=True)))
+            .values(last_active=cast(activity.c.last_active, DateTime(timezone=True)))
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            updated = db.execute(stmt).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Возвращаем данные в буфер, чтобы не потерять их до следующей попытки
+            with self._lock:
+                for user_id, at in pending.items():
+                    current = self._pending.get(user_id)
+                    if current is None or current < at:
+                        self._pending[user_id] = at
+            raise
+
+        activity_flushed_rows_total.inc(updated)
+        logger.debug(f"Flushed last_active for {len(pending)} users ({updated} rows updated)")
+        return updated
+
+    def flush_once(self) -> int:
+        """Сброс буфера в собственной сессии БД (для фонового потока)"""
+        db = SessionLocal()
+        try:
+            return self.flush(db)
+        finally:
+            db.close()
+
+
+activity_tracker = ActivityTracker()
+
+# Фоновый сброс буфера; при остановке делает последний сброс, чтобы не терять активность
+activity_flusher = PeriodicWorker(
+    name="activity-flusher",
+    interval=settings.ACTIVITY_FLUSH_INTERVAL_SECONDS,
+    task=activity_tracker.flush_once,
+    run_on_stop=True,
+)
@@ -0,0 +1,88 @@
+"""Ограниченный LRU-кэш с TTL для горячих чтений (состояние комнат, пользователи и т.д.)"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.metrics import registry
+
+cache_hits_total = registry.counter("cache_hits_total", "Попадания в кэш", ["cache"])
+cache_misses_total = registry.counter("cache_misses_total", "Промахи кэша", ["cache"])
+cache_evictions_total = registry.counter("cache_evictions_total", "Вытеснения из кэша по размеру", ["cache"])
+cache_entries = registry.gauge("cache_entries", "Текущее количество записей в кэше", ["cache"])
+
+# Маркер отсутствия значения (None может быть валидным закэшированным значением)
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш: не больше maxsize записей, каждая живет ttl секунд.
+
+    Кэш локален для процесса. Изменения из других процессов (например, бот и API
+    запущены отдельно) приходят через cache_bus; TTL ограничивает устаревание,
+    если событие потерялось.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        """
+        Args:
+            name: Имя кэша (метка в метриках)
+            maxsize: Максимальное количество записей
+            ttl: Время жизни записи по умолчанию в секундах
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Возвращает значение или default, если записи нет или она истекла"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    cache_hits_total.inc(cache=self.name)
+                    return value
+                del self._data[key]
+                cache_entries.set(len(self._data), cache=self.name)
+            cache_misses_total.inc(cache=self.name)
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение; при переполнении вытесняет самую давно используемую запись"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                cache_evictions_total.inc(cache=self.name)
+            cache_entries.set(len(self._data), cache=self.name)
+
+    def pop(self, key: Hashable) -> None:
+        """Удаляет запись (инвалидация)"""
+        with self._lock:
+            self._data.pop(key, None)
+            cache_entries.set(len(self._data), cache=self.name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            cache_entries.set(0, cache=self.name)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Статистика кэша для логов и отладки"""
+        return {
+            "size": len(self._data),
+            "hits": cache_hits_total.value(cache=self.name),
+            "misses": cache_misses_total.value(cache=self.name),
+            "evictions": cache_evictions_total.value(cache=self.name),
+        }
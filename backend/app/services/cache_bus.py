@@ -0,0 +1,161 @@
+"""
+Межпроцессная инвалидация кэшей (room_service, user_service) через PostgreSQL LISTEN/NOTIFY.
+
+Кэши живут в памяти процесса, а данные меняют и другие процессы: воркеры uvicorn,
+бот в режиме polling, скрипты. Процесс, который меняет комнату или пользователя, публикует
+событие в той же транзакции: pg_notify доставляется слушателям только после COMMIT
+(при откате — не доставляется). Каждый процесс API и бота слушает канал в фоновом потоке
+на отдельном соединении и сбрасывает у себя затронутые записи; TTL кэшей остается страховкой.
+
+Пока слушатель не подключен (старт, обрыв соединения), события теряются,
+поэтому после каждого подключения подписанные кэши сбрасываются целиком.
+"""
+import json
+import os
+import select
+import socket
+import threading
+from typing import Any, Callable, Optional
+
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import engine
+from app.logging_config import logger
+from app.metrics import registry
+
+cache_invalidation_events_total = registry.counter(
+    "cache_invalidation_events_total", "Полученные события инвалидации кэшей", ["kind"]
+)
+cache_invalidation_reconnects_total = registry.counter(
+    "cache_invalidation_reconnects_total", "Подключения слушателя событий инвалидации (со сбросом кэшей)"
+)
+
+
+class CacheInvalidationBus:
+    """Публикация событий изменения в транзакции и фоновый поток LISTEN, который их применяет"""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        # Вид события ("room", "user") -> обработчик payload в этом процессе
+        self._handlers: dict[str, Callable[[Any], None]] = {}
+        # Полный сброс кэшей после (пере)подключения, когда события могли быть пропущены
+        self._resets: list[Callable[[], None]] = []
+        self._stop_event = threading.Event()
+        # Первая попытка подключения завершена (успешно или нет)
+        self._first_attempt = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.connected = False
+
+    def subscribe(self, kind: str, handler: Callable[[Any], None], reset: Callable[[], None]) -> None:
+        """
+        Args:
+            kind: Вид события
+            handler: Применяет событие к локальному кэшу
+            reset: Сбрасывает локальный кэш целиком
+        """
+        self._handlers[kind] = handler
+        self._resets.append(reset)
+
+    @staticmethod
+    def _origin() -> str:
+        # Считается при каждом вызове: воркеры uvicorn могут быть форкнуты после импорта модуля
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _notify_stmt(self, kind: str, payload: Any):
+        event = {"kind": kind, "payload": payload, "origin": self._origin()}
+        return sql_select(func.pg_notify(self.channel, json.dumps(event)))
+
+    def publish(self, db: Session, kind: str, payload: Any) -> None:
+        """Публикует событие в текущей транзакции: слушатели получат его после db.commit()"""
+        db.execute(self._notify_stmt(kind, payload))
+
+    async def async_publish(self, db: AsyncSession, kind: str, payload: Any) -> None:
+        """Асинхронный publish() для AsyncSession"""
+        await db.execute(self._notify_stmt(kind, payload))
+
+    def dispatch(self, message: str) -> None:
+        """Применяет полученное событие; ошибка обработчика не останавливает слушателя"""
+        try:
+            event = json.loads(message)
+            if event.get("origin") == self._origin():
+                # Свой процесс уже сбросил кэш сразу после COMMIT
+                return
+            handler = self._handlers.get(event["kind"])
+            if handler is None:
+                return
+            handler(event["payload"])
+            cache_invalidation_events_total.inc(kind=event["kind"])
+        except Exception as e:
+            logger.error(f"Failed to apply cache invalidation event {message!r}: {e}", exc_info=True)
+
+    def _reset_all(self) -> None:
+        for reset in self._resets:
+            reset()
+        cache_invalidation_reconnects_total.inc()
+
+    def _connect(self):
+        # Свое соединение вне пула: LISTEN держит его все время работы процесса
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        connection = psycopg2.connect(dsn)
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return connection
+
+    def _listen(self, connection) -> None:
+        while not self._stop_event.is_set():
+            # Ждем событие не дольше секунды, чтобы вовремя заметить stop()
+            if select.select([connection], [], [], 1.0) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                self.dispatch(connection.notifies.pop(0).payload)
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                connection = self._connect()
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener cannot connect: {e}")
+                self._first_attempt.set()
+                self._stop_event.wait(settings.CACHE_INVALIDATION_RECONNECT_SECONDS)
+                continue
+            try:
+                self._reset_all()
+                self.connected = True
+                self._first_attempt.set()
+                self._listen(connection)
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener disconnected: {e}")
+            finally:
+                self.connected = False
+                connection.close()
+            self._stop_event.wait(settings.CACHE_INVALIDATION_RECONNECT_SECONDS)
+
+    def start(self, timeout: float = 5.0) -> None:
+        """Запускает слушателя и ждет первое подключение (не дольше timeout), чтобы процесс не начал отвечать из кэша без него"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._first_attempt.clear()
+        self._thread = threading.Thread(target=self._loop, name="cache-invalidation", daemon=True)
+        self._thread.start()
+        self._first_attempt.wait(timeout)
+        logger.info(f"Cache invalidation listener started (channel {self.channel})")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if not self._thread:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info("Cache invalidation listener stopped")
+
+
+cache_bus = CacheInvalidationBus("cache_invalidation")
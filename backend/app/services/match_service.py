@@ -3,9 +3,14 @@ from typing import Optional, Sequence
 
 from sqlalchemy import select, and_, cast
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from app.models.match import Match
+from app.pagination import Page, keyset_stmt, make_page
+from app.services.movie_service import movie_service
+from app.services.notification_service import notification_service
+from app.logging_config import logger
 
 class MatchService:
 
@@ -26,6 +31,17 @@ class MatchService:
         """
         return cast(col, JSONB).op("@>")(value)
 
+    @staticmethod
+    def movie_options(movie_fields: Optional[Sequence[str]] = None) -> list:
+        """
+        Загрузка фильмов вместе с матчами: selectinload — один дополнительный запрос
+        WHERE movies.id IN (...) на весь список, а не запрос на каждый матч.
+
+        Args:
+            movie_fields: Загружаемые колонки фильма (None — все, включая description)
+        """
+        return [selectinload(Match.movie).options(*movie_service.load_options(movie_fields))]
+
     def check_existing_match(self, db: Session, movie_id: str, group_participants: list[int]) -> Optional[Match]:
         """
         Проверяет, существует ли уже матч для данного фильма и группы.
@@ -38,13 +54,31 @@ class MatchService:
         Returns:
             Optional[Match]: Существующий матч или None
         """
-        stmt = select(Match).where(
+        return db.execute(self._existing_match_stmt(movie_id, group_participants)).scalar_one_or_none()
+
+    def _existing_match_stmt(self, movie_id: str, group_participants: list[int]):
+        return select(Match).where(
             and_(
                 Match.movie_id == movie_id,
                 self._group_contains(Match.group_participants, group_participants)
             )
         )
-        return db.execute(stmt).scalar_one_or_none()
+
+    @staticmethod
+    def _notify(match: Match) -> bool:
+        """
+        Отправляет уведомления в фоне (не блокируем создание матча).
+
+        Returns:
+            bool: True, если уведомление принято в очередь отправки. Иначе вызывающий снимает
+            с матча аренду, и его заберет NotificationService.resume_pending()
+        """
+        try:
+            return notification_service.send_match_notification(match)
+        except Exception as e:
+            logger.error("Failed to send match notification: %s", e, exc_info=True)
+            # Не падаем, матч уже создан
+            return False
 
     def create_match(self, db: Session, movie_id: str, group_participants: list[int]) -> Match:
         """
@@ -63,61 +97,119 @@ class MatchService:
         if existing_match:
             return existing_match
             
-        # Создаем новый матч
-        match = Match(movie_id=movie_id, group_participants=group_participants)
+        # Создаем новый матч сразу в аренде этого процесса: иначе другой воркер может забрать
+        # его в resume_pending() до того, как уведомление будет поставлено в очередь здесь
+        match = Match(
+            movie_id=movie_id,
+            group_participants=group_participants,
+            is_notified=False,
+            notify_lease_until=notification_service.lease_until(),
+        )
         db.add(match)
         db.commit()
         db.refresh(match)
         
-        # Отправляем уведомления в фоне (не блокируем создание матча)
-        try:
-            from app.services.notification_service import notification_service
-            notification_service.send_match_notification(match, db)
-            # Помечаем как отправленное (предполагаем успех)
-            # В реальности уведомление может не отправиться, но для MVP это приемлемо
-            match.is_notified = True
+        if not self._notify(match):
+            match.notify_lease_until = None
             db.add(match)
             db.commit()
-        except Exception as e:
-            from app.logging_config import logger
-            logger.error("Failed to send match notification: %s", e, exc_info=True)
-            # Не падаем, матч уже создан
-        
+
         return match
 
 
-    def list_matches_for_group(self, db: Session, group_participants: list[int], limit: int = 50, offset: int = 0) -> Sequence[Match]:
+    def _group_matches_stmt(self, group_participants: list[int], limit: int, cursor: Optional[str], movie_fields: Optional[Sequence[str]] = None):
         stmt = (
-        select(Match)
-        .where(self._group_contains(Match.group_participants, group_participants))
-        .order_by(Match.matched_at.desc())
-        .limit(limit)
-        .offset(offset)
+            select(Match)
+            .options(*self.movie_options(movie_fields))
+            .where(self._group_contains(Match.group_participants, group_participants))
         )
-        return list(db.execute(stmt).scalars())
+        return keyset_stmt(stmt, Match.matched_at, Match.id, limit, cursor)
+
+    def list_matches_for_group(
+        self, db: Session, group_participants: list[int], limit: int = 50, cursor: Optional[str] = None,
+        movie_fields: Optional[Sequence[str]] = None,
+    ) -> Page[Match]:
+        """
+        Страница матчей группы (новые первыми, keyset по (matched_at, id)) вместе с фильмами:
+        два запроса на любой размер страницы.
+
+        Raises:
+            InvalidCursor: Если курсор поврежден
+        """
+        stmt = self._group_matches_stmt(group_participants, limit, cursor, movie_fields)
+        return make_page(db.execute(stmt).scalars().all(), limit, "matched_at")
     
-    def get_match_by_id(self, db: Session, match_id: str) -> Optional[Match]:
+    def get_match_by_id(self, db: Session, match_id: str, movie_fields: Optional[Sequence[str]] = None) -> Optional[Match]:
         """
         Получает матч по его ID.
         
         Args:
             db (Session): Сессия БД
             match_id (str): ID матча
+            movie_fields: Загружаемые колонки фильма (None — все)
             
         Returns:
             Optional[Match]: Найденный матч или None, если матч не найден
         """
         stmt = (
             select(Match)
+            .options(*self.movie_options(movie_fields))
             .where(Match.id == match_id)
         )
         return db.execute(stmt).scalar_one_or_none()
 
     def mark_match_notified(self, db: Session, match: Match) -> Match:
         match.is_notified = True
+        match.notify_lease_until = None
         db.add(match)
         db.commit()
         db.refresh(match)
         return match
 
-match_service = MatchService()
\ No newline at end of file
+match_service = MatchService()
+
+
+class AsyncMatchService:
+    """Асинхронные версии горячих методов MatchService для AsyncSession"""
+
+    def __init__(self, sync_service: MatchService):
+        self._sync = sync_service
+
+    async def check_existing_match(self, db: AsyncSession, movie_id: str, group_participants: list[int]) -> Optional[Match]:
+        stmt = self._sync._existing_match_stmt(movie_id, group_participants)
+        return (await db.execute(stmt)).scalar_one_or_none()
+
+    async def create_match(self, db: AsyncSession, movie_id: str, group_participants: list[int]) -> Match:
+        """Асинхронный create_match(): создает матч, если его еще нет, и отправляет уведомления"""
+        existing_match = await self.check_existing_match(db, movie_id, group_participants)
+        if existing_match:
+            return existing_match
+
+        match = Match(
+            movie_id=movie_id,
+            group_participants=group_participants,
+            is_notified=False,
+            notify_lease_until=notification_service.lease_until(),
+        )
+        db.add(match)
+        await db.commit()
+        await db.refresh(match)
+
+        if not self._sync._notify(match):
+            match.notify_lease_until = None
+            await db.commit()
+
+        return match
+
+    async def list_matches_for_group(
+        self, db: AsyncSession, group_participants: list[int], limit: int = 50, cursor: Optional[str] = None,
+        movie_fields: Optional[Sequence[str]] = None,
+    ) -> Page[Match]:
+        stmt = self._sync._group_matches_stmt(group_participants, limit, cursor, movie_fields)
+        return make_page((await db.execute(stmt)).scalars().all(), limit, "matched_at")
+
+    async def get_match_by_id(self, db: AsyncSession, match_id: str, movie_fields: Optional[Sequence[str]] = None) -> Optional[Match]:
+        return await db.get(Match, match_id, options=self._sync.movie_options(movie_fields))
+
+
+async_match_service = AsyncMatchService(match_service)
\ No newline at end of file
@@ -1,11 +1,16 @@
 from typing import Optional, Sequence, Dict, List
 
+import asyncio
 import httpx
 import random
 from sqlalchemy import select, func
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only, undefer
 
+from app.database import SessionLocal
 from app.models.movie import Movie
+from app.pagination import Page, iter_keyset, keyset_stmt, make_page
+from app.metrics import timed
 from app.config import settings
 from app.logging_config import logger
 
@@ -37,7 +42,22 @@ class MovieService:
         db.refresh(movie)
         return movie
     
-    def get_random_movie(self, db: Session) -> Optional[Movie]:
+    @staticmethod
+    def load_options(fields: Optional[Sequence[str]] = None) -> list:
+        """
+        Опции загрузки Movie под набор полей ответа.
+
+        Args:
+            fields: Имена колонок, которые нужны ответу (None — все, включая отложенный description)
+
+        Returns:
+            list: Опции для select(...).options() / db.get(..., options=...)
+        """
+        if fields is None:
+            return [undefer(Movie.description)]
+        return [load_only(*(getattr(Movie, field) for field in fields))]
+
+    def get_random_movie(self, db: Session, fields: Optional[Sequence[str]] = None) -> Optional[Movie]:
         """
         Получает случайный фильм. Автоматически поддерживает запас фильмов в БД.
 
@@ -47,35 +67,22 @@ class MovieService:
         - Показывать только непросмотренные фильмы
         - Персонализировать рекомендации на основе предпочтений
 
+        Args:
+            fields: Загружаемые колонки (None — все)
+
         Returns:
             Случайный фильм или None если нет фильмов и не удалось загрузить
         """
-        from app.config import settings
-
         # Считаем количество фильмов в БД
-        total_movies = db.query(func.count(Movie.id)).scalar()
+        total_movies = db.execute(select(func.count(Movie.id))).scalar_one()
 
         # Если фильмов меньше порога - загружаем новые
         if total_movies < settings.MOVIES_LOAD_THRESHOLD:
-            needed = settings.MIN_MOVIES_COUNT - total_movies
-            load_count = min(needed, settings.MOVIES_LOAD_BATCH)
-
-            logger.info(f"Only {total_movies} movies in DB (threshold: {settings.MOVIES_LOAD_THRESHOLD}), loading {load_count} more...")
-            loaded = self.load_batch_movies(db, count=load_count)
-            if loaded == 0 and total_movies == 0:
-                logger.error("No movies in DB and failed to load new ones")
+            if not self.refill_catalog(db, total_movies):
                 return None
 
-            # TODO: В будущем заменить на персонализированную систему просмотренных фильмов
-            # Сейчас используем простую ротацию контента для MVP
-            # Идея: добавить таблицу user_viewed_movies для отслеживания просмотренных фильмов каждым пользователем
-            # Это позволит показывать только новые фильмы и персонализировать рекомендации
-
-            # После загрузки новых фильмов - очищаем старые для ротации контента
-            self.cleanup_old_movies(db)
-
         # Получаем случайный фильм
-        stmt = select(Movie).order_by(func.random()).limit(1)
+        stmt = select(Movie).options(*self.load_options(fields)).order_by(func.random()).limit(1)
         movie = db.execute(stmt).scalar_one_or_none()
 
         if movie:
@@ -86,8 +93,47 @@ class MovieService:
         return movie
 
 
-    def get_movie_by_id(self, db: Session, id: str) -> Optional[Movie]:
-        return db.get(Movie, id)
+    @timed("catalog_refill")
+    def refill_catalog(self, db: Session, total_movies: int) -> bool:
+        """
+        Догружает фильмы из Kinopoisk, когда их в БД меньше порога MOVIES_LOAD_THRESHOLD.
+
+        Args:
+            db: Сессия БД
+            total_movies: Текущее количество фильмов в БД
+
+        Returns:
+            bool: False, если фильмов нет совсем и загрузить не удалось
+        """
+        needed = settings.MIN_MOVIES_COUNT - total_movies
+        load_count = min(needed, settings.MOVIES_LOAD_BATCH)
+
+        logger.info(f"Only {total_movies} movies in DB (threshold: {settings.MOVIES_LOAD_THRESHOLD}), loading {load_count} more...")
+        loaded = self.load_batch_movies(db, count=load_count)
+        if loaded == 0 and total_movies == 0:
+            logger.error("No movies in DB and failed to load new ones")
+            return False
+
+        # TODO: В будущем заменить на персонализированную систему просмотренных фильмов
+        # Сейчас используем простую ротацию контента для MVP
+        # Идея: добавить таблицу user_viewed_movies для отслеживания просмотренных фильмов каждым пользователем
+        # Это позволит показывать только новые фильмы и персонализировать рекомендации
+
+        # После загрузки новых фильмов - очищаем старые для ротации контента
+        self.cleanup_old_movies(db)
+        return True
+
+    def refill_catalog_in_new_session(self, total_movies: int) -> bool:
+        """refill_catalog() в собственной сессии — для вызова из отдельного потока"""
+        db = SessionLocal()
+        try:
+            return self.refill_catalog(db, total_movies)
+        finally:
+            db.close()
+
+
+    def get_movie_by_id(self, db: Session, id: str, fields: Optional[Sequence[str]] = None) -> Optional[Movie]:
+        return db.get(Movie, id, options=self.load_options(fields))
 
 
     def get_movie_by_kinopoisk_id(self, db: Session, kinopoisk_id: int) -> Optional[Movie]:
@@ -95,9 +141,14 @@ class MovieService:
         return db.execute(stmt).scalar_one_or_none()
 
 
-    def list_movies(self, db: Session, limit: int = 50, offset: int = 0) -> Sequence[Movie]:
-        stmt = select(Movie).order_by(Movie.created_at.desc()).limit(limit).offset(offset)
-        return list(db.execute(stmt).scalars())
+    def list_movies(self, db: Session, limit: int = 50, cursor: Optional[str] = None) -> Page[Movie]:
+        """Страница фильмов, новые первыми (keyset по (created_at, id), см. app/pagination.py)"""
+        stmt = keyset_stmt(select(Movie), Movie.created_at, Movie.id, limit, cursor)
+        return make_page(db.execute(stmt).scalars().all(), limit, "created_at")
+
+    def iter_movies(self, db: Session, batch_size: int = 500):
+        """Все фильмы пачками по batch_size, от старых к новым (для скриптов)"""
+        return iter_keyset(db, select(Movie), Movie.created_at, Movie.id, batch_size)
 
 
     def update_movie_active(self, db: Session, movie: Movie, is_active: bool) -> Movie:
@@ -112,6 +163,7 @@ class MovieService:
         db.delete(movie)
         db.commit()
 
+    @timed("kinopoisk_top_movies")
     def get_top_movies_from_kinopoisk(self, page: int = 1, limit: int = 10) -> List[Dict]:
         """
         Получает топ фильмов из Kinopoisk API.
@@ -250,8 +302,6 @@ class MovieService:
         Returns:
             Количество удаленных фильмов
         """
-        from app.config import settings
-
         # Получаем общее количество фильмов
         total_movies = db.query(func.count(Movie.id)).scalar()
 
@@ -279,6 +329,7 @@ class MovieService:
         logger.info(f"Cleaned up {len(movie_ids_to_delete)} old movies")
         return len(movie_ids_to_delete)
 
+    @timed("kinopoisk_movie")
     def fetch_movie_from_kinopoisk(self, kinopoisk_id: int, full_data: bool = False) -> Optional[Dict]:
         """
         Получает данные о фильме из Kinopoisk API.
@@ -431,4 +482,38 @@ class MovieService:
             logger.error(f"Failed to fetch movie {kinopoisk_id} from Kinopoisk: {e}", exc_info=True)
             return None
 
-movie_service = MovieService()
\ No newline at end of file
+movie_service = MovieService()
+
+
+class AsyncMovieService:
+    """Асинхронные версии горячих методов MovieService для AsyncSession"""
+
+    def __init__(self, sync_service: MovieService):
+        self._sync = sync_service
+
+    async def get_random_movie(self, db: AsyncSession, fields: Optional[Sequence[str]] = None) -> Optional[Movie]:
+        """
+        Асинхронный get_random_movie().
+
+        Догрузка каталога ходит в Kinopoisk синхронным httpx-клиентом, поэтому она
+        выполняется в отдельном потоке со своей сессией и не блокирует event loop.
+        """
+        total_movies = (await db.execute(select(func.count(Movie.id)))).scalar_one()
+
+        if total_movies < settings.MOVIES_LOAD_THRESHOLD:
+            refilled = await asyncio.to_thread(self._sync.refill_catalog_in_new_session, total_movies)
+            if not refilled:
+                return None
+
+        stmt = select(Movie).options(*self._sync.load_options(fields)).order_by(func.random()).limit(1)
+        movie = (await db.execute(stmt)).scalar_one_or_none()
+
+        if not movie:
+            logger.warning("No movies available after attempting to load more")
+        return movie
+
+    async def get_movie_by_id(self, db: AsyncSession, id: str, fields: Optional[Sequence[str]] = None) -> Optional[Movie]:
+        return await db.get(Movie, id, options=self._sync.load_options(fields))
+
+
+async_movie_service = AsyncMovieService(movie_service)
\ No newline at end of file
@@ -1,108 +1,294 @@
 """
 Сервис для отправки уведомлений в Telegram
+
+Уведомления отправляются в фоне через TaskRuntime (отдельный поток с event loop,
+ограниченная очередь), который запускается и останавливается вместе с процессом.
+Матч остается неотправленным (matches.is_notified=False), пока уведомление не доставлено;
+кто его отправляет, определяет аренда matches.notify_lease_until:
+- новый матч создается сразу в аренде создавшего его процесса (NOTIFICATION_LEASE_SECONDS);
+- после успешной отправки матч помечается is_notified=True, после неудачной (сетевая ошибка
+  Telegram) аренда продлевается на NOTIFICATION_RETRY_INTERVAL_SECONDS — это пауза до повтора;
+- resume_pending() при старте и затем раз в NOTIFICATION_RETRY_INTERVAL_SECONDS забирает
+  матчи без аренды или с истекшей арендой (UPDATE ... RETURNING + SKIP LOCKED: при нескольких
+  воркерах каждый матч достается одному) — так досылаются и неудачные отправки, и матчи
+  процесса, убитого на середине (SIGKILL, OOM);
+- при остановке runtime ждет отправку до APP_GRACEFUL_TIMEOUT_SECONDS, а с не успевших
+  матчей аренда снимается, чтобы их сразу забрал следующий процесс.
+Доставка «не меньше одного раза»: повтор отправляется всей группе, включая тех,
+кому первая попытка успела дойти.
 """
 import asyncio
+import atexit
 import threading
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import or_, select, update
 from telegram import Bot
-from telegram.error import TelegramError
-from sqlalchemy.orm import Session
+from telegram.error import BadRequest, Forbidden, TelegramError
 
 from app.config import settings
+from app.database import SessionLocal
 from app.models.match import Match
+from app.models.movie import Movie
 from app.services.movie_service import movie_service
+from app.services.periodic import PeriodicWorker
+from app.services.task_runtime import TaskRuntime
+from app.metrics import timed
 from app.logging_config import logger
 
 
 class NotificationService:
     """Сервис для отправки уведомлений о матчах"""
-    
+
     def __init__(self):
-        if not settings.TELEGRAM_BOT_TOKEN:
-            logger.warning("TELEGRAM_BOT_TOKEN не задан, уведомления не будут отправляться")
-            self.bot = None
-        else:
-            self.bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
-    
+        # Bot создается в start() (lifespan API или старт бота), а не при импорте модуля
+        self.bot: Optional[Bot] = None
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._runtime = TaskRuntime(
+            "notifications", settings.NOTIFICATION_CONCURRENCY, settings.NOTIFICATION_MAX_PENDING
+        )
+        # Повтор неудачных отправок и матчи с истекшей арендой (процесс-владелец убит)
+        self._retry_worker = PeriodicWorker(
+            "notification-retry", settings.NOTIFICATION_RETRY_INTERVAL_SECONDS, self.resume_pending
+        )
+
+    @staticmethod
+    def lease_until() -> datetime:
+        """Срок аренды для матча, который этот процесс берет в отправку"""
+        return datetime.now(timezone.utc) + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+
+    def start(self, resume: bool = True) -> None:
+        """
+        Создает клиент Telegram Bot API и запускает очередь отправки (один раз на процесс).
+
+        Args:
+            resume: Дослать уведомления, не отправленные до прошлой остановки
+        """
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            if not settings.TELEGRAM_BOT_TOKEN:
+                logger.warning("TELEGRAM_BOT_TOKEN не задан, уведомления не будут отправляться")
+                return
+            bot_kwargs = {"base_url": settings.TELEGRAM_API_BASE_URL} if settings.TELEGRAM_API_BASE_URL else {}
+            self.bot = Bot(token=settings.TELEGRAM_BOT_TOKEN, **bot_kwargs)
+            self._runtime.start()
+            self._retry_worker.start()
+            # Процесс без lifespan (скрипт) тоже не должен терять очередь при выходе
+            atexit.register(self.stop, settings.APP_GRACEFUL_TIMEOUT_SECONDS)
+        if resume:
+            self.resume_pending()
+
+    def stop(self, timeout: float) -> None:
+        """Перестает принимать уведомления, дожидается отправки, с не успевших снимает аренду"""
+        self._retry_worker.stop(timeout=5)
+        leftover = self._runtime.stop(timeout)
+        if leftover:
+            self._release(leftover)
+            logger.warning(f"{len(leftover)} match notification(s) released for another process to resend")
+
+    @staticmethod
+    def _load_movie(movie_id: str) -> Optional[Movie]:
+        db = SessionLocal()
+        try:
+            return movie_service.get_movie_by_id(db, movie_id, fields=("title", "year"))
+        finally:
+            db.close()
+
+    @timed("notification_send")
     async def _send_match_notification_async(self, match_id: str, movie_id: str, group_participants: list[int]) -> bool:
         """
         Асинхронная отправка уведомления о матче всем участникам группы.
-        
+
         Args:
             match_id: ID матча
             movie_id: ID фильма
             group_participants: Список telegram_id участников группы
-            
+
         Returns:
-            bool: True если хотя бы одно уведомление отправлено успешно
+            bool: True, если отправлять больше нечего: каждый участник получил сообщение
+            или не может его получить (заблокировал бота, чат не найден). False — хотя бы
+            одна отправка не удалась из-за сети или лимитов Telegram, нужен повтор
         """
         if not self.bot:
             logger.warning("Bot not initialized, skipping notification")
             return False
-        
-        # Создаем новую сессию БД для асинхронного контекста
-        from app.database import SessionLocal
+
+        # Синхронная сессия БД — в пуле потоков, чтобы не блокировать отправку других уведомлений
+        movie = await asyncio.to_thread(self._load_movie, movie_id)
+        if not movie:
+            # Фильм удален — матч удален вместе с ним (ON DELETE CASCADE), повторять нечего
+            logger.error(f"Movie {movie_id} not found for match {match_id}")
+            return True
+
+        # Формируем сообщение
+        message = "🎬 Найден матч!\n\n"
+        message += f"Фильм: {movie.title}"
+        if movie.year:
+            message += f" ({movie.year})"
+        message += "\n\nВсе участники группы лайкнули этот фильм!"
+
+        delivered = True
+        # Отправляем каждому участнику группы
+        for telegram_id in group_participants:
+            try:
+                await self.bot.send_message(
+                    chat_id=telegram_id,
+                    text=message
+                )
+                logger.info(f"Match notification sent to user {telegram_id} for match {match_id}")
+            except (Forbidden, BadRequest) as e:
+                # Повтор не поможет: пользователь заблокировал бота или чата нет
+                logger.warning(f"Notification to {telegram_id} rejected permanently: {e}")
+            except TelegramError as e:
+                logger.error(f"Failed to send notification to {telegram_id}: {e}")
+                delivered = False
+
+        return delivered
+
+    async def _deliver(self, match_id: str, movie_id: str, group_participants: list[int]) -> bool:
+        """Задача runtime: отправляет уведомление и записывает результат в матч"""
+        try:
+            delivered = await self._send_match_notification_async(match_id, movie_id, group_participants)
+        except Exception:
+            await asyncio.to_thread(self._finish, match_id, False)
+            raise
+        await asyncio.to_thread(self._finish, match_id, delivered)
+        return delivered
+
+    @staticmethod
+    def _finish(match_id: str, delivered: bool) -> None:
+        """
+        Успех — матч помечается is_notified=True. Неудача — аренда продлевается на паузу
+        до повтора, после нее матч заберет resume_pending() (в этом или другом процессе).
+        """
+        if delivered:
+            values = {"is_notified": True, "notify_lease_until": None}
+        else:
+            values = {
+                "notify_lease_until": datetime.now(timezone.utc)
+                + timedelta(seconds=settings.NOTIFICATION_RETRY_INTERVAL_SECONDS)
+            }
         db = SessionLocal()
         try:
-            # Получаем информацию о фильме
-            movie = movie_service.get_movie_by_id(db, movie_id)
-            if not movie:
-                logger.error(f"Movie {movie_id} not found for match {match_id}")
-                return False
-            
-            # Формируем сообщение
-            message = "🎬 Найден матч!\n\n"
-            message += f"Фильм: {movie.title}"
-            if movie.year:
-                message += f" ({movie.year})"
-            message += "\n\nВсе участники группы лайкнули этот фильм!"
-            
-            success_count = 0
-            # Отправляем каждому участнику группы
-            for telegram_id in group_participants:
-                try:
-                    await self.bot.send_message(
-                        chat_id=telegram_id,
-                        text=message
-                    )
-                    success_count += 1
-                    logger.info(f"Match notification sent to user {telegram_id} for match {match_id}")
-                except TelegramError as e:
-                    logger.error(f"Failed to send notification to {telegram_id}: {e}")
-            
-            return success_count > 0
+            db.execute(
+                update(Match).where(Match.id == match_id).values(**values),
+                execution_options={"synchronize_session": False},
+            )
+            db.commit()
+        except Exception as e:
+            # Аренда истечет сама, и уведомление отправится повторно
+            db.rollback()
+            logger.error(f"Failed to record notification result for match {match_id}: {e}")
         finally:
             db.close()
-    
-    def send_match_notification(self, match: Match, db: Session) -> None:
+        if not delivered:
+            logger.warning(
+                f"Notification for match {match_id} failed, retry in {settings.NOTIFICATION_RETRY_INTERVAL_SECONDS}s"
+            )
+
+    def _submit(self, match_id: str, movie_id: str, group_participants: list[int]) -> bool:
+        return self._runtime.submit(
+            match_id, lambda: self._deliver(match_id, movie_id, group_participants)
+        )
+
+    def send_match_notification(self, match: Match) -> bool:
         """
-        Отправляет уведомление о матче в фоновом режиме (не блокирует).
-        
+        Ставит уведомление о матче в очередь фоновой отправки (не блокирует).
+
         Args:
-            match: Объект матча
-            db: Сессия БД (используется только для чтения данных перед запуском фоновой задачи)
+            match: Объект матча в аренде этого процесса (данные извлекаются до постановки в очередь)
+
+        Returns:
+            bool: True, если уведомление принято к отправке. False — бот не настроен, очередь
+            заполнена или процесс останавливается: вызывающий снимает аренду, и матч
+            заберет resume_pending()
         """
-        # Извлекаем данные до запуска фоновой задачи
+        # Процесс без lifespan (скрипт, тест) запускает очередь при первом матче
+        self.start(resume=False)
+
+        # Извлекаем данные до постановки в очередь
         match_id = str(match.id)
-        movie_id = str(match.movie_id)
-        group_participants = match.group_participants.copy()
-        
-        def run_async():
-            """Запускает асинхронную функцию в новом event loop"""
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(
-                    self._send_match_notification_async(match_id, movie_id, group_participants)
-                )
-                loop.close()
-            except Exception as e:
-                logger.error(f"Error in async notification task: {e}", exc_info=True)
-        
-        # Запускаем в отдельном потоке, чтобы не блокировать основной поток
-        thread = threading.Thread(target=run_async, daemon=True)
-        thread.start()
-        logger.info(f"Notification task started for match {match_id}")
+        accepted = self._submit(match_id, str(match.movie_id), list(match.group_participants))
+        if accepted:
+            logger.info(f"Notification queued for match {match_id}")
+        elif self.bot:
+            logger.warning(f"Notification for match {match_id} not queued, will be resumed later")
+        return accepted
 
+    def resume_pending(self) -> int:
+        """
+        Забирает в аренду матчи с неотправленными уведомлениями (без аренды или с истекшей)
+        и ставит их в очередь.
 
-notification_service = NotificationService()
+        Returns:
+            int: Сколько уведомлений поставлено в очередь
+        """
+        if not self.bot or not self._runtime.accepting:
+            return 0
+        capacity = settings.NOTIFICATION_MAX_PENDING - len(self._runtime.pending())
+        if capacity <= 0:
+            return 0
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(hours=settings.NOTIFICATION_RESUME_MAX_AGE_HOURS)
+        # SKIP LOCKED + UPDATE ... RETURNING: параллельно работающие воркеры не заберут один матч дважды
+        pending_ids = (
+            select(Match.id)
+            .where(
+                Match.is_notified.is_(False),
+                Match.matched_at >= cutoff,
+                or_(Match.notify_lease_until.is_(None), Match.notify_lease_until < now),
+            )
+            .order_by(Match.matched_at)
+            .limit(capacity)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(Match)
+            .where(Match.id.in_(pending_ids.scalar_subquery()))
+            .values(notify_lease_until=self.lease_until())
+            .returning(Match.id, Match.movie_id, Match.group_participants)
+        )
+        db = SessionLocal()
+        try:
+            rows = db.execute(stmt, execution_options={"synchronize_session": False}).all()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to load pending match notifications: {e}")
+            return 0
+        finally:
+            db.close()
+
+        refused = [str(row.id) for row in rows if not self._submit(str(row.id), str(row.movie_id), row.group_participants)]
+        if refused:
+            self._release(refused)
+        resumed = len(rows) - len(refused)
+        if resumed:
+            logger.info(f"Resumed {resumed} pending match notification(s)")
+        return resumed
 
+    @staticmethod
+    def _release(match_ids: Iterable[str]) -> None:
+        """Снимает аренду с неотправленных матчей — их сразу может забрать resume_pending()"""
+        match_ids = list(match_ids)
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Match)
+                .where(Match.id.in_(match_ids), Match.is_notified.is_(False))
+                .values(notify_lease_until=None),
+                execution_options={"synchronize_session": False},
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to persist unsent match notifications {match_ids}: {e}")
+        finally:
+            db.close()
+
+
+notification_service = NotificationService()
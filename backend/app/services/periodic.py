@@ -0,0 +1,58 @@
+"""Фоновый поток, который периодически выполняет задачу (чистка комнат, сброс буферов и т.д.)"""
+import threading
+from typing import Callable, Optional
+
+from app.logging_config import logger
+
+
+class PeriodicWorker:
+    """
+    Запускает функцию раз в interval секунд в отдельном daemon-потоке.
+
+    Ошибки внутри задачи логируются и не останавливают поток.
+    stop() прерывает ожидание сразу, а не по истечении интервала.
+    """
+
+    def __init__(self, name: str, interval: float, task: Callable[[], object], run_on_stop: bool = False):
+        """
+        Args:
+            name: Имя потока (для логов)
+            interval: Интервал между запусками в секундах
+            task: Функция без аргументов, которую нужно выполнять
+            run_on_stop: Выполнить задачу последний раз при остановке (например, сбросить буфер)
+        """
+        self.name = name
+        self.interval = interval
+        self.task = task
+        self.run_on_stop = run_on_stop
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run_task(self) -> None:
+        try:
+            self.task()
+        except Exception as e:
+            logger.error(f"Periodic task {self.name} failed: {e}", exc_info=True)
+
+    def _loop(self) -> None:
+        # wait() возвращает True, если был вызван stop() — тогда выходим
+        while not self._stop_event.wait(self.interval):
+            self._run_task()
+        if self.run_on_stop:
+            self._run_task()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"Periodic worker {self.name} started (interval {self.interval}s)")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if not self._thread:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info(f"Periodic worker {self.name} stopped")
@@ -0,0 +1,297 @@
+"""
+Очистка неактивных комнат: комнаты без активности дольше SESSION_DURATION_HOURS удаляются,
+а их свайпы и матчи переносятся в архивные таблицы.
+
+Свайпы и матчи записываются под составом группы на момент свайпа. После входа или выхода
+участника прежний состав уже не совпадает ни с одной комнатой, и при удалении комнаты
+его строки не находятся. Поэтому room_service отмечает прежний состав в retired_groups,
+а проход очистки архивирует отмеченные дольше SESSION_DURATION_HOURS назад составы,
+которых нет ни в одной комнате. Кандидаты выбираются по индексу retired_at, без сканирования user_swipes.
+
+Так горячие таблицы rooms, user_swipes и matches (и JSONB-сканы по ним)
+остаются ограничены живыми сессиями.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, cast, delete, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.logging_config import logger
+from app.metrics import registry
+from app.models.archive import MatchArchive, RetiredGroup, UserSwipeArchive
+from app.models.match import Match
+from app.models.room import Room
+from app.models.swipe import UserSwipe
+from app.models.user import User
+from app.services.periodic import PeriodicWorker
+from app.services.room_service import room_service
+
+rooms_expired_total = registry.counter(
+    "room_sweeper_rooms_expired_total", "Количество удаленных неактивных комнат"
+)
+swipes_archived_total = registry.counter(
+    "room_sweeper_swipes_archived_total", "Количество свайпов, перенесенных в архив"
+)
+orphan_groups_archived_total = registry.counter(
+    "room_sweeper_orphan_groups_archived_total", "Количество осиротевших составов групп, перенесенных в архив"
+)
+matches_archived_total = registry.counter(
+    "room_sweeper_matches_archived_total", "Количество матчей, перенесенных в архив"
+)
+sweep_duration_seconds = registry.histogram(
+    "room_sweeper_run_duration_seconds", "Длительность одного прохода очистки комнат"
+)
+sweep_last_run_timestamp = registry.gauge(
+    "room_sweeper_last_run_timestamp_seconds", "Unix-время последнего прохода очистки комнат"
+)
+
+
+class RoomExpiryService:
+    """Удаление истекших комнат небольшими пачками с архивированием их свайпов и матчей"""
+
+    @staticmethod
+    def _same_group(col, group: list[int]):
+        """
+        Равенство множеств участников через JSONB: col @> group AND col <@ group.
+
+        Args:
+            col: Колонка модели, содержащая JSONB массив участников
+            group: Список telegram_id участников
+
+        Returns:
+            SQLAlchemy выражение для фильтрации
+        """
+        return and_(cast(col, JSONB).op("@>")(group), cast(col, JSONB).op("<@")(group))
+
+    def get_cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Граница активности: комнаты, неактивные с этого момента, считаются истекшими"""
+        now = now or datetime.now(timezone.utc)
+        return now - timedelta(hours=settings.SESSION_DURATION_HOURS)
+
+    def _has_room(self, db: Session, group: list[int], exclude_room_id: Optional[str] = None) -> bool:
+        """Играет ли состав group в какой-либо комнате (кроме exclude_room_id)"""
+        stmt = select(Room.id).where(self._same_group(Room.participants, group))
+        if exclude_room_id is not None:
+            stmt = stmt.where(Room.id != exclude_room_id)
+        return db.execute(stmt.limit(1)).first() is not None
+
+    def _archive_group(self, db: Session, room_id: Optional[str], group: list[int]) -> tuple[int, int]:
+        """
+        Переносит свайпы и матчи группы в архив одним запросом на таблицу:
+        WITH moved AS (DELETE ... RETURNING ...) INSERT INTO archive SELECT ... FROM moved
+
+        Свайпы группы делают только ее участники, поэтому они ищутся по user_id
+        (индекс idx_user_swipes_user_swiped_at), а не сканированием всей user_swipes.
+
+        Returns:
+            tuple[int, int]: Количество перенесенных свайпов и матчей
+        """
+        members = select(User.id).where(User.telegram_id.in_(group))
+        moved_swipes = (
+            delete(UserSwipe)
+            .where(UserSwipe.user_id.in_(members), self._same_group(UserSwipe.group_participants, group))
+            .returning(
+                UserSwipe.id,
+                UserSwipe.user_id,
+                UserSwipe.movie_id,
+                UserSwipe.swipe_type,
+                UserSwipe.swiped_at,
+                UserSwipe.group_participants,
+            )
+            .cte("moved_swipes")
+        )
+        swipes_stmt = insert(UserSwipeArchive).from_select(
+            ["id", "user_id", "movie_id", "swipe_type", "swiped_at", "group_participants", "room_id", "archived_at"],
+            select(
+                moved_swipes.c.id,
+                moved_swipes.c.user_id,
+                moved_swipes.c.movie_id,
+                moved_swipes.c.swipe_type,
+                moved_swipes.c.swiped_at,
+                moved_swipes.c.group_participants,
+                literal(room_id),
+                func.now(),
+            ),
+        )
+        swipes_count = db.execute(swipes_stmt).rowcount
+
+        moved_matches = (
+            delete(Match)
+            .where(self._same_group(Match.group_participants, group))
+            .returning(
+                Match.id,
+                Match.movie_id,
+                Match.matched_at,
+                Match.is_notified,
+                Match.group_participants,
+            )
+            .cte("moved_matches")
+        )
+        matches_stmt = insert(MatchArchive).from_select(
+            ["id", "movie_id", "matched_at", "is_notified", "group_participants", "room_id", "archived_at"],
+            select(
+                moved_matches.c.id,
+                moved_matches.c.movie_id,
+                moved_matches.c.matched_at,
+                moved_matches.c.is_notified,
+                moved_matches.c.group_participants,
+                literal(room_id),
+                func.now(),
+            ),
+        )
+        matches_count = db.execute(matches_stmt).rowcount
+        return swipes_count, matches_count
+
+    def expire_batch(self, db: Session, cutoff: datetime, batch_size: int) -> dict:
+        """
+        Удаляет одну пачку истекших комнат в одной транзакции.
+
+        Кандидаты выбираются по индексу idx_rooms_created_at (комната не может быть
+        активна позже, чем создана), затем фильтруются по last_activity_at.
+        FOR UPDATE SKIP LOCKED позволяет нескольким воркерам работать параллельно
+        и не ждать комнаты, которые прямо сейчас меняются.
+
+        Args:
+            db: Сессия БД
+            cutoff: Граница активности
+            batch_size: Максимальное количество комнат в пачке
+
+        Returns:
+            dict: Статистика пачки (rooms, swipes, matches)
+        """
+        stmt = (
+            select(Room)
+            .where(and_(Room.created_at < cutoff, Room.last_activity_at < cutoff))
+            .order_by(Room.created_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        rooms = list(db.execute(stmt).scalars())
+
+        stats = {"rooms": 0, "swipes": 0, "matches": 0}
+        expired: list[tuple[str, list[int]]] = []
+        for room in rooms:
+            group = sorted(set(room.participants or []))
+            expired.append((room.id, group))
+            if group:
+                # Тот же состав может играть в другой, живой комнате — тогда его история еще нужна
+                if not self._has_room(db, group, exclude_room_id=room.id):
+                    swipes_count, matches_count = self._archive_group(db, room.id, group)
+                    stats["swipes"] += swipes_count
+                    stats["matches"] += matches_count
+            db.delete(room)
+            room_service.publish_change(db, room.id, group)
+            stats["rooms"] += 1
+
+        db.commit()
+        for room_id, group in expired:
+            room_service.invalidate_room(room_id, group)
+        return stats
+
+    def archive_retired_groups(self, db: Session, cutoff: datetime, batch_size: int, max_batches: int) -> dict:
+        """
+        Переносит в архив свайпы и матчи прежних составов групп (retired_groups), отмеченных
+        раньше cutoff, по batch_size составов в транзакции. Состав, который снова играет
+        в комнате, только снимается с учета: его история уйдет в архив вместе с комнатой.
+
+        Args:
+            db: Сессия БД
+            cutoff: Граница активности
+            batch_size: Максимальное количество составов в пачке
+            max_batches: Максимальное количество пачек
+
+        Returns:
+            dict: Статистика (groups, swipes, matches)
+        """
+        stats = {"groups": 0, "swipes": 0, "matches": 0}
+        for _ in range(max_batches):
+            # Только колонки, без ORM-объектов: ключ JSONB-списком не хэшируется в identity map
+            stmt = (
+                select(RetiredGroup.participants)
+                .where(RetiredGroup.retired_at < cutoff)
+                .order_by(RetiredGroup.retired_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            retired = list(db.execute(stmt).scalars())
+            for group in retired:
+                if not self._has_room(db, group):
+                    swipes_count, matches_count = self._archive_group(db, None, group)
+                    stats["groups"] += 1
+                    stats["swipes"] += swipes_count
+                    stats["matches"] += matches_count
+                db.execute(delete(RetiredGroup).where(RetiredGroup.participants == group))
+            db.commit()
+            if len(retired) < batch_size:
+                break
+        return stats
+
+    def sweep(self, db: Session, now: Optional[datetime] = None) -> dict:
+        """
+        Один проход очистки: пачки по ROOM_SWEEP_BATCH_SIZE, не больше ROOM_SWEEP_MAX_BATCHES.
+
+        Args:
+            db: Сессия БД
+            now: Текущее время (для тестов и ручного запуска)
+
+        Returns:
+            dict: Суммарная статистика прохода
+        """
+        started = time.perf_counter()
+        cutoff = self.get_cutoff(now)
+        batch_size = settings.ROOM_SWEEP_BATCH_SIZE
+        totals = {"rooms": 0, "swipes": 0, "matches": 0, "batches": 0, "orphan_groups": 0}
+
+        try:
+            for _ in range(settings.ROOM_SWEEP_MAX_BATCHES):
+                stats = self.expire_batch(db, cutoff, batch_size)
+                totals["batches"] += 1
+                for key in ("rooms", "swipes", "matches"):
+                    totals[key] += stats[key]
+                if stats["rooms"] < batch_size:
+                    break
+
+            orphans = self.archive_retired_groups(db, cutoff, batch_size, settings.ROOM_SWEEP_MAX_BATCHES)
+            totals["orphan_groups"] = orphans["groups"]
+            totals["swipes"] += orphans["swipes"]
+            totals["matches"] += orphans["matches"]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            rooms_expired_total.inc(totals["rooms"])
+            swipes_archived_total.inc(totals["swipes"])
+            matches_archived_total.inc(totals["matches"])
+            orphan_groups_archived_total.inc(totals["orphan_groups"])
+            sweep_duration_seconds.observe(time.perf_counter() - started)
+            sweep_last_run_timestamp.set(time.time())
+
+        if totals["rooms"] or totals["orphan_groups"]:
+            logger.info(
+                f"Room sweep: expired {totals['rooms']} rooms and {totals['orphan_groups']} orphan groups, "
+                f"archived {totals['swipes']} swipes and {totals['matches']} matches in {totals['batches']} batches"
+            )
+        return totals
+
+    def run_once(self) -> dict:
+        """Проход очистки в собственной сессии БД (для фонового потока и скриптов)"""
+        db = SessionLocal()
+        try:
+            return self.sweep(db)
+        finally:
+            db.close()
+
+
+room_expiry_service = RoomExpiryService()
+
+# Фоновая очистка, запускается из lifespan приложения
+room_sweeper = PeriodicWorker(
+    name="room-sweeper",
+    interval=settings.ROOM_SWEEP_INTERVAL_SECONDS,
+    task=room_expiry_service.run_once,
+)
@@ -1,20 +1,52 @@
 """Сервис для управления комнатами: создание, присоединение, выход, получение информации и т.д."""
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Sequence
 import random
 import string
+import threading
+import time
 
-from sqlalchemy import select, cast
+from sqlalchemy import select, cast, update
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.models.archive import RetiredGroup
 from app.models.room import Room
 from app.models.user import User
 from app.config import settings
+from app.services.cache import MISSING, TTLCache
+from app.services.cache_bus import cache_bus
+from app.services.user_service import async_user_service, user_service
 
 
 class RoomService:
     """Сервис для управления комнатами"""
 
+    def __init__(self):
+        # telegram_id -> время (monotonic) последнего обновления last_activity_at его комнаты
+        self._activity_touched: dict[int, float] = {}
+        self._activity_lock = threading.Lock()
+
+        # Кэш состояния комнат: код комнаты -> снимок (состав и имена участников)
+        self._room_cache = TTLCache("room_state", settings.ROOM_CACHE_MAX_SIZE, settings.ROOM_CACHE_TTL_SECONDS)
+        # telegram_id -> код комнаты, в которой состоит пользователь
+        self._member_cache = TTLCache("room_membership", settings.ROOM_CACHE_MAX_SIZE, settings.ROOM_CACHE_TTL_SECONDS)
+        # Поколение кэша: растет при каждой инвалидации. Снимок, прочитанный из БД
+        # до инвалидации, не сохраняется — иначе он перезаписал бы более свежие данные.
+        self._cache_generation = 0
+        self._cache_lock = threading.Lock()
+
+        # Смена имени пользователя меняет имена участников в снимке комнаты
+        user_service.add_change_listener(self.invalidate_member)
+        # Изменения комнат в других процессах (бот, другие воркеры API)
+        cache_bus.subscribe(
+            "room",
+            lambda payload: self.invalidate_room(payload["room"], payload["members"]),
+            self.clear_cache,
+        )
+
     def generate_room_code(self) -> str:
         """Генерирует уникальный 6-символьный код комнаты (буквы + цифры)"""
         characters = string.ascii_uppercase + string.digits
@@ -49,9 +81,11 @@ class RoomService:
         )
 
         db.add(room)
+        self.publish_change(db, room_code, [creator.telegram_id])
         db.commit()
         db.refresh(room)
 
+        self.invalidate_room(room.id, [creator.telegram_id])
         return room
 
     def get_room_by_code(self, db: Session, room_code: str) -> Optional[Room]:
@@ -95,10 +129,14 @@ class RoomService:
             raise ValueError(f"Комната заполнена (максимум {settings.MAX_ROOM_SIZE} участников)")
 
         # Добавляем пользователя (переназначаем, чтобы SQLAlchemy заметил изменение JSON)
+        self._retire_group(db, room.participants)
         room.participants = room.participants + [user.telegram_id]
+        room.last_activity_at = datetime.now(timezone.utc)
+        self.publish_change(db, room_code, room.participants)
         db.commit()
         db.refresh(room)
 
+        self.invalidate_room(room_code, room.participants)
         return room
 
     def leave_room(self, db: Session, user: User, room_code: str) -> Room:
@@ -124,42 +162,159 @@ class RoomService:
             raise ValueError("Вы не состоите в этой комнате")
 
         # Удаляем пользователя (переназначаем, чтобы SQLAlchemy заметил изменение JSON)
+        previous_participants = list(room.participants)
         room.participants = [p for p in room.participants if p != user.telegram_id]
+        self._retire_group(db, previous_participants)
+        self.publish_change(db, room_code, previous_participants)
 
         # Если комната пуста - удаляем её
         if not room.participants:
             db.delete(room)
             db.commit()
+            self.invalidate_room(room_code, previous_participants)
             raise ValueError("Комната была удалена (последний участник вышел)")
 
+        room.last_activity_at = datetime.now(timezone.utc)
         db.add(room)
         db.commit()
         db.refresh(room)
 
+        self.invalidate_room(room_code, previous_participants)
         return room
 
-    def get_room_info(self, db: Session, room_code: str) -> dict:
+    @staticmethod
+    def _retire_group(db: Session, participants: Sequence[int]) -> None:
+        """
+        Отмечает прежний состав комнаты (до входа или выхода участника) в той же транзакции.
+        Его свайпы и матчи перенесет в архив очистка (room_expiry_service), если состав
+        не вернется ни в одну комнату за SESSION_DURATION_HOURS.
+
+        Args:
+            db: Сессия БД
+            participants: telegram_id участников прежнего состава
+        """
+        group = sorted(set(participants))
+        if len(group) < 2:
+            # Свайпы и матчи бывают только у групп от двух участников
+            return
+        stmt = pg_insert(RetiredGroup).values(participants=group, retired_at=datetime.now(timezone.utc))
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[RetiredGroup.participants],
+            set_={"retired_at": stmt.excluded.retired_at},
+        ))
+
+    def touch_activity(self, db: Session, telegram_id: int) -> None:
+        """
+        Обновляет last_activity_at комнаты, в которой состоит пользователь.
+
+        Вызывается на горячем пути (свайпы), поэтому запись в БД делается не чаще,
+        чем раз в ROOM_ACTIVITY_TOUCH_INTERVAL_SECONDS для одного пользователя.
+        Для очистки комнат нужна точность в часы, так что пропуски не важны.
+
+        Args:
+            db: Сессия БД
+            telegram_id: Telegram ID активного пользователя
         """
-        Получает информацию о комнате и её участниках.
+        if not self._should_touch(telegram_id):
+            return
+        db.execute(self._touch_stmt(telegram_id))
+        db.commit()
+
+    def _should_touch(self, telegram_id: int) -> bool:
+        """Пора ли снова записывать активность комнаты пользователя (общий троттлинг для sync и async)"""
+        now = time.monotonic()
+        interval = settings.ROOM_ACTIVITY_TOUCH_INTERVAL_SECONDS
+        with self._activity_lock:
+            last = self._activity_touched.get(telegram_id)
+            if last is not None and now - last < interval:
+                return False
+            self._activity_touched[telegram_id] = now
+            # Не даем словарю расти бесконечно: выкидываем давно устаревшие записи
+            if len(self._activity_touched) > 10_000:
+                self._activity_touched = {
+                    key: value for key, value in self._activity_touched.items() if now - value < interval
+                }
+        return True
+
+    @staticmethod
+    def _touch_stmt(telegram_id: int):
+        return (
+            update(Room)
+            .where(cast(Room.participants, JSONB).op("@>")([telegram_id]))
+            .values(last_activity_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def publish_change(db: Session, room_code: str, participants: Sequence[int]) -> None:
+        """
+        Сообщает другим процессам об изменении комнаты. Событие уходит в той же
+        транзакции и доставляется после COMMIT (см. app/services/cache_bus.py).
 
         Args:
             db: Сессия БД
             room_code: Код комнаты
+            participants: telegram_id участников, чье членство нужно сбросить
+        """
+        cache_bus.publish(db, "room", {"room": room_code, "members": list(participants)})
 
-        Returns:
-            dict: Информация о комнате с именами участников
+    def invalidate_room(self, room_code: str, participants: Sequence[int] = ()) -> None:
+        """
+        Сбрасывает закэшированный снимок комнаты и членство её участников.
+        Вызывается после создания комнаты, входа, выхода и удаления.
 
-        Raises:
-            ValueError: Если комната не найдена
+        Args:
+            room_code: Код комнаты
+            participants: telegram_id участников, чье членство нужно сбросить
         """
-        room = self.get_room_by_code(db, room_code)
-        if not room:
-            raise ValueError(f"Комната с кодом '{room_code}' не найдена")
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._room_cache.pop(room_code)
+            for telegram_id in participants:
+                self._member_cache.pop(telegram_id)
 
-        # Получаем пользователей по telegram_id
-        from app.services.user_service import user_service
-        participants = user_service.get_users_by_telegram_ids(db, room.participants)
+    def invalidate_member(self, telegram_id: int) -> None:
+        """
+        Сбрасывает членство пользователя и снимок его комнаты (например, после смены имени).
+
+        Args:
+            telegram_id: Telegram ID пользователя
+        """
+        with self._cache_lock:
+            self._cache_generation += 1
+            room_code = self._member_cache.get(telegram_id)
+            if room_code is not MISSING:
+                self._room_cache.pop(room_code)
+            self._member_cache.pop(telegram_id)
+
+    def clear_cache(self) -> None:
+        """Сбрасывает все снимки комнат (например, когда события из других процессов могли потеряться)"""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._room_cache.clear()
+            self._member_cache.clear()
+
+    def _store_snapshot(self, info: dict, generation: int) -> None:
+        """Сохраняет снимок комнаты, если с момента чтения из БД не было инвалидаций"""
+        with self._cache_lock:
+            if generation != self._cache_generation:
+                return
+            self._room_cache.set(info["room_code"], info)
+            for telegram_id in info["participant_ids"]:
+                self._member_cache.set(telegram_id, info["room_code"])
+
+    @staticmethod
+    def _copy_info(info: dict) -> dict:
+        """Копия снимка, чтобы вызывающий код не мог изменить данные в кэше"""
+        return {
+            **info,
+            "participants": [dict(participant) for participant in info["participants"]],
+            "participant_ids": list(info["participant_ids"]),
+        }
 
+    @staticmethod
+    def _build_room_info(room: Room, participants: Sequence[User]) -> dict:
+        """Формирует информацию о комнате из строки комнаты и пользователей-участников"""
         # Формируем информацию об участниках
         participants_info = []
         for participant in participants:
@@ -174,10 +329,93 @@ class RoomService:
             "creator_id": room.creator_id,
             "participants_count": len(room.participants),
             "participants": participants_info,
-            "participant_ids": room.participants,  # Плоский массив telegram_id для фронта
-            "created_at": room.created_at
+            "participant_ids": list(room.participants),  # Плоский массив telegram_id для фронта
+            "created_at": room.created_at,
+            "last_activity_at": room.last_activity_at,
         }
 
+    @staticmethod
+    def _is_live(info: dict) -> bool:
+        """
+        Снимок комнаты, которую уже может удалить очистка (room_expiry_service), из кэша не отдается.
+        Очистка сбрасывает кэш только в своем процессе; так остальные процессы (воркеры, бот)
+        тоже перестают отдавать истекшую комнату, не дожидаясь ROOM_CACHE_TTL_SECONDS.
+        last_activity_at снимка может быть старше, чем в БД: тогда снимок просто перечитывается.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.SESSION_DURATION_HOURS)
+        return info["last_activity_at"] >= cutoff
+
+    def _cached_user_room_info(self, telegram_id: int):
+        """Снимок комнаты пользователя из кэша или MISSING при промахе"""
+        room_code = self._member_cache.get(telegram_id)
+        if room_code is not MISSING:
+            cached = self._room_cache.get(room_code)
+            if cached is not MISSING and telegram_id in cached["participant_ids"] and self._is_live(cached):
+                return self._copy_info(cached)
+        return MISSING
+
+    @staticmethod
+    def _member_room_stmt(telegram_id: int):
+        return select(Room).where(
+            cast(Room.participants, JSONB).op("@>")([telegram_id])
+        )
+
+    def get_room_info(self, db: Session, room_code: str) -> dict:
+        """
+        Получает информацию о комнате и её участниках (из кэша, если снимок свежий).
+
+        Args:
+            db: Сессия БД
+            room_code: Код комнаты
+
+        Returns:
+            dict: Информация о комнате с именами участников
+
+        Raises:
+            ValueError: Если комната не найдена
+        """
+        cached = self._room_cache.get(room_code)
+        if cached is not MISSING and self._is_live(cached):
+            return self._copy_info(cached)
+
+        generation = self._cache_generation
+        room = self.get_room_by_code(db, room_code)
+        if not room:
+            raise ValueError(f"Комната с кодом '{room_code}' не найдена")
+
+        participants = user_service.get_users_by_telegram_ids(db, room.participants)
+        info = self._build_room_info(room, participants)
+        self._store_snapshot(info, generation)
+        return self._copy_info(info)
+
+    def get_user_room_info(self, db: Session, telegram_id: int) -> Optional[dict]:
+        """
+        Информация о текущей комнате пользователя одним снимком.
+
+        Горячий путь /api/rooms/my и /room_info: при попадании в кэш не делает
+        ни одного запроса к БД, при промахе — запрос комнаты и запрос участников.
+
+        Args:
+            db: Сессия БД
+            telegram_id: Telegram ID пользователя
+
+        Returns:
+            Optional[dict]: Информация о комнате или None, если пользователь не в комнате
+        """
+        cached = self._cached_user_room_info(telegram_id)
+        if cached is not MISSING:
+            return cached
+
+        generation = self._cache_generation
+        room = db.execute(self._member_room_stmt(telegram_id)).scalar_one_or_none()
+        if not room:
+            return None
+
+        participants = user_service.get_users_by_telegram_ids(db, room.participants)
+        info = self._build_room_info(room, participants)
+        self._store_snapshot(info, generation)
+        return self._copy_info(info)
+
     def get_user_current_room(self, db: Session, user: User) -> Optional[Room]:
         """
         Получает текущую комнату пользователя (первую найденную).
@@ -214,3 +452,54 @@ class RoomService:
 
 
 room_service = RoomService()
+
+
+class AsyncRoomService:
+    """
+    Асинхронные версии методов RoomService для AsyncSession.
+
+    Кэш снимков и троттлинг активности общие с синхронным room_service.
+    Изменение состава комнаты (create/join/leave) выполняется синхронной логикой
+    через AsyncSession.run_sync: правила и инвалидация кэша остаются в одном месте,
+    а запросы идут через асинхронное соединение и не блокируют event loop.
+    """
+
+    def __init__(self, sync_service: RoomService):
+        self._sync = sync_service
+
+    async def get_user_room_info(self, db: AsyncSession, telegram_id: int) -> Optional[dict]:
+        """Асинхронный get_user_room_info(): снимок комнаты пользователя из кэша или БД"""
+        cached = self._sync._cached_user_room_info(telegram_id)
+        if cached is not MISSING:
+            return cached
+
+        generation = self._sync._cache_generation
+        room = (await db.execute(self._sync._member_room_stmt(telegram_id))).scalar_one_or_none()
+        if not room:
+            return None
+
+        participants = await async_user_service.get_users_by_telegram_ids(db, room.participants)
+        info = self._sync._build_room_info(room, participants)
+        self._sync._store_snapshot(info, generation)
+        return self._sync._copy_info(info)
+
+    async def get_user_current_room(self, db: AsyncSession, user: User) -> Optional[Room]:
+        return (await db.execute(self._sync._member_room_stmt(user.telegram_id))).scalar_one_or_none()
+
+    async def touch_activity(self, db: AsyncSession, telegram_id: int) -> None:
+        if not self._sync._should_touch(telegram_id):
+            return
+        await db.execute(self._sync._touch_stmt(telegram_id))
+        await db.commit()
+
+    async def create_room(self, db: AsyncSession, creator: User) -> Room:
+        return await db.run_sync(lambda session: self._sync.create_room(session, creator))
+
+    async def join_room(self, db: AsyncSession, user: User, room_code: str) -> Room:
+        return await db.run_sync(lambda session: self._sync.join_room(session, user, room_code))
+
+    async def leave_room(self, db: AsyncSession, user: User, room_code: str) -> Room:
+        return await db.run_sync(lambda session: self._sync.leave_room(session, user, room_code))
+
+
+async_room_service = AsyncRoomService(room_service)
@@ -1,13 +1,18 @@
 """Логика работы со свайпами: создание, получение, проверка матчей и т.д."""
-from typing import Optional, Sequence
+from datetime import datetime, timezone
+from typing import Optional
 
 from sqlalchemy import and_, select, cast
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
 from app.models.swipe import SwipeType, UserSwipe
 from app.models.user import User
 from app.config import settings
+from app.logging_config import logger
+from app.metrics import timed
+from app.pagination import Page, keyset_stmt, make_page
 
 class SwipeService:
     @staticmethod
@@ -34,6 +39,25 @@ class SwipeService:
         """
         return cast(col, JSONB).op("@>")(value)
 
+    def prepare_group(self, group_participants: list[int]) -> list[int]:
+        """
+        Нормализует состав группы и проверяет его размер.
+
+        Raises:
+            ValueError: Если размер группы меньше 2 или больше максимального
+        """
+        group_participants = self.normalize_group_participants(group_participants)
+
+        # Валидация размера группы
+        if len(group_participants) > settings.MAX_ROOM_SIZE:
+            raise ValueError(f"Group size cannot exceed {settings.MAX_ROOM_SIZE} participants")
+
+        if len(group_participants) < 2:
+            raise ValueError("Group must have at least 2 participants")
+
+        return group_participants
+
+    @timed("swipe_upsert")
     def create_swipe(
         self,
         db: Session,
@@ -59,21 +83,13 @@ class SwipeService:
             ValueError: Если размер группы превышает максимальный
         """
         # Нормализация и валидация группы
-        group_participants = self.normalize_group_participants(group_participants)
-
-        # Валидация размера группы
-        if len(group_participants) > settings.MAX_ROOM_SIZE:
-            raise ValueError(f"Group size cannot exceed {settings.MAX_ROOM_SIZE} participants")
-
-        if len(group_participants) < 2:
-            raise ValueError("Group must have at least 2 participants")
+        group_participants = self.prepare_group(group_participants)
 
         # Идемпотентность: если запись уже есть — обновляем тип и время
         existing = self.get_swipe(db=db, user_id=user_id, movie_id=movie_id, group_participants=group_participants)
         if existing:
             existing.swipe_type = swipe_type
             # swiped_at обновится на уровне БД только при явном изменении; обновим вручную
-            from datetime import datetime, timezone
             existing.swiped_at = datetime.now(timezone.utc)
             db.add(existing)
             db.commit()
@@ -92,21 +108,94 @@ class SwipeService:
         return swipe
 
 
-    def list_user_swipes(self, db: Session, user_id: str, limit: int = 50, offset: int = 0) -> Sequence[UserSwipe]:
-        stmt = select(UserSwipe).where(UserSwipe.user_id == user_id).order_by(UserSwipe.swiped_at.desc()).limit(limit).offset(offset)
-        return list(db.execute(stmt).scalars())
+    @staticmethod
+    def _user_swipes_stmt(user_id: str, limit: int, cursor: Optional[str]):
+        # Индекс idx_user_swipes_user_swiped_at (user_id, swiped_at, id)
+        stmt = select(UserSwipe).where(UserSwipe.user_id == user_id)
+        return keyset_stmt(stmt, UserSwipe.swiped_at, UserSwipe.id, limit, cursor)
+
+    def list_user_swipes(self, db: Session, user_id: str, limit: int = 50, cursor: Optional[str] = None) -> Page[UserSwipe]:
+        """
+        Страница свайпов пользователя, новые первыми.
 
+        Args:
+            cursor: next_cursor предыдущей страницы (None — первая страница)
 
-    def get_swipe(self, db: Session, user_id: str, movie_id: str, group_participants: list[int]) -> Optional[UserSwipe]:
-        stmt = select(UserSwipe).where(
+        Raises:
+            InvalidCursor: Если курсор поврежден
+        """
+        stmt = self._user_swipes_stmt(user_id, limit, cursor)
+        return make_page(db.execute(stmt).scalars().all(), limit, "swiped_at")
+
+
+    def _swipe_stmt(self, user_id: str, movie_id: str, group_participants: list[int]):
+        return select(UserSwipe).where(
             and_(
                 UserSwipe.user_id == user_id,
                 UserSwipe.movie_id == movie_id,
                 self._group_contains(UserSwipe.group_participants, group_participants),
             )
         )
-        return db.execute(stmt).scalar_one_or_none()
 
+    def get_swipe(self, db: Session, user_id: str, movie_id: str, group_participants: list[int]) -> Optional[UserSwipe]:
+        return db.execute(self._swipe_stmt(user_id, movie_id, group_participants)).scalar_one_or_none()
+
+    def _group_votes_stmt(self, movie_id: str, group_participants: list[int], likes_only: bool = False):
+        """
+        Голоса участников группы по фильму: пары (UserSwipe, telegram_id).
+
+        Args:
+            movie_id: ID фильма
+            group_participants: Нормализованный список telegram_id участников группы
+            likes_only: Только лайки (для проверки матча)
+        """
+        conditions = [
+            UserSwipe.movie_id == movie_id,
+            # с помощью cast и оператора @> проверяем, что массив участников в базе содержит всех участников из запроса
+            self._group_contains(UserSwipe.group_participants, group_participants),
+        ]
+        if likes_only:
+            conditions.append(UserSwipe.swipe_type == 'like')
+        return (
+            select(UserSwipe, User.telegram_id)
+            .join(User, UserSwipe.user_id == User.id)
+            .where(and_(*conditions))
+        )
+
+    @staticmethod
+    def _votes_from_rows(rows) -> dict[int, str]:
+        votes: dict[int, str] = {}
+        for row in rows:
+            # row[0] is UserSwipe, row[1] is telegram_id
+            votes[row.telegram_id] = row[0].swipe_type.value if hasattr(row[0].swipe_type, 'value') else str(row[0].swipe_type)
+        return votes
+
+    def get_group_votes(self, db: Session, movie_id: str, group_participants: list[int]) -> dict[int, str]:
+        """
+        Голоса участников группы по фильму.
+
+        Returns:
+            dict[int, str]: telegram_id -> 'like' / 'dislike'
+        """
+        group_participants = self.normalize_group_participants(group_participants)
+        rows = db.execute(self._group_votes_stmt(movie_id, group_participants)).all()
+        return self._votes_from_rows(rows)
+
+    def _validate_match_args(self, movie_id: str, group_participants: list[int]) -> list[int]:
+        """Проверяет параметры check_match и возвращает нормализованную группу"""
+        if not movie_id:
+            raise ValueError("Movie ID cannot be empty")
+
+        if not group_participants or len(group_participants) < 2:
+            raise ValueError("Group must have at least 2 participants")
+
+        if len(group_participants) > settings.MAX_ROOM_SIZE:
+            raise ValueError(f"Group size cannot exceed {settings.MAX_ROOM_SIZE} participants")
+
+        # Нормализуем группу для корректного сравнения JSON массива
+        return self.normalize_group_participants(group_participants)
+
+    @timed("match_check")
     def check_match(self, db: Session, movie_id: str, group_participants: list[int]) -> bool:
         """
         Проверяет, поставили ли все участники группы лайк фильму.
@@ -123,31 +212,10 @@ class SwipeService:
             ValueError: Если переданы некорректные параметры
         """
         try:
-            # Валидация входных параметров
-            if not movie_id:
-                raise ValueError("Movie ID cannot be empty")
-            
-            if not group_participants or len(group_participants) < 2:
-                raise ValueError("Group must have at least 2 participants")
-                
-            if len(group_participants) > settings.MAX_ROOM_SIZE:
-                raise ValueError(f"Group size cannot exceed {settings.MAX_ROOM_SIZE} participants")
-            
-            # Нормализуем группу для корректного сравнения JSON массива
-            group_participants = self.normalize_group_participants(group_participants)
+            group_participants = self._validate_match_args(movie_id, group_participants)
 
             # Получаем все лайки для данного фильма и группы
-            stmt = (
-                select(UserSwipe, User.telegram_id)
-                .join(User, UserSwipe.user_id == User.id)
-                .where(
-                    and_(
-                        UserSwipe.movie_id == movie_id,
-                        UserSwipe.swipe_type == 'like',
-                        self._group_contains(UserSwipe.group_participants, group_participants)
-                    )
-                )
-            )
+            stmt = self._group_votes_stmt(movie_id, group_participants, likes_only=True)
             results = db.execute(stmt).all()
             
             # Считаем уникальных пользователей по telegram_id, поставивших лайк
@@ -158,8 +226,70 @@ class SwipeService:
             
         except Exception as e:
             # Логируем ошибку и возвращаем False для безопасности
-            from app.logging_config import logger
             logger.error(f"Error in check_match: {e}", exc_info=True)
             return False
 
-swipe_service = SwipeService()
\ No newline at end of file
+swipe_service = SwipeService()
+
+
+class AsyncSwipeService:
+    """Асинхронные версии горячих методов SwipeService для AsyncSession (те же запросы и правила)"""
+
+    def __init__(self, sync_service: SwipeService):
+        self._sync = sync_service
+
+    @timed("swipe_upsert")
+    async def create_swipe(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        movie_id: str,
+        swipe_type: SwipeType,
+        group_participants: list[int],
+    ) -> UserSwipe:
+        """Асинхронный create_swipe(): идемпотентное создание/обновление свайпа"""
+        group_participants = self._sync.prepare_group(group_participants)
+
+        stmt = self._sync._swipe_stmt(user_id, movie_id, group_participants)
+        existing = (await db.execute(stmt)).scalar_one_or_none()
+        if existing:
+            existing.swipe_type = swipe_type
+            existing.swiped_at = datetime.now(timezone.utc)
+            await db.commit()
+            return existing
+
+        swipe = UserSwipe(
+            user_id=user_id,
+            movie_id=movie_id,
+            swipe_type=swipe_type,
+            group_participants=group_participants,
+        )
+        db.add(swipe)
+        await db.commit()
+        await db.refresh(swipe)
+        return swipe
+
+    async def list_user_swipes(self, db: AsyncSession, user_id: str, limit: int = 50, cursor: Optional[str] = None) -> Page[UserSwipe]:
+        stmt = self._sync._user_swipes_stmt(user_id, limit, cursor)
+        return make_page((await db.execute(stmt)).scalars().all(), limit, "swiped_at")
+
+    async def get_group_votes(self, db: AsyncSession, movie_id: str, group_participants: list[int]) -> dict[int, str]:
+        group_participants = self._sync.normalize_group_participants(group_participants)
+        rows = (await db.execute(self._sync._group_votes_stmt(movie_id, group_participants))).all()
+        return self._sync._votes_from_rows(rows)
+
+    @timed("match_check")
+    async def check_match(self, db: AsyncSession, movie_id: str, group_participants: list[int]) -> bool:
+        """Асинхронный check_match(): True, если все участники группы лайкнули фильм"""
+        try:
+            group_participants = self._sync._validate_match_args(movie_id, group_participants)
+            stmt = self._sync._group_votes_stmt(movie_id, group_participants, likes_only=True)
+            results = (await db.execute(stmt)).all()
+            unique_telegram_ids = set(result.telegram_id for result in results)
+            return len(unique_telegram_ids) == len(group_participants)
+        except Exception as e:
+            logger.error(f"Error in async check_match: {e}", exc_info=True)
+            return False
+
+
+async_swipe_service = AsyncSwipeService(swipe_service)
\ No newline at end of file
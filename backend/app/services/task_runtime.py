@@ -0,0 +1,142 @@
+"""
+Фоновые задачи с управляемым жизненным циклом (отправка уведомлений о матчах).
+
+TaskRuntime — отдельный поток со своим event loop, который запускается и останавливается
+вместе с процессом (lifespan API, старт бота), как PeriodicWorker. Задачи — корутины:
+одновременно выполняется не больше concurrency, всего (в очереди и в работе) — не больше
+max_pending. Отправить задачу можно из любого потока и из любого event loop.
+
+Остановка: stop() перестает принимать новые задачи, ждет текущие до дедлайна, отменяет
+оставшиеся и возвращает их ключи — вызывающий сохраняет их, чтобы продолжить после рестарта.
+"""
+import asyncio
+import concurrent.futures
+import threading
+from typing import Awaitable, Callable, Hashable, Optional
+
+from app.logging_config import logger
+from app.metrics import registry
+
+background_tasks_total = registry.counter(
+    "background_tasks_total", "Фоновые задачи по результату", ["runtime", "result"]
+)
+background_tasks_pending = registry.gauge(
+    "background_tasks_pending", "Фоновые задачи в очереди и в работе", ["runtime"]
+)
+
+
+class TaskRuntime:
+    """Ограниченный пул фоновых корутин в отдельном потоке с дренированием при остановке"""
+
+    def __init__(self, name: str, concurrency: int, max_pending: int):
+        """
+        Args:
+            name: Имя потока и метки в метриках
+            concurrency: Сколько задач выполняется одновременно
+            max_pending: Сколько задач может ждать и выполняться; сверх этого submit() отказывает
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._accepting = False
+        self._jobs: dict[Hashable, concurrent.futures.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        background_tasks_pending.set_function(lambda: len(self._jobs), runtime=name)
+
+    @property
+    def accepting(self) -> bool:
+        return self._accepting
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+            self._thread.start()
+            self._accepting = True
+        logger.info(f"Task runtime {self.name} started (concurrency {self.concurrency})")
+
+    def submit(self, key: Hashable, job: Callable[[], Awaitable[object]]) -> bool:
+        """
+        Ставит задачу в очередь. job — функция без аргументов, возвращающая корутину;
+        результат False считается неудачей (в метриках), повтор — забота вызывающего.
+
+        Returns:
+            bool: False, если задача не принята (runtime не запущен или останавливается,
+            очередь заполнена, задача с таким ключом уже есть)
+        """
+        with self._lock:
+            if not self._accepting or len(self._jobs) >= self.max_pending or key in self._jobs:
+                background_tasks_total.inc(runtime=self.name, result="refused")
+                return False
+            future = asyncio.run_coroutine_threadsafe(self._run(key, job), self._loop)
+            self._jobs[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return True
+
+    def _forget(self, key: Hashable) -> None:
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    async def _run(self, key: Hashable, job: Callable[[], Awaitable[object]]) -> None:
+        async with self._semaphore:
+            try:
+                result = await job()
+                # Задача может сообщить о неудаче, вернув False (например, уведомление не доставлено)
+                background_tasks_total.inc(runtime=self.name, result="failed" if result is False else "ok")
+            except asyncio.CancelledError:
+                background_tasks_total.inc(runtime=self.name, result="abandoned")
+                raise
+            except Exception as e:
+                background_tasks_total.inc(runtime=self.name, result="error")
+                logger.error(f"Background task {key} in {self.name} failed: {e}", exc_info=True)
+
+    @staticmethod
+    async def _settle() -> None:
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def pending(self) -> list[Hashable]:
+        with self._lock:
+            return list(self._jobs)
+
+    def stop(self, timeout: float) -> list[Hashable]:
+        """
+        Перестает принимать задачи и ждет текущие не дольше timeout секунд.
+
+        Returns:
+            list: Ключи задач, которые не успели завершиться (они отменены)
+        """
+        with self._lock:
+            if self._thread is None:
+                return []
+            self._accepting = False
+            jobs = dict(self._jobs)
+
+        _, not_done = concurrent.futures.wait(jobs.values(), timeout=timeout)
+        leftover = [key for key, future in jobs.items() if future in not_done]
+        for key in leftover:
+            jobs[key].cancel()
+        if leftover:
+            # Отмененным корутинам нужно выйти из await (закрыть соединения) до остановки loop
+            try:
+                asyncio.run_coroutine_threadsafe(self._settle(), self._loop).result(timeout=5)
+            except concurrent.futures.TimeoutError:
+                pass
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        if not self._thread.is_alive():
+            self._loop.close()
+        self._thread = None
+        if leftover:
+            logger.warning(f"Task runtime {self.name} stopped with {len(leftover)} unfinished task(s)")
+        else:
+            logger.info(f"Task runtime {self.name} stopped")
+        return leftover
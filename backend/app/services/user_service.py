@@ -1,31 +1,198 @@
-from typing import Optional, Sequence
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.config import settings
+from app.database import replica_router
 from app.models.user import User
+from app.pagination import Page, iter_keyset, keyset_stmt, make_page
+from app.services.cache import MISSING, TTLCache
+from app.services.cache_bus import cache_bus
+
+# Внешние ключи на users.id. Их нарушение при записи по закэшированному UserIdentity
+# значит, что пользователя удалили (возможно, в другом процессе) после попадания в кэш
+USER_FOREIGN_KEYS = frozenset({"user_swipes_user_id_fkey", "rooms_creator_id_fkey"})
+
+
+def _constraint_name(error: IntegrityError) -> Optional[str]:
+    """Имя нарушенного ограничения: psycopg2 кладет его в diag, asyncpg — в исходное исключение"""
+    diag = getattr(error.orig, "diag", None)
+    if diag is not None:
+        return diag.constraint_name
+    return getattr(error.orig.__cause__, "constraint_name", None)
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """
+    Неизменяемый снимок пользователя для кэша: его можно безопасно отдавать
+    из памяти в любую сессию БД, в отличие от ORM-объекта User.
+    """
+    id: uuid.UUID
+    telegram_id: int
+    first_name: str
+    username: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserIdentity":
+        return cls(id=user.id, telegram_id=user.telegram_id, first_name=user.first_name, username=user.username)
+
 
 class UserService:
+    def __init__(self):
+        # Подписчики на изменение пользователя (например, кэш комнат): вызываются с telegram_id
+        self._change_listeners: list[Callable[[int], None]] = []
+        # Кэш telegram_id -> UserIdentity (None — пользователь не зарегистрирован)
+        self._identity_cache = TTLCache("user_identity", settings.USER_CACHE_MAX_SIZE, settings.USER_CACHE_TTL_SECONDS)
+        # Изменения и удаления пользователей в других процессах (бот, другие воркеры API)
+        cache_bus.subscribe("user", self._notify_changed, self._identity_cache.clear)
+
+    def add_change_listener(self, listener: Callable[[int], None]) -> None:
+        """Регистрирует функцию, которая вызывается после изменения или удаления пользователя"""
+        self._change_listeners.append(listener)
+
+    def _notify_changed(self, telegram_id: int) -> None:
+        self._identity_cache.pop(telegram_id)
+        for listener in self._change_listeners:
+            listener(telegram_id)
+
+    @staticmethod
+    def _publish_changed(db: Session, telegram_id: int) -> None:
+        """Сообщает другим процессам об изменении пользователя (доставка после COMMIT, см. cache_bus)"""
+        cache_bus.publish(db, "user", telegram_id)
+
+    def forget_deleted_user(self, telegram_id: int, error: IntegrityError) -> bool:
+        """
+        Сбрасывает закэшированного пользователя, если запись по его id нарушила внешний ключ
+        на users: пользователя уже нет в БД, и вызывающий код отвечает "не найден" вместо 500.
+
+        Args:
+            telegram_id: Telegram ID пользователя
+            error: Ошибка записи
+
+        Returns:
+            bool: True, если ошибка вызвана удаленным пользователем
+        """
+        if _constraint_name(error) not in USER_FOREIGN_KEYS:
+            return False
+        self._notify_changed(telegram_id)
+        return True
+
     def create_user(self, db: Session, telegram_id: int, first_name: str, username: Optional[str] = None) -> User:
         user = User(telegram_id=telegram_id, first_name=first_name, username=username)
         db.add(user)
+        self._publish_changed(db, telegram_id)
         db.commit()
         db.refresh(user)
+        # Сбрасываем негативную запись "пользователь не найден", если она была
+        self._notify_changed(telegram_id)
         return user
 
 
+    def upsert_user(self, db: Session, telegram_id: int, first_name: str, username: Optional[str] = None) -> User:
+        """
+        Создает пользователя или обновляет его имя одним запросом
+        INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING.
+
+        Если имя и username не изменились, условие WHERE в DO UPDATE не дает
+        переписать строку (нет лишней записи и новой версии строки в PostgreSQL),
+        и пользователь читается обычным SELECT. Конкурентные /start от одного
+        пользователя не падают с IntegrityError: конфликт разрешает сама БД.
+        """
+        user = db.scalars(
+            self._upsert_stmt(telegram_id, first_name, username),
+            execution_options={"populate_existing": True},
+        ).one_or_none()
+
+        if user is None:
+            # Данные не изменились — запись пропущена, читаем существующую строку
+            return self.get_user_by_telegram_id(db, telegram_id)
+
+        self._publish_changed(db, telegram_id)
+        db.commit()
+        self._notify_changed(telegram_id)
+        self._cache_identity(telegram_id, user)
+        return user
+
+
+    @staticmethod
+    def _upsert_stmt(telegram_id: int, first_name: str, username: Optional[str]):
+        """INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... WHERE <имя изменилось> RETURNING users.*"""
+        stmt = pg_insert(User).values(telegram_id=telegram_id, first_name=first_name, username=username)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={"first_name": stmt.excluded.first_name, "username": stmt.excluded.username},
+            where=or_(
+                User.first_name.is_distinct_from(stmt.excluded.first_name),
+                User.username.is_distinct_from(stmt.excluded.username),
+            ),
+        )
+        return stmt.returning(User)
+
+
     def get_user_by_id(self, db: Session, id: str) -> Optional[User]:
         return db.get(User, id)
 
 
     def get_user_by_telegram_id(self, db: Session, telegram_id: int) -> Optional[User]:
         stmt = select(User).where(User.telegram_id == telegram_id)
-        return db.execute(stmt).scalar_one_or_none()
+        user = db.execute(stmt).scalar_one_or_none()
+        self._cache_identity(telegram_id, user, db)
+        return user
 
 
-    def list_users(self, db: Session, limit: int = 50, offset: int = 0) -> Sequence[User]:
-        stmt = select(User).order_by(User.last_active.desc()).limit(limit).offset(offset)
-        return list(db.execute(stmt).scalars())
+    def get_identity_by_telegram_id(self, db: Session, telegram_id: int) -> Optional[UserIdentity]:
+        """
+        Возвращает id и имя пользователя по telegram_id, по возможности без запроса к БД.
+
+        Используется в начале почти каждого запроса API и команды бота, где нужен
+        только User.id/telegram_id. Неизвестные telegram_id тоже кэшируются (на меньший TTL),
+        чтобы повторные запросы от незарегистрированных пользователей не ходили в БД.
+        """
+        identity = self._identity_cache.get(telegram_id)
+        if identity is not MISSING:
+            return identity
+
+        stmt = select(User).where(User.telegram_id == telegram_id)
+        user = db.execute(stmt).scalar_one_or_none()
+        return self._cache_identity(telegram_id, user, db)
+
+
+    def _cache_identity(self, telegram_id: int, user: Optional[User], db: Optional[Session | AsyncSession] = None) -> Optional[UserIdentity]:
+        """
+        Кладет результат запроса в кэш. Результат с реплики не кэшируется: при отставании
+        реплики существующий пользователь получил бы негативную запись, и запросы в primary
+        (например, свайпы) отвечали бы 404 до истечения USER_CACHE_NEGATIVE_TTL_SECONDS.
+        """
+        if db is not None and replica_router.is_replica(db):
+            return UserIdentity.from_user(user) if user is not None else None
+        if user is None:
+            self._identity_cache.set(telegram_id, None, ttl=settings.USER_CACHE_NEGATIVE_TTL_SECONDS)
+            return None
+        identity = UserIdentity.from_user(user)
+        self._identity_cache.set(telegram_id, identity)
+        return identity
+
+
+    def list_users(self, db: Session, limit: int = 50, cursor: Optional[str] = None) -> Page[User]:
+        """
+        Страница пользователей, новые первыми (keyset по (created_at, id)).
+
+        Ключ неизменный: last_active постоянно переписывается, и с ним пользователь,
+        активный во время обхода, пропускался бы или попадал в выборку дважды.
+        """
+        stmt = keyset_stmt(select(User), User.created_at, User.id, limit, cursor)
+        return make_page(db.execute(stmt).scalars().all(), limit, "created_at")
+
+    def iter_users(self, db: Session, batch_size: int = 500):
+        """Все пользователи пачками по batch_size (для скриптов)"""
+        return iter_keyset(db, select(User), User.created_at, User.id, batch_size)
 
 
     def get_users_by_telegram_ids(self, db: Session, telegram_ids: list[int]) -> Sequence[User]:
@@ -44,13 +211,71 @@ class UserService:
         if username is not None:
             user.username = username
         db.add(user)
+        self._publish_changed(db, user.telegram_id)
         db.commit()
         db.refresh(user)
+        self._notify_changed(user.telegram_id)
         return user
 
 
     def delete_user(self, db: Session, user: User) -> None:
+        telegram_id = user.telegram_id
         db.delete(user)
+        self._publish_changed(db, telegram_id)
         db.commit()
+        self._notify_changed(telegram_id)
+
+user_service = UserService()
+
+
+class AsyncUserService:
+    """
+    Асинхронные версии горячих методов UserService для AsyncSession.
+
+    Кэш пользователей и подписчики на изменения общие с синхронным user_service,
+    поэтому инвалидация работает одинаково в обоих режимах.
+    """
+
+    def __init__(self, sync_service: UserService):
+        self._sync = sync_service
+
+    async def get_identity_by_telegram_id(self, db: AsyncSession, telegram_id: int) -> Optional[UserIdentity]:
+        identity = self._sync._identity_cache.get(telegram_id)
+        if identity is not MISSING:
+            return identity
+
+        stmt = select(User).where(User.telegram_id == telegram_id)
+        user = (await db.execute(stmt)).scalar_one_or_none()
+        return self._sync._cache_identity(telegram_id, user, db)
+
+    async def get_user_by_id(self, db: AsyncSession, id: str) -> Optional[User]:
+        return await db.get(User, id)
+
+    async def get_users_by_telegram_ids(self, db: AsyncSession, telegram_ids: list[int]) -> Sequence[User]:
+        if not telegram_ids:
+            return []
+        stmt = select(User).where(User.telegram_id.in_(telegram_ids))
+        return list((await db.execute(stmt)).scalars())
+
+    async def upsert_user(self, db: AsyncSession, telegram_id: int, first_name: str, username: Optional[str] = None) -> User:
+        """Асинхронный upsert_user(): один INSERT ... ON CONFLICT, без записи при неизменном имени"""
+        result = await db.scalars(
+            self._sync._upsert_stmt(telegram_id, first_name, username),
+            execution_options={"populate_existing": True},
+        )
+        user = result.one_or_none()
+
+        if user is None:
+            stmt = select(User).where(User.telegram_id == telegram_id)
+            user = (await db.execute(stmt)).scalar_one_or_none()
+            self._sync._cache_identity(telegram_id, user)
+            return user
+
+        await cache_bus.async_publish(db, "user", telegram_id)
+        await db.commit()
+        self._sync._notify_changed(telegram_id)
+        self._sync._cache_identity(telegram_id, user)
+        return user
+
 
-user_service = UserService()
\ No newline at end of file
+async_user_service = AsyncUserService(user_service)
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+Журнал медленных SQL-запросов с автоматическим EXPLAIN (включается SLOW_QUERY_LOG_ENABLED).
+
+Каждый statement дольше SLOW_QUERY_THRESHOLD_MS записывается в SLOW_QUERY_LOG_FILE (JSON Lines):
+нормализованный текст запроса и его отпечаток (fingerprint — одинаков для всех запросов одной
+формы), время, место вызова в коде приложения (services/..., api/...). Для доли
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE медленных SELECT запрос выполняется повторно как
+EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) с теми же параметрами, и в запись добавляется
+нормализованный план: дерево узлов без стоимостей и времени, например
+"Limit > Sort > Seq Scan on matches". Так видно, когда JSONB-поиск (@>) перестал попадать в GIN-индекс.
+
+Запрос приложения журнал не задерживает: запись в файл и EXPLAIN ANALYZE выполняет фоновый
+поток (очередь до SLOW_QUERY_QUEUE_SIZE записей, при переполнении запись отбрасывается
+и считается в db_slow_queries_dropped_total). EXPLAIN выполняется только для SELECT
+(запись не повторяется) на отдельном соединении с той же БД, в транзакции с откатом и с
+statement_timeout = SLOW_QUERY_EXPLAIN_TIMEOUT_MS. Соединение видит только закоммиченные
+данные, поэтому план может отличаться от плана внутри транзакции приложения.
+
+Отчет по худшим формам запросов: python -m app.scripts.slow_query_report
+"""
+import hashlib
+import json
+import queue
+import random
+import re
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import psycopg2
+import psycopg2.extras
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.logging_config import logger
+from app.metrics import registry
+
+slow_queries_total = registry.counter(
+    "db_slow_queries_total", "SQL statements дольше SLOW_QUERY_THRESHOLD_MS", ["explained"]
+)
+slow_queries_dropped_total = registry.counter(
+    "db_slow_queries_dropped_total", "Медленные запросы, не попавшие в журнал (очередь переполнена)"
+)
+
+_APP_DIR = str(Path(__file__).resolve().parent)
+
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:(?:%\([^)]+\)s|\$\d+|\?|%s)\s*,\s*)+(?:%\([^)]+\)s|\$\d+|\?|%s)\s*\)")
+_PLACEHOLDER = re.compile(r"%\([^)]+\)s|\$\d+|%s")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_POSTCOMPILE = re.compile(r"\(\s*__\[POSTCOMPILE_[^\]]+\]\s*\)")
+
+
+def normalize_sql(statement: str) -> str:
+    """Форма запроса: параметры и литералы заменены на ?, списки IN (...) свернуты, пробелы схлопнуты"""
+    sql = " ".join(statement.split())
+    sql = _POSTCOMPILE.sub("(?)", sql)
+    sql = _PLACEHOLDER_LIST.sub("(?)", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return sql
+
+
+def fingerprint(normalized_sql: str) -> str:
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:12]
+
+
+def plan_shape(plan: dict) -> str:
+    """Нормализованный план: типы узлов с таблицами/индексами, без стоимостей и времени"""
+    def node(item: dict) -> str:
+        label = item.get("Node Type", "?")
+        if item.get("Index Name"):
+            label += f" using {item['Index Name']}"
+        if item.get("Relation Name"):
+            label += f" on {item['Relation Name']}"
+        children = item.get("Plans") or []
+        if not children:
+            return label
+        inner = ", ".join(node(child) for child in children)
+        return f"{label} > {inner}" if len(children) == 1 else f"{label} > [{inner}]"
+
+    return node(plan.get("Plan", {}))
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    found = []
+    stack = [plan.get("Plan", {})]
+    while stack:
+        item = stack.pop()
+        if item.get("Node Type") == "Seq Scan" and item.get("Relation Name"):
+            found.append(item["Relation Name"])
+        stack.extend(item.get("Plans") or [])
+    return sorted(set(found))
+
+
+def _call_site() -> Optional[str]:
+    """Ближайший кадр стека из кода приложения (не SQLAlchemy и не этот модуль)"""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if frame.filename.startswith(_APP_DIR) and not frame.filename.endswith(("slow_queries.py", "query_stats.py")):
+            return f"{Path(frame.filename).relative_to(_APP_DIR)}:{frame.lineno} {frame.name}"
+    return None
+
+
+_DOLLAR_PARAM = re.compile(r"\$(\d+)")
+
+
+def _to_pyformat(statement: str, parameters) -> tuple[str, dict]:
+    """Запрос asyncpg ($1, $2, ...) в формат psycopg2 (%(p1)s, ...) для EXPLAIN на отдельном соединении"""
+    sql = _DOLLAR_PARAM.sub(lambda match: f"%(p{match.group(1)})s", statement.replace("%", "%%"))
+    return sql, {f"p{index}": value for index, value in enumerate(parameters or (), start=1)}
+
+
+class SlowQueryLog:
+    """
+    Фоновый поток журнала: пишет записи в SLOW_QUERY_LOG_FILE и выполняет EXPLAIN
+    сэмплированных запросов на своих соединениях (по одному на БД: primary, реплика).
+    """
+
+    def __init__(self, maxsize: int):
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._connections: dict[str, object] = {}
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, record: dict, explain: Optional[tuple] = None) -> None:
+        """
+        Ставит запись в очередь, не блокируя запрос приложения.
+
+        Args:
+            record: Запись журнала
+            explain: (dsn, statement, parameters, paramstyle) для EXPLAIN или None
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((record, explain))
+        except queue.Full:
+            slow_queries_dropped_total.inc()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ждет, пока очередь будет обработана (для тестов и скриптов). False — не успели за timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            record, explain = self._queue.get()
+            try:
+                self._process(record, explain)
+            except Exception as e:
+                logger.warning(f"Failed to write slow query log: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _process(self, record: dict, explain: Optional[tuple]) -> None:
+        if explain is not None:
+            try:
+                plan = self._explain(*explain)
+            except Exception as e:
+                logger.warning(f"Slow query EXPLAIN failed: {e}")
+                plan = None
+            if plan:
+                buffers = plan.get("Plan", {})
+                record["plan"] = {
+                    "shape": plan_shape(plan),
+                    "seq_scans": _seq_scans(plan),
+                    "execution_ms": plan.get("Execution Time"),
+                    "planning_ms": plan.get("Planning Time"),
+                    "shared_hit_blocks": buffers.get("Shared Hit Blocks"),
+                    "shared_read_blocks": buffers.get("Shared Read Blocks"),
+                }
+        slow_queries_total.inc(explained="true" if record["plan"] else "false")
+        _write(record)
+
+    def _connection(self, dsn: str):
+        connection = self._connections.get(dsn)
+        if connection is None or connection.closed:
+            connection = psycopg2.connect(dsn)
+            # asyncpg передает UUID объектами, psycopg2 без адаптера их не принимает
+            psycopg2.extras.register_uuid(conn_or_curs=connection)
+            self._connections[dsn] = connection
+        return connection
+
+    def _explain(self, dsn: str, statement: str, parameters, paramstyle: str) -> Optional[dict]:
+        """EXPLAIN (ANALYZE, BUFFERS) на своем соединении; транзакция всегда откатывается"""
+        if paramstyle == "numeric_dollar":
+            statement, parameters = _to_pyformat(statement, parameters)
+        connection = self._connection(dsn)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", (int(settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS),))
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+                result = cursor.fetchone()[0]
+        except psycopg2.Error as e:
+            logger.debug(f"EXPLAIN failed for slow query: {e}")
+            return None
+        finally:
+            if not connection.closed:
+                connection.rollback()
+        if isinstance(result, str):
+            result = json.loads(result)
+        return result[0] if isinstance(result, list) else result
+
+
+def _write(record: dict) -> None:
+    path = Path(settings.SLOW_QUERY_LOG_FILE)
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as file:
+        file.write(line + "\n")
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_QUEUE_SIZE)
+
+
+def record_slow_query(connection, statement: str, parameters, elapsed: float, executemany: bool) -> None:
+    """Собирает запись на горячем пути (место вызова есть только в стеке запроса), остальное — в фоне"""
+    normalized = normalize_sql(statement)
+    record = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "fingerprint": fingerprint(normalized),
+        "query": normalized,
+        "duration_ms": round(elapsed * 1000, 2),
+        "call_site": _call_site(),
+        "plan": None,
+    }
+
+    explain = None
+    is_select = statement.lstrip()[:6].upper() == "SELECT"
+    if is_select and not executemany and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        dsn = connection.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        # Копия параметров: исходный объект принадлежит курсору приложения
+        params = dict(parameters) if isinstance(parameters, dict) else tuple(parameters or ())
+        explain = (dsn, statement, params, connection.dialect.paramstyle)
+
+    slow_query_log.submit(record, explain)
+
+
+def instrument_slow_queries(engine: Engine) -> None:
+    """Подключает журнал медленных запросов к engine (ничего не делает, если он выключен)"""
+    if not settings.SLOW_QUERY_LOG_ENABLED:
+        return
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(connection, cursor, statement, parameters, context, executemany):
+        started = connection.info.get("slow_query_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if elapsed >= threshold:
+            record_slow_query(connection, statement, parameters, elapsed, executemany)
@@ -0,0 +1,32 @@
+"""
+Общие фикстуры тестов.
+
+Тесты без БД (пагинация, кэши, метрики, admission control, TaskRuntime) работают везде.
+Тесты с БД (бюджеты запросов горячих эндпоинтов) используют DATABASE_URL и пропускаются,
+если PostgreSQL недоступен. Схема должна быть на последней миграции (alembic upgrade head).
+
+Запуск (из папки backend/):
+    python -m pytest
+"""
+import os
+
+# Настройки читаются при импорте app.config, поэтому задаются до импорта приложения:
+# фоновая очистка комнат в тестах не нужна и не должна трогать данные разработчика
+os.environ.setdefault("ROOM_SWEEP_ENABLED", "false")
+os.environ.setdefault("BOT_MODE", "polling")
+
+import pytest
+from sqlalchemy import text
+
+from app.database import engine
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Проверяет, что PostgreSQL доступен; иначе тест пропускается"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"PostgreSQL недоступен: {e}")
+    return engine
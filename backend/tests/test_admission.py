@@ -0,0 +1,138 @@
+"""Admission control: лимит одновременных запросов, очередь и 503 (app/admission.py)"""
+import asyncio
+
+from types import SimpleNamespace
+
+from app.admission import AdmissionControlMiddleware, RouteGroup, _Limiter
+from app.config import settings
+from app.db_pool import pool_saturated
+
+
+def _group(max_concurrent=1, max_queue=0, shed=False) -> RouteGroup:
+    return RouteGroup(
+        name="test", prefixes=("/api/",), max_concurrent=max_concurrent, max_queue=max_queue,
+        shed_on_pool_saturation=shed,
+    )
+
+
+class _SlowApp:
+    """ASGI-приложение, которое отвечает 200 только после release"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        await self.release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _request(app, path="/api/movies/"):
+    """Выполняет запрос и возвращает (статус, заголовки)"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "method": "GET", "path": path}, receive, send)
+    start = messages[0]
+    return start["status"], dict(start["headers"])
+
+
+def test_rejects_with_503_when_queue_is_full():
+    async def scenario():
+        inner = _SlowApp()
+        app = AdmissionControlMiddleware(inner, groups=[_group()])
+        first = asyncio.create_task(_request(app))
+        await asyncio.sleep(0)
+
+        status, headers = await _request(app)
+        inner.release.set()
+        return status, headers, await first
+
+    status, headers, first = asyncio.run(scenario())
+
+    assert status == 503
+    assert headers[b"retry-after"] == str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()
+    assert first[0] == 200
+
+
+def test_queued_request_admitted_when_slot_frees():
+    async def scenario():
+        inner = _SlowApp()
+        app = AdmissionControlMiddleware(inner, groups=[_group(max_queue=1)])
+        first = asyncio.create_task(_request(app))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(_request(app))
+        await asyncio.sleep(0)
+        inner.release.set()
+        return await first, await second
+
+    first, second = asyncio.run(scenario())
+
+    assert first[0] == 200
+    assert second[0] == 200
+
+
+def test_sheds_without_waiting_when_pool_saturated():
+    async def scenario():
+        inner = _SlowApp()
+        app = AdmissionControlMiddleware(inner, groups=[_group(max_queue=10, shed=True)], pool_saturated=lambda: True)
+        first = asyncio.create_task(_request(app))
+        await asyncio.sleep(0)
+        status, _ = await _request(app)
+        inner.release.set()
+        await first
+        return status
+
+    assert asyncio.run(scenario()) == 503
+
+
+def test_routes_outside_groups_are_not_limited():
+    async def scenario():
+        inner = _SlowApp()
+        inner.release.set()
+        app = AdmissionControlMiddleware(inner, groups=[_group(max_concurrent=1)])
+        return await asyncio.gather(*(_request(app, "/health") for _ in range(5)))
+
+    assert [status for status, _ in asyncio.run(scenario())] == [200] * 5
+
+
+def test_cancelled_waiter_returns_handed_over_slot():
+    async def scenario():
+        limiter = _Limiter(_group(max_queue=1))
+        assert await limiter.acquire(timeout=1, allow_wait=True) is None
+        waiter = asyncio.create_task(limiter.acquire(timeout=1, allow_wait=True))
+        await asyncio.sleep(0)
+
+        # Слот передан ожидающему, но клиент отключился раньше, чем тот успел его занять
+        limiter.release()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+        admitted = await limiter.acquire(timeout=0.01, allow_wait=False)
+        return admitted, limiter.active, limiter.waiting
+
+    assert asyncio.run(scenario()) == (None, 1, 0)
+
+
+def test_queued_request_times_out():
+    async def scenario():
+        limiter = _Limiter(_group(max_queue=1))
+        await limiter.acquire(timeout=1, allow_wait=True)
+        reason = await limiter.acquire(timeout=0.01, allow_wait=True)
+        return reason, limiter.active, limiter.waiting
+
+    assert asyncio.run(scenario()) == ("queue_timeout", 1, 0)
+
+
+def test_pool_never_saturated_with_unlimited_overflow(monkeypatch):
+    engine = SimpleNamespace(pool=SimpleNamespace(checkedout=lambda: 100, size=lambda: 5))
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", -1)
+    assert pool_saturated(engine) is False
+
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 10)
+    assert pool_saturated(engine) is True
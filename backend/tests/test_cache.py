@@ -0,0 +1,114 @@
+"""TTLCache и инвалидация кэшей комнат и пользователей (app/services/cache.py, room_service, user_service)"""
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.config import settings
+from app.services.cache import MISSING, TTLCache
+from app.services.cache_bus import cache_bus
+from app.services.room_service import RoomService
+from app.services.user_service import UserIdentity, UserService
+
+
+def _room_info(code: str, participant_ids: list[int], last_activity_at=None) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "room_code": code,
+        "creator_id": uuid.uuid4(),
+        "participants_count": len(participant_ids),
+        "participants": [{"telegram_id": tg, "first_name": f"U{tg}", "username": None} for tg in participant_ids],
+        "participant_ids": participant_ids,
+        "created_at": now,
+        "last_activity_at": last_activity_at or now,
+    }
+
+
+def test_ttl_expiry():
+    cache = TTLCache("test_ttl", maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", None, ttl=10)
+
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is MISSING
+    # None — валидное значение (негативная запись), отличается от промаха
+    assert cache.get("b") is None
+
+
+def test_lru_eviction():
+    cache = TTLCache("test_lru", maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_snapshot_read_before_invalidation_is_not_stored():
+    rooms = RoomService()
+    generation = rooms._cache_generation
+    # Пока снимок читался из БД, участник вышел из комнаты
+    rooms.invalidate_room("ROOM01", [1, 2])
+
+    rooms._store_snapshot(_room_info("ROOM01", [1, 2]), generation)
+
+    assert rooms._room_cache.get("ROOM01") is MISSING
+    assert rooms._member_cache.get(1) is MISSING
+
+
+def test_snapshot_served_until_invalidated():
+    rooms = RoomService()
+    rooms._store_snapshot(_room_info("ROOM02", [1, 2]), rooms._cache_generation)
+
+    # Попадание в кэш не обращается к БД, поэтому сессия не нужна
+    cached = rooms.get_user_room_info(None, 2)
+    assert cached["participant_ids"] == [1, 2]
+    # Снимок отдается копией: изменения вызывающего кода не попадают в кэш
+    cached["participant_ids"].append(3)
+    assert rooms.get_user_room_info(None, 2)["participant_ids"] == [1, 2]
+
+    rooms.invalidate_member(2)
+    assert rooms._room_cache.get("ROOM02") is MISSING
+    assert rooms._member_cache.get(2) is MISSING
+
+
+def test_room_change_from_other_process_invalidates_snapshot():
+    rooms = RoomService()
+    rooms._store_snapshot(_room_info("ROOM04", [1, 2]), rooms._cache_generation)
+    rooms._store_snapshot(_room_info("ROOM05", [3, 4]), rooms._cache_generation)
+
+    # Так слушатель cache_bus применяет событие, опубликованное другим процессом
+    cache_bus.dispatch(json.dumps({"kind": "room", "payload": {"room": "ROOM04", "members": [1, 2, 5]}}))
+    assert rooms._room_cache.get("ROOM04") is MISSING
+    assert rooms._member_cache.get(1) is MISSING
+    assert rooms._room_cache.get("ROOM05") is not MISSING
+
+    # После переподключения слушателя события могли потеряться — кэш сбрасывается целиком
+    cache_bus._reset_all()
+    assert rooms._room_cache.get("ROOM05") is MISSING
+
+
+def test_expired_room_is_not_served_from_cache():
+    rooms = RoomService()
+    stale = datetime.now(timezone.utc) - timedelta(hours=settings.SESSION_DURATION_HOURS + 1)
+    rooms._store_snapshot(_room_info("ROOM03", [5], last_activity_at=stale), rooms._cache_generation)
+
+    assert rooms._cached_user_room_info(5) is MISSING
+
+
+def test_identity_cache_negative_entry_dropped_on_change():
+    users = UserService()
+    users._cache_identity(42, None)
+    assert users._identity_cache.get(42) is None
+
+    users._notify_changed(42)
+    assert users._identity_cache.get(42) is MISSING
+
+    user = SimpleNamespace(id=uuid.uuid4(), telegram_id=42, first_name="A", username=None)
+    assert users._cache_identity(42, user) == UserIdentity(user.id, 42, "A")
+    assert users._identity_cache.get(42).id == user.id
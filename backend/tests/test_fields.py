@@ -0,0 +1,32 @@
+"""Sparse fieldsets: ?fields= (app/api/fields.py)"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.fields import parse_fields, pick
+from app.api.schemas import MovieResponse
+
+
+def test_no_fields_means_all():
+    assert parse_fields(None, MovieResponse) is None
+
+
+def test_fields_in_model_order_with_id():
+    fields = parse_fields(" year, title ,,", MovieResponse)
+
+    assert fields == tuple(name for name in MovieResponse.model_fields if name in {"id", "title", "year"})
+
+
+def test_unknown_field_is_400():
+    with pytest.raises(HTTPException) as error:
+        parse_fields("title,password", MovieResponse)
+
+    assert error.value.status_code == 400
+    assert "password" in error.value.detail
+
+
+def test_pick():
+    movie = SimpleNamespace(id=1, title="Matrix", year=1999, description="long text")
+
+    assert pick(movie, ("id", "title")) == {"id": 1, "title": "Matrix"}
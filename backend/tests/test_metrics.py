@@ -0,0 +1,80 @@
+"""Текстовый формат Prometheus (app/metrics.py) и сложение метрик процессов (app/metrics_multiproc.py)"""
+import json
+import os
+
+from app.metrics import MetricsRegistry, render
+from app.metrics_multiproc import merge
+
+
+def test_counter_and_gauge_exposition():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Запросы\nпо статусу", ["status"])
+    requests.inc(status="200")
+    requests.inc(2, status="500")
+    registry.gauge("queue_size", "Очередь").set(3.5)
+
+    text = registry.expose()
+
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert "# HELP requests_total Запросы\\nпо статусу" in lines
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{status="200"} 1' in lines
+    assert 'requests_total{status="500"} 2' in lines
+    assert "# TYPE queue_size gauge" in lines
+    assert "queue_size 3.5" in lines
+    # Метрики отсортированы по имени
+    assert lines.index("# TYPE queue_size gauge") < lines.index("# TYPE requests_total counter")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Задержка", ["route"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        latency.observe(value, route="/a")
+
+    lines = registry.expose().splitlines()
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/a"} 4' in lines
+    assert 'latency_seconds_sum{route="/a"} 4.25' in lines
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Ошибки", ["message"]).inc(message='bad "quote"\\')
+
+    assert 'errors_total{message="bad \\"quote\\"\\\\"} 1' in registry.expose().splitlines()
+
+
+def test_same_name_returns_same_metric():
+    registry = MetricsRegistry()
+
+    assert registry.counter("events_total", "События") is registry.counter("events_total", "События")
+
+
+def _write_process_snapshot(directory, pid: int, registry: MetricsRegistry) -> None:
+    (directory / f"metrics_{pid}.json").write_text(json.dumps(registry.snapshot()))
+
+
+def test_metrics_of_processes_are_merged(tmp_path):
+    # Завершившийся процесс: pid, которого нет в системе
+    dead_pid = 2 ** 22 + 1
+    for pid, requests in ((os.getpid(), 2), (dead_pid, 3)):
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Запросы", ["status"]).inc(requests, status="200")
+        registry.histogram("latency_seconds", "Задержка", buckets=(0.1, 1)).observe(0.05)
+        registry.gauge("in_progress", "В обработке").set(requests)
+        _write_process_snapshot(tmp_path, pid, registry)
+
+    lines = render(merge(str(tmp_path))).splitlines()
+
+    # Счетчики и гистограммы складываются, включая завершившиеся процессы
+    assert 'requests_total{status="200"} 5' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert "latency_seconds_count 2" in lines
+    # gauge — по живым процессам с меткой pid
+    assert f'in_progress{{pid="{os.getpid()}"}} 2' in lines
+    assert not any(line.startswith("in_progress") and str(dead_pid) in line for line in lines)
@@ -0,0 +1,48 @@
+"""Курсоры keyset-пагинации (app/pagination.py)"""
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import pytest
+
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor, make_page
+
+
+@dataclass
+class Row:
+    id: uuid.UUID
+    created_at: datetime
+
+
+def test_cursor_roundtrip():
+    sort_value = datetime(2026, 10, 19, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    id_value = uuid.uuid4()
+
+    cursor = encode_cursor(sort_value, id_value)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (sort_value, id_value)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bm90IGpzb24", encode_cursor(datetime.now(timezone.utc), "x")])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_make_page_uses_extra_row_for_next_cursor():
+    rows = [Row(uuid.uuid4(), datetime(2026, 1, day, tzinfo=timezone.utc)) for day in range(1, 5)]
+
+    page = make_page(rows, 3, "created_at")
+
+    assert page.items == rows[:3]
+    assert decode_cursor(page.next_cursor) == (rows[2].created_at, rows[2].id)
+
+
+def test_make_page_last_page():
+    rows = [Row(uuid.uuid4(), datetime(2026, 1, 1, tzinfo=timezone.utc))]
+
+    page = make_page(rows, 3, "created_at")
+
+    assert page.items == rows
+    assert page.next_cursor is None
@@ -0,0 +1,110 @@
+"""
+Бюджеты SQL-запросов горячих эндпоинтов (query_budget из app/query_stats.py).
+
+Тест падает, если эндпоинт начал выполнять больше statements, чем раньше, или один и тот же
+SQL несколько раз (N+1). Числа — текущее поведение: при осознанном изменении их нужно поправить.
+Нужна БД на последней миграции с хотя бы одним активным фильмом (generate_data или загрузка из Kinopoisk).
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+
+from app.database import SessionLocal
+from app.main import app
+from app.models.movie import Movie
+from app.models.user import User
+from app.query_stats import query_budget
+from app.services.room_service import room_service
+
+# telegram_id тестовых пользователей — вне диапазона реальных и сгенерированных данных
+FIRST, SECOND = 880_000_001, 880_000_002
+
+
+@pytest.fixture(scope="module")
+def client(database):
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def movie_id(database):
+    with SessionLocal() as db:
+        movie_id = db.execute(select(Movie.id).where(Movie.is_active.is_(True)).limit(1)).scalar()
+    if movie_id is None:
+        pytest.skip("В БД нет активных фильмов")
+    return str(movie_id)
+
+
+@pytest.fixture(scope="module")
+def users(client):
+    for telegram_id in (FIRST, SECOND):
+        client.post("/api/users/", json={"telegram_id": telegram_id, "first_name": f"Test {telegram_id}"})
+    yield FIRST, SECOND
+    with SessionLocal() as db:
+        group = f"[{FIRST}, {SECOND}]"
+        db.execute(text("DELETE FROM matches WHERE group_participants::jsonb = CAST(:group AS jsonb)"), {"group": group})
+        db.execute(text("DELETE FROM rooms WHERE participants::jsonb @> CAST(:member AS jsonb)"), {"member": f"[{FIRST}]"})
+        db.execute(text("DELETE FROM users WHERE telegram_id IN (:first, :second)"), {"first": FIRST, "second": SECOND})
+        db.commit()
+    room_service.invalidate_member(FIRST)
+
+
+def _swipe(client, telegram_id: int, movie_id: str):
+    return client.post(
+        "/api/swipes/",
+        json={"movie_id": movie_id, "swipe_type": "like", "group_participants": [FIRST, SECOND]},
+        headers={"telegram-id": str(telegram_id)},
+    )
+
+
+def test_user_by_telegram_id(client, users):
+    with query_budget(1):
+        response = client.get(f"/api/users/telegram_id/{FIRST}")
+    assert response.status_code == 200
+
+
+def test_movie_by_id(client, movie_id):
+    with query_budget(1):
+        response = client.get(f"/api/movies/{movie_id}")
+    assert response.status_code == 200
+    assert response.json()["data"]["id"] == movie_id
+
+
+def test_random_movie(client, movie_id):
+    with query_budget(2):
+        response = client.get("/api/movies/random")
+    assert response.status_code == 200
+
+
+def test_my_room_is_served_from_cache(client, users):
+    with SessionLocal() as db:
+        creator = db.execute(select(User).where(User.telegram_id == FIRST)).scalar_one()
+        room_service.create_room(db, creator)
+
+    with query_budget(2):
+        response = client.get("/api/rooms/my", headers={"telegram-id": str(FIRST)})
+    assert response.status_code == 200
+    assert response.json()["data"]["participant_ids"] == [FIRST]
+
+    # Повторный запрос — снимок комнаты из кэша, без запросов к БД
+    with query_budget(0):
+        client.get("/api/rooms/my", headers={"telegram-id": str(FIRST)})
+
+
+def test_swipe_and_match(client, users, movie_id):
+    with query_budget(5):
+        response = _swipe(client, FIRST, movie_id)
+    assert response.status_code == 200
+    assert response.json()["data"]["match_found"] is False
+
+    # Второй участник завершает матч: свайп, проверка матча и вставка матча
+    with query_budget(9):
+        response = _swipe(client, SECOND, movie_id)
+    assert response.status_code == 200
+    assert response.json()["data"]["match_found"] is True
+
+
+def test_group_matches(client, users):
+    with query_budget(2):
+        response = client.get(f"/api/matches/group?participants={FIRST},{SECOND}")
+    assert response.status_code == 200
@@ -0,0 +1,46 @@
+"""
+Устаревший кэш пользователей: пользователь удален в обход user_service (например, другим процессом),
+а его UserIdentity еще в кэше. Запись по нему должна отвечать 404, а не 500 с нарушением внешнего ключа.
+Нужна БД на последней миграции с хотя бы одним активным фильмом.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+
+from app.database import SessionLocal
+from app.main import app
+from app.models.movie import Movie
+from app.services.cache import MISSING
+from app.services.user_service import user_service
+
+# telegram_id тестового пользователя — вне диапазона реальных и сгенерированных данных
+TELEGRAM_ID = 880_000_011
+
+
+@pytest.fixture
+def client(database):
+    with TestClient(app) as client:
+        yield client
+
+
+def test_swipe_by_deleted_cached_user_is_not_found(client):
+    with SessionLocal() as db:
+        movie_id = db.execute(select(Movie.id).where(Movie.is_active.is_(True)).limit(1)).scalar()
+    if movie_id is None:
+        pytest.skip("В БД нет активных фильмов")
+
+    client.post("/api/users/", json={"telegram_id": TELEGRAM_ID, "first_name": "Test"})
+    assert client.get(f"/api/users/telegram_id/{TELEGRAM_ID}").status_code == 200
+    assert user_service._identity_cache.get(TELEGRAM_ID) is not MISSING
+
+    with SessionLocal() as db:
+        db.execute(text("DELETE FROM users WHERE telegram_id = :telegram_id"), {"telegram_id": TELEGRAM_ID})
+        db.commit()
+
+    response = client.post(
+        "/api/swipes/",
+        json={"movie_id": str(movie_id), "swipe_type": "dislike", "group_participants": [TELEGRAM_ID, TELEGRAM_ID + 1]},
+        headers={"telegram-id": str(TELEGRAM_ID)},
+    )
+    assert response.status_code == 404
+    assert user_service._identity_cache.get(TELEGRAM_ID) is MISSING
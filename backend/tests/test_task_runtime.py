@@ -0,0 +1,67 @@
+"""Фоновые задачи: лимиты, отказ и дренирование при остановке (app/services/task_runtime.py)"""
+import asyncio
+import threading
+
+import pytest
+
+from app.services.task_runtime import TaskRuntime, background_tasks_total
+
+
+@pytest.fixture
+def runtime():
+    runtime = TaskRuntime("test-runtime", concurrency=2, max_pending=2)
+    runtime.start()
+    yield runtime
+    runtime.stop(timeout=1)
+
+
+def _waiting_job(event: threading.Event, result=True):
+    async def job():
+        while not event.is_set():
+            await asyncio.sleep(0.01)
+        return result
+    return job
+
+
+def test_job_runs_and_key_is_released(runtime):
+    done = threading.Event()
+    done.set()
+    ok_before = background_tasks_total.value(runtime="test-runtime", result="ok")
+
+    assert runtime.submit("a", _waiting_job(done))
+    runtime.stop(timeout=1)
+
+    assert runtime.pending() == []
+    assert background_tasks_total.value(runtime="test-runtime", result="ok") == ok_before + 1
+
+
+def test_false_result_is_counted_as_failed(runtime):
+    done = threading.Event()
+    done.set()
+    failed_before = background_tasks_total.value(runtime="test-runtime", result="failed")
+
+    runtime.submit("a", _waiting_job(done, result=False))
+    runtime.stop(timeout=1)
+
+    assert background_tasks_total.value(runtime="test-runtime", result="failed") == failed_before + 1
+
+
+def test_refuses_duplicates_and_overflow(runtime):
+    blocker = threading.Event()
+
+    assert runtime.submit("a", _waiting_job(blocker))
+    assert not runtime.submit("a", _waiting_job(blocker))
+    assert runtime.submit("b", _waiting_job(blocker))
+    assert not runtime.submit("c", _waiting_job(blocker))
+    blocker.set()
+
+
+def test_stop_refuses_new_jobs_and_returns_unfinished(runtime):
+    blocker = threading.Event()
+    runtime.submit("slow", _waiting_job(blocker))
+
+    leftover = runtime.stop(timeout=0.1)
+
+    assert leftover == ["slow"]
+    assert not runtime.accepting
+    assert not runtime.submit("late", _waiting_job(blocker))
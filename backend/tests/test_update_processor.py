@@ -0,0 +1,64 @@
+"""Порядок апдейтов одного пользователя и остановка PerUserUpdateProcessor (app/bot/update_processor.py)"""
+import asyncio
+import logging
+
+from telegram import Chat, Message, Update, User
+
+from app.bot.update_processor import PerUserUpdateProcessor
+
+
+def _update(update_id: int, user_id: int) -> Update:
+    user = User(id=user_id, first_name="Test", is_bot=False)
+    message = Message(message_id=update_id, date=None, chat=Chat(id=user_id, type="private"), from_user=user)
+    return Update(update_id=update_id, message=message)
+
+
+async def _handle(done: list, name: str, delay: float) -> None:
+    await asyncio.sleep(delay)
+    done.append(name)
+
+
+def test_updates_of_one_user_run_in_order():
+    async def scenario():
+        processor = PerUserUpdateProcessor(4)
+        done = []
+        await asyncio.gather(
+            processor.process_update(_update(1, 10), _handle(done, "first", 0.02)),
+            processor.process_update(_update(2, 10), _handle(done, "second", 0)),
+        )
+        return done
+
+    assert asyncio.run(scenario()) == ["first", "second"]
+
+
+def test_shutdown_drains_queued_updates():
+    async def scenario():
+        processor = PerUserUpdateProcessor(4, drain_timeout=1)
+        done = []
+        holder = asyncio.create_task(processor.process_update(_update(1, 10), _handle(done, "first", 0.02)))
+        await asyncio.sleep(0)
+        await processor.process_update(_update(2, 10), _handle(done, "second", 0))
+
+        await processor.shutdown()
+        await holder
+        return done
+
+    assert asyncio.run(scenario()) == ["first", "second"]
+
+
+def test_shutdown_reports_dropped_updates(caplog):
+    async def scenario():
+        processor = PerUserUpdateProcessor(4, drain_timeout=0.01)
+        done = []
+        holder = asyncio.create_task(processor.process_update(_update(1, 10), _handle(done, "first", 0.2)))
+        await asyncio.sleep(0)
+        await processor.process_update(_update(2, 10), _handle(done, "second", 0))
+
+        await processor.shutdown()
+        holder.cancel()
+        await asyncio.gather(holder, return_exceptions=True)
+        return done
+
+    with caplog.at_level(logging.WARNING):
+        assert asyncio.run(scenario()) == []
+    assert "dropped 1 queued update(s)" in caplog.text